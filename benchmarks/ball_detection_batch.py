@@ -0,0 +1,64 @@
+"""
+Benchmark BallTracker.detect_frames throughput (frames/sec) against batch size.
+
+Usage:
+    python benchmarks/ball_detection_batch.py --frames 128 --batch-sizes 1 4 8 16
+"""
+import argparse
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from config import MODELS_DIR, SAMPLE_DATA_DIR
+from trackers import BallTracker
+from utils import VideoFrameSource
+
+
+def benchmark_batch_sizes(ball_tracker, frames, batch_sizes, repeats=1):
+    """
+    Time detect_frames over the same frames for each batch size.
+
+    :param ball_tracker: BallTracker to benchmark.
+    :param frames: List of frames to run detection on.
+    :param batch_sizes: Batch sizes to compare.
+    :param repeats: Number of timed runs per batch size (the best run is kept).
+    :return: List of (batch_size, frames_per_second) tuples.
+    """
+    # Warm up the model so the first timed run doesn't pay for initialization
+    ball_tracker.detect_frames(frames[: max(batch_sizes)], batch_size=max(batch_sizes))
+
+    results = []
+    for batch_size in batch_sizes:
+        best_seconds = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            ball_tracker.detect_frames(frames, batch_size=batch_size)
+            best_seconds = min(best_seconds, time.perf_counter() - start)
+        results.append((batch_size, len(frames) / best_seconds))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--video", default=f"{SAMPLE_DATA_DIR}/sample.mp4")
+    parser.add_argument("--model", default=f"{MODELS_DIR}/best.pt")
+    parser.add_argument("--frames", type=int, default=128)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = list(islice(VideoFrameSource(args.video), args.frames))
+    ball_tracker = BallTracker(model_path=args.model)
+
+    results = benchmark_batch_sizes(ball_tracker, frames, args.batch_sizes, args.repeats)
+
+    baseline_fps = results[0][1]
+    print(f"\n{'batch size':>10}  {'frames/sec':>10}  {'speedup':>8}")
+    for batch_size, fps in results:
+        print(f"{batch_size:>10}  {fps:>10.1f}  {fps / baseline_fps:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Measure court keypoint tracking on a synthetic match filmed by a moving camera.
+
+The camera pans, zooms and cuts to a tighter shot; the stand-in keypoint model
+returns the true keypoints of the frames it is asked about, so the error is
+that of the tracking between keyframes alone. Reports the fraction of frames
+the keypoint model ran on, the keypoint error against the ground truth (and
+that of keeping the first frame's keypoints, as without tracking) and the
+tracking cost per frame. With --keypoints-model, the real model is timed too,
+to estimate the speedup over predicting every frame. Exits with status 1 when
+the 95th percentile error exceeds --max-error.
+
+Usage:
+    python benchmarks/court_tracking.py --frames 600 --camera-pan 0.08 --cut-every 200
+    python benchmarks/court_tracking.py --keypoints-model models/keypoints_model.pth
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent))
+from keypoint_detection import CourtKeypointTracker
+from keypoint_detection.quantization import keypoint_error
+from synthetic_match import write_match_video
+from utils import VideoFrameSource
+
+
+class FrameLookupKeypoints:
+    """
+    Stand-in keypoint model returning the true keypoints of known frames.
+
+    :param frames: Decoded frames of the video.
+    :param keypoints: (num_frames, 28) true keypoints of those frames.
+    """
+
+    def __init__(self, frames, keypoints):
+        self.keypoints = {
+            hash(frame.tobytes()): frame_keypoints
+            for frame, frame_keypoints in zip(frames, keypoints)
+        }
+        self.calls = 0
+        self.seconds = 0.0
+
+    def predict(self, image):
+        start = time.perf_counter()
+        self.calls += 1
+        keypoints = self.keypoints[hash(image.tobytes())].copy()
+        self.seconds += time.perf_counter() - start
+        return keypoints
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--camera-pan", type=float, default=0.08)
+    parser.add_argument("--cut-every", type=int, default=200)
+    parser.add_argument("--max-keyframe-interval", type=int, default=300)
+    parser.add_argument("--max-error", type=float, default=3.0, help="p95 error in pixels.")
+    parser.add_argument(
+        "--keypoints-model", default=None, help="Also time this keypoint model on the frames."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = str(Path(temp_dir) / "match.mp4")
+        truth = write_match_video(
+            video_path,
+            num_frames=args.frames,
+            width=args.width,
+            height=args.height,
+            camera_pan=args.camera_pan,
+            cut_every=args.cut_every,
+            stands=True,
+        )
+        with VideoFrameSource(video_path) as source:
+            frames = list(source)
+
+    expected = truth.get("frame_court_keypoints")
+    if expected is None:
+        expected = np.tile(truth["court_keypoints"], (len(frames), 1))
+    expected = expected[: len(frames)]
+
+    model = FrameLookupKeypoints(frames, expected)
+    tracker = CourtKeypointTracker(model, max_keyframe_interval=args.max_keyframe_interval)
+    start = time.perf_counter()
+    tracked = np.array([tracker.update(frame) for frame in frames])
+    tracking_seconds = time.perf_counter() - start - model.seconds
+
+    tracked_error = keypoint_error(expected, tracked)
+    static_error = keypoint_error(expected, np.tile(expected[0], (len(frames), 1)))
+    tracking_ms = 1000 * tracking_seconds / len(frames)
+
+    print(f"Frames: {len(frames)}, keyframes: {model.calls} ({model.calls / len(frames):.1%})")
+    print(f"Keyframes at: {tracker.keyframes}")
+    print(f"{'keypoints':<22}{'mean px':>10}{'p95 px':>10}{'max px':>10}")
+    for name, error in (("tracked", tracked_error), ("first frame only", static_error)):
+        print(
+            f"{name:<22}{error['mean_px']:>10.2f}{error['p95_px']:>10.2f}{error['max_px']:>10.2f}"
+        )
+    print(f"Tracking: {tracking_ms:.2f} ms/frame (excluding keyframe predictions)")
+
+    if args.keypoints_model:
+        from keypoint_detection import KeypointDetector
+
+        detector = KeypointDetector(model_path=args.keypoints_model)
+        detector.predict(frames[0])
+        sample = frames[: min(len(frames), 32)]
+        start = time.perf_counter()
+        for frame in sample:
+            detector.predict(frame)
+        predict_ms = 1000 * (time.perf_counter() - start) / len(sample)
+        keyframe_fraction = model.calls / len(frames)
+        tracked_ms = tracking_ms + keyframe_fraction * predict_ms
+        print(
+            f"Keypoint model: {predict_ms:.2f} ms/frame; tracked: {tracked_ms:.2f} ms/frame "
+            f"({predict_ms / tracked_ms:.1f}x faster than predicting every frame)"
+        )
+
+    if tracked_error["p95_px"] > args.max_error:
+        print(f"FAIL: p95 error {tracked_error['p95_px']:.2f} px > {args.max_error} px")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
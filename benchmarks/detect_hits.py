@@ -0,0 +1,114 @@
+"""
+Benchmark BallTracker.detect_hits against the original per-frame iloc loop.
+
+Usage:
+    python benchmarks/detect_hits.py --frames 20000 50000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from trackers import BallTracker
+
+
+def synthetic_ball_positions(num_frames, seed=0):
+    """
+    Ball travelling back and forth between the baselines with jitter, one rally
+    shot every 30-90 frames.
+
+    :param num_frames: Number of frames to generate.
+    :param seed: Random seed.
+    :return: List of {1: [x1, y1, x2, y2]} dictionaries, one per frame.
+    """
+    rng = np.random.default_rng(seed)
+    shot_lengths = rng.integers(30, 90, size=num_frames // 30 + 1)
+    phase = np.concatenate([np.linspace(0, 1, length) for length in shot_lengths])
+    direction = np.concatenate(
+        [np.full(length, i % 2) for i, length in enumerate(shot_lengths)]
+    )
+    travel = np.where(direction == 0, phase, 1 - phase)[:num_frames]
+
+    mid_y = 150 + 500 * travel + rng.normal(0, 2, num_frames)
+    mid_x = 640 + 200 * np.sin(np.arange(num_frames) / 40)
+    return [
+        {1: [x - 5, y - 5, x + 5, y + 5]} for x, y in zip(mid_x.tolist(), mid_y.tolist())
+    ]
+
+
+def detect_hits_reference(ball_positions):
+    """
+    The original detect_hits implementation, kept to check and time against.
+    """
+    ball_positions = [x.get(1, []) for x in ball_positions]
+    df_ball_positions = pd.DataFrame(ball_positions, columns=["x1", "y1", "x2", "y2"])
+    df_ball_positions["ball_hit"] = 0
+    df_ball_positions["mid_y"] = (df_ball_positions["y1"] + df_ball_positions["y2"]) / 2
+    df_ball_positions["mid_y_rolling_mean"] = (
+        df_ball_positions["mid_y"].rolling(window=5, min_periods=1, center=False).mean()
+    )
+    df_ball_positions["delta_y"] = df_ball_positions["mid_y_rolling_mean"].diff()
+    minimum_change_frames_for_hit = 25
+    for i in range(1, len(df_ball_positions) - int(minimum_change_frames_for_hit * 1.2)):
+        negative_position_change = (
+            df_ball_positions["delta_y"].iloc[i] > 0
+            and df_ball_positions["delta_y"].iloc[i + 1] < 0
+        )
+        positive_position_change = (
+            df_ball_positions["delta_y"].iloc[i] < 0
+            and df_ball_positions["delta_y"].iloc[i + 1] > 0
+        )
+        if negative_position_change or positive_position_change:
+            change_count = 0
+            for change_frame in range(i + 1, i + int(minimum_change_frames_for_hit * 1.2) + 1):
+                negative_position_change_following_frame = (
+                    df_ball_positions["delta_y"].iloc[i] > 0
+                    and df_ball_positions["delta_y"].iloc[change_frame] < 0
+                )
+                positive_position_change_following_frame = (
+                    df_ball_positions["delta_y"].iloc[i] < 0
+                    and df_ball_positions["delta_y"].iloc[change_frame] > 0
+                )
+                if negative_position_change and negative_position_change_following_frame:
+                    change_count += 1
+                elif positive_position_change and positive_position_change_following_frame:
+                    change_count += 1
+            if change_count > minimum_change_frames_for_hit - 1:
+                df_ball_positions.loc[i, "ball_hit"] = 1
+    return df_ball_positions[df_ball_positions["ball_hit"] == 1].index.tolist()
+
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, nargs="+", default=[5000, 20000])
+    args = parser.parse_args()
+
+    ball_tracker = BallTracker()
+
+    print(f"{'frames':>8}  {'hits':>5}  {'reference s':>11}  {'vectorized s':>12}  {'speedup':>8}")
+    for num_frames in args.frames:
+        ball_positions = synthetic_ball_positions(num_frames)
+
+        expected, reference_seconds = time_call(detect_hits_reference, ball_positions)
+        hits, vectorized_seconds = time_call(ball_tracker.detect_hits, ball_positions)
+        if hits != expected:
+            raise AssertionError(f"detect_hits differs from the reference for {num_frames} frames")
+
+        print(
+            f"{num_frames:>8}  {len(hits):>5}  {reference_seconds:>11.3f}  "
+            f"{vectorized_seconds:>12.4f}  {reference_seconds / vectorized_seconds:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Check the ONNX Runtime backend against PyTorch and compare their CPU throughput.
+
+Both backends run on the same frames: detection boxes (raw model output,
+before tracking) are matched by class and IoU, court keypoints are compared
+directly. Exits with status 1 when the outputs differ by more than the
+tolerances. The first run also exports the weights to ONNX (cached).
+
+Usage:
+    python benchmarks/onnx_backend.py --frames 64 --batch-size 8
+    python benchmarks/onnx_backend.py --video sample_data/sample.mp4 --threads 4
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent))
+from config import MODELS_DIR, ONNX_CACHE_DIR
+from keypoint_detection import KeypointDetector
+from synthetic_match import write_match_video
+from trackers import DetectionEngine
+from utils import VideoFrameSource
+
+
+def box_iou(box, boxes):
+    """
+    IoU of one xyxy box with an (n, 4) array of boxes.
+    """
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / (area + areas - intersection + 1e-9)
+
+
+def compare_boxes(reference, candidate):
+    """
+    Match the boxes of one frame by class and IoU.
+
+    :param reference: (xyxy, cls) arrays from the PyTorch model.
+    :param candidate: (xyxy, cls) arrays from the ONNX model.
+    :return: (matched, total, max coordinate difference of the matched boxes)
+    """
+    (boxes, classes), (other_boxes, other_classes) = reference, candidate
+    matched, max_diff = 0, 0.0
+    used = np.zeros(len(other_boxes), dtype=bool)
+    for box, class_id in zip(boxes, classes):
+        candidates = np.flatnonzero((other_classes == class_id) & ~used)
+        if len(candidates) == 0:
+            continue
+        ious = box_iou(box, other_boxes[candidates])
+        best = candidates[np.argmax(ious)]
+        if ious.max() >= 0.5:
+            used[best] = True
+            matched += 1
+            max_diff = max(max_diff, float(np.abs(box - other_boxes[best]).max()))
+    return matched, max(len(boxes), len(other_boxes)), max_diff
+
+
+def raw_detections(engine, frames, batch_size):
+    """
+    Model output per frame as (xyxy, cls) arrays, timed.
+    """
+    detections = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        for result in engine.predict(frames[i : i + batch_size]):
+            boxes = result.boxes.cpu().numpy()
+            detections.append((boxes.xyxy, boxes.cls.astype(int)))
+    return detections, time.perf_counter() - start
+
+
+def time_keypoints(detector, frames):
+    start = time.perf_counter()
+    keypoints = np.stack([detector.predict(frame) for frame in frames])
+    return keypoints, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=str(MODELS_DIR / "best.pt"))
+    parser.add_argument("--keypoints-model", default=str(MODELS_DIR / "keypoints_model.pth"))
+    parser.add_argument("--video", help="Input video (a synthetic match by default)")
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--keypoint-frames", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument(
+        "--threads", type=int, default=None,
+        help="ONNX Runtime intra-op threads of the keypoint model only (ultralytics "
+             "creates the detection session itself, with ONNX Runtime's default)",
+    )
+    parser.add_argument("--cache-dir", default=str(ONNX_CACHE_DIR), help="Exported ONNX graphs")
+    parser.add_argument("--conf", type=float, default=None,
+                        help="Detection confidence threshold (the engine's defaults if not set)")
+    parser.add_argument("--box-tolerance", type=float, default=1.0,
+                        help="Largest allowed box coordinate difference, pixels")
+    parser.add_argument("--min-match-rate", type=float, default=0.99,
+                        help="Fraction of boxes that must be found by both backends")
+    parser.add_argument("--keypoint-tolerance", type=float, default=1.0,
+                        help="Largest allowed keypoint difference, pixels")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = args.video
+        if video_path is None:
+            video_path = str(Path(temp_dir) / "match.mp4")
+            write_match_video(video_path, num_frames=args.frames)
+        video_frames = VideoFrameSource(video_path)
+        frames = [frame for _, frame in zip(range(args.frames), video_frames)]
+        video_frames.close()
+
+    failures = []
+    conf = {} if args.conf is None else {"player_conf": args.conf, "ball_conf": args.conf}
+
+    # Detection: raw boxes of both backends on the same batches
+    engines = {
+        backend: DetectionEngine(
+            args.model, backend=backend, onnx_cache_dir=args.cache_dir, **conf
+        )
+        for backend in ("torch", "onnx")
+    }
+    engines["onnx"].predict(frames[:1])  # warm up the session
+    torch_boxes, torch_seconds = raw_detections(engines["torch"], frames, args.batch_size)
+    onnx_boxes, onnx_seconds = raw_detections(engines["onnx"], frames, args.batch_size)
+
+    matched, total, max_diff = 0, 0, 0.0
+    for reference, candidate in zip(torch_boxes, onnx_boxes):
+        frame_matched, frame_total, frame_diff = compare_boxes(reference, candidate)
+        matched, total = matched + frame_matched, total + frame_total
+        max_diff = max(max_diff, frame_diff)
+    match_rate = matched / total if total else 1.0
+
+    print(f"Detection ({len(frames)} frames, batch size {args.batch_size})")
+    print(f"  boxes matched: {matched}/{total} ({match_rate:.1%}), max difference {max_diff:.3f}px")
+    print(f"  torch: {len(frames) / torch_seconds:8.1f} frames/s")
+    print(f"  onnx:  {len(frames) / onnx_seconds:8.1f} frames/s  ({torch_seconds / onnx_seconds:.2f}x)")
+    if match_rate < args.min_match_rate or max_diff > args.box_tolerance:
+        failures.append("detection boxes differ")
+
+    # Keypoints: predictions on the first frames
+    keypoint_frames = frames[: args.keypoint_frames]
+    detectors = {
+        backend: KeypointDetector(
+            args.keypoints_model, backend=backend, onnx_cache_dir=args.cache_dir,
+            threads=args.threads,
+        )
+        for backend in ("torch", "onnx")
+    }
+    detectors["onnx"].predict(keypoint_frames[0])  # warm up the session
+    torch_keypoints, torch_seconds = time_keypoints(detectors["torch"], keypoint_frames)
+    onnx_keypoints, onnx_seconds = time_keypoints(detectors["onnx"], keypoint_frames)
+    keypoint_diff = float(np.abs(torch_keypoints - onnx_keypoints).max())
+
+    print(f"Keypoints ({len(keypoint_frames)} frames)")
+    print(f"  max difference {keypoint_diff:.4f}px")
+    print(f"  torch: {len(keypoint_frames) / torch_seconds:8.1f} frames/s")
+    print(f"  onnx:  {len(keypoint_frames) / onnx_seconds:8.1f} frames/s  ({torch_seconds / onnx_seconds:.2f}x)")
+    if keypoint_diff > args.keypoint_tolerance:
+        failures.append("keypoints differ")
+
+    if failures:
+        print(f"\nParity check failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("\nONNX outputs match PyTorch")
+
+
+if __name__ == "__main__":
+    main()
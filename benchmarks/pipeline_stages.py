@@ -0,0 +1,151 @@
+"""
+Benchmark every pipeline stage and the end-to-end run on synthetic match videos.
+
+Runs main.run_pipeline on generated videos with the color-based stand-in
+detectors of synthetic_match.py, so it needs no model weights and no GPU.
+Timings can be saved as a baseline; later runs compare against it and exit
+with status 1 when a stage got slower than the threshold.
+
+Usage:
+    python benchmarks/pipeline_stages.py --sizes 1280x720x300 --save-baseline baseline.json
+    python benchmarks/pipeline_stages.py --sizes 1280x720x300 --baseline baseline.json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent))
+from main import run_pipeline
+from synthetic_match import ColorDetectionEngine, KnownCourtKeypoints, write_match_video
+from utils import StageProfiler
+
+
+def parse_size(size):
+    """
+    "WIDTHxHEIGHTxFRAMES" -> (width, height, frames).
+    """
+    try:
+        width, height, frames = (int(value) for value in size.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHTxFRAMES, got: {size}")
+    return width, height, frames
+
+
+def benchmark_size(work_dir, width, height, num_frames, repeat, render_workers, miss_rate, seed):
+    """
+    Time the pipeline on one synthetic video, keeping each stage's best of repeat runs.
+
+    :return: {stage: {"seconds": ..., "frames": ...}}, including "end_to_end".
+    """
+    video_path = str(Path(work_dir) / f"match_{width}x{height}x{num_frames}.mp4")
+    output_path = str(Path(work_dir) / f"output_{width}x{height}x{num_frames}.mp4")
+    truth = write_match_video(video_path, num_frames, width, height, seed=seed)
+
+    best = {}
+    for _ in range(repeat):
+        profiler = StageProfiler()
+        start = time.perf_counter()
+        run_pipeline(
+            video_path,
+            output_path,
+            ColorDetectionEngine(miss_rate=miss_rate, seed=seed),
+            KnownCourtKeypoints(truth["court_keypoints"]),
+            profiler=profiler,
+            render_workers=render_workers,
+        )
+        timings = dict(profiler.report()["stages"])
+        timings["end_to_end"] = {"seconds": time.perf_counter() - start, "frames": num_frames}
+        for name, stage in timings.items():
+            if name not in best or stage["seconds"] < best[name]["seconds"]:
+                best[name] = {"seconds": stage["seconds"], "frames": stage["frames"]}
+    return best
+
+
+def find_regressions(results, baseline, threshold, min_seconds):
+    """
+    Stages slower than baseline * (1 + threshold).
+
+    Stages that take less than min_seconds in both runs are skipped, their
+    timings are mostly noise.
+
+    :return: List of (size, stage, baseline seconds, seconds).
+    """
+    regressions = []
+    for size, timings in results.items():
+        for name, stage in timings.items():
+            seconds = stage["seconds"]
+            baseline_seconds = baseline.get(size, {}).get(name, {}).get("seconds")
+            if baseline_seconds is None or max(seconds, baseline_seconds) < min_seconds:
+                continue
+            if seconds > baseline_seconds * (1 + threshold):
+                regressions.append((size, name, baseline_seconds, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=parse_size, nargs="+", default=[parse_size("1280x720x300")],
+                        help="Videos to generate, as WIDTHxHEIGHTxFRAMES")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size (best one is kept)")
+    parser.add_argument("--render-workers", type=int, default=1)
+    parser.add_argument("--miss-rate", type=float, default=0.1,
+                        help="Fraction of detections the stand-in detector drops")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="Where to write the videos (a temporary directory by default)")
+    parser.add_argument("--output", help="Write the timings to this JSON file")
+    parser.add_argument("--save-baseline", help="Write the timings as a baseline JSON file")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown over the baseline (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="Ignore stages faster than this in both runs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = args.work_dir or temp_dir
+        Path(work_dir).mkdir(parents=True, exist_ok=True)
+
+        results = {}
+        for width, height, num_frames in args.sizes:
+            size = f"{width}x{height}x{num_frames}"
+            print(f"Benchmarking {size} ...")
+            results[size] = benchmark_size(
+                work_dir, width, height, num_frames, args.repeat,
+                args.render_workers, args.miss_rate, args.seed,
+            )
+
+    for size, timings in results.items():
+        print(f"\n{size}")
+        print(f"{'stage':<28}  {'seconds':>9}  {'fps':>10}")
+        for name, stage in timings.items():
+            seconds, frames = stage["seconds"], stage["frames"]
+            fps = f"{frames / seconds:>10.1f}" if frames and seconds else f"{'-':>10}"
+            print(f"{name:<28}  {seconds:>9.4f}  {fps}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"\nTimings written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold, args.min_seconds)
+        if regressions:
+            print(f"\nRegressions (more than {args.threshold:.0%} slower than {args.baseline}):")
+            for size, name, baseline_seconds, seconds in regressions:
+                print(
+                    f"  {size} {name}: {baseline_seconds:.4f}s -> {seconds:.4f}s "
+                    f"(+{seconds / baseline_seconds - 1:.0%})"
+                )
+            sys.exit(1)
+        print(f"\nNo stage regressed more than {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark import latency of the packages and the start up time of the CLI.
+
+Every measurement runs in a fresh interpreter, so nothing is cached in
+sys.modules. Also lists the heavy frameworks each import pulls in, which
+should stay empty: they are only imported by the stage that uses them.
+
+Usage:
+    python benchmarks/startup.py --save-baseline startup.json
+    python benchmarks/startup.py --baseline startup.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+IMPORTS = [
+    "config",
+    "utils",
+    "match_stats",
+    "mini_court",
+    "trackers",
+    "keypoint_detection",
+    "pipeline",
+    "main",
+]
+COMMANDS = {
+    "pipeline --help": ["-m", "pipeline", "--help"],
+}
+HEAVY_MODULES = ["torch", "torchvision", "ultralytics", "pandas", "pyarrow", "roboflow"]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": seconds, "heavy": heavy}}))
+"""
+
+
+def time_import(module):
+    """
+    Import module in a fresh interpreter.
+
+    :return: (seconds, heavy modules it loaded)
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    return measurement["seconds"], measurement["heavy"]
+
+
+def time_command(args):
+    """
+    Wall time of running the interpreter with args, start up included.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable] + args, cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr}")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per target (median is kept)")
+    parser.add_argument("--output", help="Write the timings to this JSON file")
+    parser.add_argument("--save-baseline", help="Write the timings as a baseline JSON file")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown over the baseline (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="Ignore targets faster than this in both runs")
+    args = parser.parse_args()
+
+    baseline_seconds = time_command(["-c", "pass"])
+    print(f"Interpreter start up: {baseline_seconds:.3f}s\n")
+
+    results = {}
+    print(f"{'target':<28}  {'seconds':>8}  heavy modules loaded")
+    for module in IMPORTS:
+        runs = [time_import(module) for _ in range(args.repeat)]
+        seconds = statistics.median(seconds for seconds, _ in runs)
+        heavy = runs[-1][1]
+        results[f"import {module}"] = {"seconds": seconds, "heavy": heavy}
+        print(f"{'import ' + module:<28}  {seconds:>8.3f}  {', '.join(heavy) or '-'}")
+    for name, command in COMMANDS.items():
+        seconds = statistics.median(time_command(command) for _ in range(args.repeat))
+        results[name] = {"seconds": seconds}
+        print(f"{name:<28}  {seconds:>8.3f}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"\nTimings written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name, {}).get("seconds")
+            if before is None or max(before, result["seconds"]) < args.min_seconds:
+                continue
+            if result["seconds"] > before * (1 + args.threshold):
+                regressions.append((name, before, result["seconds"]))
+            new_heavy = set(result.get("heavy", [])) - set(baseline.get(name, {}).get("heavy", []))
+            if new_heavy:
+                regressions.append((f"{name} (now loads {', '.join(sorted(new_heavy))})",
+                                    before, result["seconds"]))
+        if regressions:
+            print(f"\nRegressions against {args.baseline}:")
+            for name, before, seconds in regressions:
+                print(f"  {name}: {before:.3f}s -> {seconds:.3f}s")
+            sys.exit(1)
+        print(f"\nNo target regressed more than {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+Synthetic tennis match videos and stand-in detectors for benchmarking.
+
+The videos show a court in perspective, two players and a ball played back and
+forth between them, drawn with OpenCV in flat colors. The stand-in detectors
+find the players and the ball again by color, so the whole pipeline runs on a
+CPU without any model weights.
+"""
+import cv2
+import numpy as np
+
+from utils import DetectionTable
+
+# Court keypoints in meters (x across the doubles width, y from the far baseline),
+# in the order the keypoint model predicts them
+COURT_KEYPOINTS_METERS = np.array(
+    [
+        (0.0, 0.0), (10.97, 0.0), (0.0, 23.76), (10.97, 23.76),
+        (1.37, 0.0), (1.37, 23.76), (9.6, 0.0), (9.6, 23.76),
+        (1.37, 5.48), (9.6, 5.48), (1.37, 18.28), (9.6, 18.28),
+        (5.485, 5.48), (5.485, 18.28),
+    ],
+    dtype=np.float32,
+)
+COURT_LINES = [(0, 2), (4, 5), (6, 7), (1, 3), (0, 1), (8, 9), (10, 11), (2, 3), (12, 13)]
+
+BACKGROUND_COLOR = (60, 120, 50)
+LINE_COLOR = (255, 255, 255)
+PLAYER_COLOR = (200, 40, 200)
+BALL_COLOR = (0, 255, 255)
+PLAYER_HEIGHT_METERS = 1.9
+
+
+def court_homography(width, height):
+    """
+    Homography from court meters to pixels, with the far baseline narrower.
+    """
+    court_corners = COURT_KEYPOINTS_METERS[:4]
+    image_corners = np.array(
+        [
+            (0.32 * width, 0.2 * height),
+            (0.68 * width, 0.2 * height),
+            (0.14 * width, 0.9 * height),
+            (0.86 * width, 0.9 * height),
+        ],
+        dtype=np.float32,
+    )
+    return cv2.getPerspectiveTransform(court_corners, image_corners)
+
+
+def to_pixels(homography, points_meters):
+    points = np.asarray(points_meters, dtype=np.float32).reshape(-1, 1, 2)
+    return cv2.perspectiveTransform(points, homography).reshape(-1, 2)
+
+
+def camera_homographies(num_frames, width, height, camera_pan=0.0, cut_every=None):
+    """
+    Per-frame homographies of a broadcast camera that pans and zooms around the court.
+
+    Parameters:
+    num_frames (int): Length of the video.
+    width (int): Frame width.
+    height (int): Frame height.
+    camera_pan (float): Pan amplitude as a fraction of the frame size (0: static camera);
+        the zoom varies by half as much.
+    cut_every (int): Frames between cuts to a tighter shot, or None for no cuts.
+
+    Returns:
+    np.ndarray: (num_frames, 3, 3) homographies from the static view to each frame.
+    """
+    frame_nums = np.arange(num_frames)
+    shift_x = camera_pan * width * np.sin(frame_nums / 50)
+    shift_y = 0.5 * camera_pan * height * np.sin(frame_nums / 65)
+    zoom = 1 + 0.5 * camera_pan * np.sin(frame_nums / 70)
+    if cut_every:
+        zoom = zoom * np.where((frame_nums // cut_every) % 2 == 1, 1.25, 1.0)
+
+    center_x, center_y = width / 2, height / 2
+    cameras = np.zeros((num_frames, 3, 3))
+    cameras[:, 0, 0] = cameras[:, 1, 1] = zoom
+    cameras[:, 0, 2] = center_x + shift_x - zoom * center_x
+    cameras[:, 1, 2] = center_y + shift_y - zoom * center_y
+    cameras[:, 2, 2] = 1.0
+    return cameras
+
+
+def simulate_match(num_frames, width, height, seed=0, shot_frames=(30, 60), player_speed=1.0):
+    """
+    Ground truth of a synthetic rally.
+
+    Parameters:
+    num_frames (int): Length of the video.
+    width (int): Frame width.
+    height (int): Frame height.
+    seed (int): Random seed.
+    shot_frames (tuple): Range of frames a shot takes from hit to hit.
+    player_speed (float): Scale of the players' lateral movement.
+
+    Returns:
+    dict: "court_keypoints" (28 values, pixels), "player_boxes" ((num_frames, 2, 4),
+        near player first), "ball_boxes" ((num_frames, 4)) and "hit_frames".
+    """
+    rng = np.random.default_rng(seed)
+    homography = court_homography(width, height)
+    frame_nums = np.arange(num_frames)
+
+    # Players move along their baselines
+    player_x = np.stack(
+        [
+            5.5 + 3.0 * player_speed * np.sin(frame_nums / 45 + phase)
+            for phase in rng.uniform(0, 2 * np.pi, size=2)
+        ],
+        axis=1,
+    )
+    player_y = np.array([24.5, -0.8])
+
+    # The ball goes from one player to the other, hit after hit
+    hit_frames = [0]
+    while hit_frames[-1] < num_frames:
+        hit_frames.append(hit_frames[-1] + int(rng.integers(*shot_frames)))
+    ball_x = np.empty(num_frames)
+    ball_y = np.empty(num_frames)
+    ball_height = np.empty(num_frames)
+    for shot, (start, end) in enumerate(zip(hit_frames[:-1], hit_frames[1:])):
+        hitter, receiver = shot % 2, (shot + 1) % 2
+        frames = frame_nums[start:end]
+        progress = (frames - start) / (end - start)
+        end_x = player_x[min(end, num_frames - 1), receiver]
+        ball_x[start:end] = player_x[start, hitter] + (end_x - player_x[start, hitter]) * progress
+        ball_y[start:end] = player_y[hitter] + (player_y[receiver] - player_y[hitter]) * progress
+        ball_height[start:end] = 1.0 + 2.5 * np.sin(np.pi * progress)
+
+    # Project to pixels; heights use the local scale of the court
+    player_boxes = np.empty((num_frames, 2, 4))
+    for player in range(2):
+        feet = np.stack([player_x[:, player], np.full(num_frames, player_y[player])], axis=1)
+        feet_px = to_pixels(homography, feet)
+        scale = np.linalg.norm(to_pixels(homography, feet + [1.0, 0.0]) - feet_px, axis=1)
+        box_height = PLAYER_HEIGHT_METERS * scale * 1.4
+        box_width = box_height * 0.4
+        player_boxes[:, player] = np.stack(
+            [
+                feet_px[:, 0] - box_width / 2,
+                feet_px[:, 1] - box_height,
+                feet_px[:, 0] + box_width / 2,
+                feet_px[:, 1],
+            ],
+            axis=1,
+        )
+
+    ground = np.stack([ball_x, ball_y], axis=1)
+    ground_px = to_pixels(homography, ground)
+    scale = np.linalg.norm(to_pixels(homography, ground + [1.0, 0.0]) - ground_px, axis=1)
+    ball_center = ground_px - np.stack([np.zeros(num_frames), ball_height * scale], axis=1)
+    radius = np.maximum(scale * 0.15, 2.0)
+    ball_boxes = np.concatenate([ball_center - radius[:, None], ball_center + radius[:, None]], axis=1)
+
+    return {
+        "court_keypoints": to_pixels(homography, COURT_KEYPOINTS_METERS).reshape(-1),
+        "player_boxes": player_boxes,
+        "ball_boxes": ball_boxes,
+        "hit_frames": [frame for frame in hit_frames if frame < num_frames],
+    }
+
+
+def court_keypoints_per_frame(truth, cameras):
+    """
+    Court keypoints of every frame seen through the moving camera.
+
+    Parameters:
+    truth (dict): Ground truth from simulate_match.
+    cameras (np.ndarray): Per-frame homographies from camera_homographies.
+
+    Returns:
+    np.ndarray: (num_frames, 28) keypoints in pixels.
+    """
+    keypoints = truth["court_keypoints"].reshape(-1, 2)
+    return np.stack(
+        [to_pixels(camera, keypoints).reshape(-1) for camera in cameras]
+    ).astype(np.float32)
+
+
+def render_match_frames(truth, width, height, seed=0, cameras=None, stands=False):
+    """
+    Generator of the frames of a synthetic match.
+
+    Parameters:
+    truth (dict): Ground truth from simulate_match.
+    width (int): Frame width.
+    height (int): Frame height.
+    seed (int): Random seed of the stands.
+    cameras (np.ndarray): Optional per-frame homographies from camera_homographies;
+        the static view is warped by them (the boxes of truth stay in the static view).
+    stands (bool): Draw a textured crowd above the court and grain on the court, which
+        give a moving camera something to track besides the court lines.
+
+    Yields:
+    np.ndarray: BGR frames.
+    """
+    # The court is the same in every frame
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    background[:] = BACKGROUND_COLOR
+    if stands:
+        rng = np.random.default_rng(seed)
+        stands_height = int(0.15 * height)
+        grain = rng.integers(-12, 13, size=(height // 2 + 1, width // 2 + 1, 1))
+        background[:] = np.clip(
+            background + grain.repeat(2, axis=0).repeat(2, axis=1)[:height, :width], 0, 255
+        )
+        background[:stands_height] = rng.integers(
+            0, 256, size=(stands_height // 4 + 1, width // 4 + 1, 3), dtype=np.uint8
+        ).repeat(4, axis=0).repeat(4, axis=1)[:stands_height, :width]
+    keypoints = truth["court_keypoints"].reshape(-1, 2)
+    line_thickness = max(1, height // 360)
+    for start, end in COURT_LINES:
+        cv2.line(
+            background,
+            tuple(int(v) for v in keypoints[start]),
+            tuple(int(v) for v in keypoints[end]),
+            LINE_COLOR,
+            line_thickness,
+        )
+
+    for frame_num in range(len(truth["player_boxes"])):
+        frame = background.copy()
+        for x1, y1, x2, y2 in truth["player_boxes"][frame_num]:
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), PLAYER_COLOR, -1)
+        x1, y1, x2, y2 = truth["ball_boxes"][frame_num]
+        center = (int((x1 + x2) / 2), int((y1 + y2) / 2))
+        cv2.circle(frame, center, max(int((x2 - x1) / 2), 1), BALL_COLOR, -1)
+        if cameras is not None:
+            frame = cv2.warpPerspective(frame, cameras[frame_num], (width, height))
+        yield frame
+
+
+def write_match_video(
+    path,
+    num_frames=300,
+    width=1280,
+    height=720,
+    fps=30,
+    seed=0,
+    camera_pan=0.0,
+    cut_every=None,
+    stands=False,
+    **motion,
+):
+    """
+    Render a synthetic match video.
+
+    Parameters:
+    path (str): Output video file.
+    num_frames (int): Number of frames.
+    width (int): Frame width.
+    height (int): Frame height.
+    fps (float): Frame rate.
+    seed (int): Random seed.
+    camera_pan (float): Camera motion (see camera_homographies); 0 for a static camera.
+    cut_every (int): Frames between camera cuts, or None.
+    stands (bool): Draw a textured crowd above the court and grain on the court.
+    **motion: Passed on to simulate_match (shot_frames, player_speed).
+
+    Returns:
+    dict: The ground truth from simulate_match, plus "frame_court_keypoints"
+        ((num_frames, 28)) when the camera moves.
+    """
+    truth = simulate_match(num_frames, width, height, seed=seed, **motion)
+    cameras = None
+    if camera_pan or cut_every:
+        cameras = camera_homographies(num_frames, width, height, camera_pan, cut_every)
+        truth["frame_court_keypoints"] = court_keypoints_per_frame(truth, cameras)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"Unable to open video writer for: {path}")
+    try:
+        for frame in render_match_frames(truth, width, height, seed, cameras, stands):
+            writer.write(frame)
+    finally:
+        writer.release()
+
+    return truth
+
+
+def _color_blobs(frame, color, tolerance=40, min_area=4):
+    lower = np.clip(np.array(color) - tolerance, 0, 255).astype(np.uint8)
+    upper = np.clip(np.array(color) + tolerance, 0, 255).astype(np.uint8)
+    mask = cv2.inRange(frame, lower, upper)
+    num_labels, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+    boxes = []
+    for x, y, w, h, area in stats[1:num_labels]:
+        if area >= min_area:
+            boxes.append([float(x), float(y), float(x + w), float(y + h), int(area)])
+    return boxes
+
+
+class ColorDetectionEngine:
+    """
+    Stand-in for DetectionEngine that finds the synthetic players and ball by color.
+
+    Players keep their track ids by matching each box to the nearest box of the
+    previous frame, like a (very) small tracker. A fraction of the detections can
+    be dropped at random to exercise the interpolation stages.
+
+    :param miss_rate: Probability of dropping each detection.
+    :param seed: Random seed for the dropped detections.
+    """
+
+    def __init__(self, miss_rate=0.1, seed=0):
+        self.miss_rate = miss_rate
+        self.rng = np.random.default_rng(seed)
+        self.previous_players = {}
+        self.next_track_id = 1
+
+    def detect_frames(self, frames, batch_size=1, cache=None, as_tables=False, **kwargs):
+        player_detections, ball_detections = [], []
+        for frame in frames:
+            player_dict, ball_dict = self.detect_frame(frame)
+            player_detections.append(player_dict)
+            ball_detections.append(ball_dict)
+        if as_tables:
+            # Color blobs have no confidence, so conf stays NaN
+            return (
+                DetectionTable.from_dicts(player_detections),
+                DetectionTable.from_dicts(ball_detections, class_id=2),
+            )
+        return player_detections, ball_detections
+
+    def detect_batch(self, frames):
+        return [self.detect_frame(frame) for frame in frames]
+
+    def detect_frame(self, frame):
+        player_dict = {}
+        unmatched = dict(self.previous_players)
+        for x1, y1, x2, y2, _ in _color_blobs(frame, PLAYER_COLOR, min_area=50):
+            center = np.array([(x1 + x2) / 2, (y1 + y2) / 2])
+            if unmatched:
+                track_id = min(
+                    unmatched, key=lambda tid: np.linalg.norm(unmatched[tid] - center)
+                )
+                del unmatched[track_id]
+            else:
+                track_id = self.next_track_id
+                self.next_track_id += 1
+            self.previous_players[track_id] = center
+            if self.rng.random() >= self.miss_rate:
+                player_dict[track_id] = [x1, y1, x2, y2]
+
+        ball_dict = {}
+        balls = _color_blobs(frame, BALL_COLOR)
+        if balls and self.rng.random() >= self.miss_rate:
+            x1, y1, x2, y2, _ = max(balls, key=lambda blob: blob[4])
+            ball_dict[0] = [x1, y1, x2, y2]
+
+        return player_dict, ball_dict
+
+
+class KnownCourtKeypoints:
+    """
+    Stand-in for KeypointDetector that returns the synthetic court's keypoints.
+
+    :param court_keypoints: [x0, y0, x1, y1, ...] in pixels.
+    """
+
+    def __init__(self, court_keypoints):
+        self.court_keypoints = np.asarray(court_keypoints, dtype=np.float32)
+
+    def predict(self, image):
+        return self.court_keypoints.copy()
+
+    def draw_keypoints(self, image, keypoints, color=(0, 0, 255), text_size=0.5):
+        for i in range(0, len(keypoints), 2):
+            x, y = int(keypoints[i]), int(keypoints[i + 1])
+            cv2.putText(
+                image, str(i // 2), (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, text_size, color, 2
+            )
+            cv2.circle(image, (x, y), 5, color, -1)
+        return image
+
+    def keypoint_layer(self, keypoints, per_frame=None):
+        if per_frame is None:
+            per_frame = np.ndim(keypoints) == 2
+        if per_frame:
+            return lambda frame, frame_num: self.draw_keypoints(frame, keypoints[frame_num])
+        return lambda frame, frame_num: self.draw_keypoints(frame, keypoints)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Constants
@@ -11,6 +12,32 @@ NO_MANS_LAND_HEIGHT = 5.48
 PLAYER_1_HEIGHT_METERS = 1.88
 PLAYER_2_HEIGHT_METERS = 1.91
 
+# Inference
+DETECTION_BATCH_SIZE = 8
+DETECTION_CACHE_MAX_BYTES = 2 * 1024**3
+PLAYER_INTERPOLATION_MAX_GAP = None  # frames; None fills every gap
+INFERENCE_BACKEND = "torch"  # or "onnx": ONNX Runtime on the CPU, exported once and cached (needs the onnx extra)
+KEYPOINT_PRECISION = "fp32"  # or "int8": post-training quantized on the CPU (torch backend)
+KEYPOINT_CALIBRATION_FRAMES = 32  # frames sampled to quantize the keypoint model
+KEYPOINT_TRACKING = False  # per-frame court keypoints: CNN on keyframes, optical flow between
+KEYPOINT_MAX_KEYFRAME_INTERVAL = 300  # frames; the CNN runs at least this often when tracking
+
+# Rendering
+RENDER_WORKERS = os.cpu_count() or 1
+RENDER_CHUNK_SIZE = 16  # frames per render task
+RENDER_MAX_PENDING_FRAMES = 64  # decoded frames queued for rendering, whatever the core count
+
+# Streaming pipeline (window sizes in frames)
+STREAM_BLOCK_SIZE = 64
+STREAM_INTERPOLATION_WINDOW = 60
+STREAM_PLAYER_CHOICE_FRAMES = 300
+STREAM_MAX_SHOT_FRAMES = 300
+PIPELINE_QUEUE_SIZE = 8  # items between concurrent stages
+
+# Profiling
+PROFILE_TRACE_ALLOCATIONS = False  # tracemalloc allocation deltas (slow)
+PROFILE_PROMETHEUS = False  # also write the report in Prometheus text format
+
 # Directories
 BASE_DIR = Path(__file__).resolve().parent
 MODELS_DIR = BASE_DIR / 'models'
@@ -28,7 +55,17 @@ UTILS_DIR = BASE_DIR / 'utils'
 # Output Directories
 TEST_OUTPUT_DIR = BASE_DIR / 'test_output'
 TRACKER_STUB_DIR = BASE_DIR / 'tracker_stubs'
+DETECTION_CACHE_DIR = TRACKER_STUB_DIR / 'cache'
+ONNX_CACHE_DIR = MODELS_DIR / 'onnx'
+QUANTIZED_CACHE_DIR = MODELS_DIR / 'quantized'
 
 directories = [ MODELS_DIR, TRAINING_DIR, SAMPLE_DATA_DIR,TEST_OUTPUT_DIR, TRACKER_STUB_DIR, UTILS_DIR, DATA_DIR, TENNIS_BALL_DIR, KEYPOINTS_DIR]
-for directory in directories:
-    directory.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+
+
+def ensure_directories():
+    """
+    Create the project directories; called by the entry points when they run
+    (not at import, so importing config has no side effects).
+    """
+    for directory in directories:
+        directory.mkdir(parents=True, exist_ok=True)
@@ -1 +1,2 @@
-from .keypoint_detection import KeypointDetector
\ No newline at end of file
+from .keypoint_detection import KeypointDetector
+from .court_tracker import CourtKeypointTracker
@@ -0,0 +1,202 @@
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+
+class CourtKeypointTracker:
+    """
+    Per-frame court keypoints, running the keypoint CNN only on keyframes.
+
+    Between keyframes the 14 keypoints are carried by the homography from the
+    keyframe to the current frame: corners are tracked from frame to frame with
+    pyramidal Lucas-Kanade optical flow on a downscaled grayscale frame, and the
+    homography is fit with RANSAC between their positions in the keyframe and now,
+    which rejects the points on players and ball since they don't move with the
+    court. Fitting against the keyframe rather than chaining frame-to-frame
+    homographies keeps their errors from compounding. A new keyframe is predicted
+    when the fit becomes unreliable (too few tracked points or inliers, or a large
+    residual, as after a cut or a fast camera move) and at least every
+    max_keyframe_interval frames, which bounds the drift.
+    """
+
+    def __init__(
+        self,
+        keypoint_detector,
+        max_residual=1.0,
+        min_inlier_ratio=0.5,
+        min_points=12,
+        max_keyframe_interval=300,
+        process_width=640,
+        max_corners=400,
+        ransac_threshold=3.0,
+    ):
+        """
+        :param keypoint_detector: KeypointDetector (or anything with predict(frame))
+                                  used on keyframes.
+        :param max_residual: Largest RMS reprojection error of the RANSAC inliers, in
+                             pixels of the downscaled frame, before a keyframe is forced.
+                             It grows as the tracked points drift from the keyframe.
+        :param min_inlier_ratio: Smallest fraction of tracked points that must fit the homography.
+        :param min_points: Smallest number of points the homography is fit on.
+        :param max_keyframe_interval: Frames after which a keyframe is predicted anyway
+                                      (None to only re-predict when tracking fails).
+        :param process_width: Width frames are downscaled to for tracking.
+        :param max_corners: Corners detected for tracking, spread over a grid.
+        :param ransac_threshold: RANSAC inlier threshold, in pixels of the downscaled frame.
+        """
+        self.keypoint_detector = keypoint_detector
+        self.max_residual = max_residual
+        self.min_inlier_ratio = min_inlier_ratio
+        self.min_points = min_points
+        self.max_keyframe_interval = max_keyframe_interval
+        self.process_width = process_width
+        self.max_corners = max_corners
+        self.ransac_threshold = ransac_threshold
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the previous frames (e.g. before tracking a new video).
+        """
+        self.keyframes = []
+        self.residuals = []
+        self._frame_num = 0
+        self._keypoints = None
+        self._keyframe_keypoints = None
+        self._previous_gray = None
+        self._points = None
+        self._anchors = None
+        self._homography = None
+        self._frames_since_keyframe = 0
+
+    def update(self, frame):
+        """
+        Court keypoints of the next frame of the video.
+
+        :param frame: The frame following the previous call's frame.
+        :return: Keypoints [x0, y0, x1, y1, ...] as a float32 array.
+        """
+        gray, scale = self._prepare(frame)
+
+        homography = None
+        if self._keypoints is not None and (
+            self.max_keyframe_interval is None
+            or self._frames_since_keyframe + 1 < self.max_keyframe_interval
+        ):
+            homography = self._estimate_homography(self._previous_gray, gray)
+
+        if homography is None:
+            # Keyframe: run the CNN and start tracking afresh
+            self._keypoints = np.asarray(
+                self.keypoint_detector.predict(frame), dtype=np.float32
+            )
+            self._keyframe_keypoints = self._keypoints.reshape(-1, 1, 2)
+            self._points = self._anchors = None
+            self._homography = np.eye(3)
+            self._frames_since_keyframe = 0
+            self.keyframes.append(self._frame_num)
+        else:
+            # Homography between the downscaled frames, applied at full resolution
+            to_small = np.diag([scale, scale, 1.0])
+            full_homography = np.linalg.inv(to_small) @ homography @ to_small
+            self._keypoints = cv2.perspectiveTransform(
+                self._keyframe_keypoints, full_homography
+            ).reshape(-1)
+            self._homography = homography
+            self._frames_since_keyframe += 1
+
+        self._previous_gray = gray
+        self._frame_num += 1
+        return self._keypoints.copy()
+
+    def track(self, frames):
+        """
+        Generator of the court keypoints of each frame, in order.
+        """
+        for frame in frames:
+            yield self.update(frame)
+
+    def track_frames(self, frames):
+        """
+        Court keypoints of every frame of a video.
+
+        :param frames: List of frames or a streaming frame source (e.g. VideoFrameSource).
+        :return: (num_frames, 28) float32 array.
+        """
+        self.reset()
+        keypoints = list(
+            self.track(tqdm(frames, desc="Tracking Court Keypoints"))
+        )
+        return np.array(keypoints, dtype=np.float32).reshape(len(keypoints), -1)
+
+    def _prepare(self, frame):
+        # Downscaled grayscale frame and its scale relative to the full frame
+        scale = min(1.0, self.process_width / frame.shape[1])
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), scale
+
+    def _detect_corners(self, gray, grid=4):
+        """
+        Corners to track, detected per cell of a grid so they spread over the frame
+        (the strongest ones of the whole frame tend to bunch up, e.g. in the crowd).
+        """
+        height, width = gray.shape
+        corners_per_cell = max(1, self.max_corners // (grid * grid))
+        corners = []
+        for row in range(grid):
+            for col in range(grid):
+                y0, y1 = row * height // grid, (row + 1) * height // grid
+                x0, x1 = col * width // grid, (col + 1) * width // grid
+                cell_corners = cv2.goodFeaturesToTrack(
+                    gray[y0:y1, x0:x1], corners_per_cell, qualityLevel=0.01, minDistance=7
+                )
+                if cell_corners is not None:
+                    corners.append(cell_corners + np.array([x0, y0], dtype=np.float32))
+        return np.concatenate(corners) if corners else None
+
+    def _estimate_homography(self, previous_gray, gray):
+        """
+        Homography from the keyframe to this frame (both downscaled), or None when
+        it can't be trusted.
+        """
+        # Track the previous step's inliers; detect new corners when few are left,
+        # anchored in the keyframe through the previous frame's homography
+        if self._points is None or len(self._points) < 2 * self.min_points:
+            points = self._detect_corners(previous_gray)
+            if points is None:
+                return None
+            self._points = points
+            self._anchors = cv2.perspectiveTransform(
+                points, np.linalg.inv(self._homography)
+            )
+        if len(self._points) < self.min_points:
+            return None
+
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(
+            previous_gray, gray, self._points, None, winSize=(21, 21), maxLevel=3
+        )
+        tracked = status.ravel() == 1
+        if tracked.sum() < self.min_points:
+            return None
+        source, target = self._anchors[tracked], next_points[tracked]
+
+        homography, inliers = cv2.findHomography(
+            source, target, cv2.RANSAC, self.ransac_threshold
+        )
+        if homography is None:
+            return None
+        inliers = inliers.ravel().astype(bool)
+        if inliers.sum() < self.min_points or inliers.mean() < self.min_inlier_ratio:
+            return None
+
+        # RMS reprojection error of the inliers
+        projected = cv2.perspectiveTransform(source[inliers], homography)
+        residual = float(np.sqrt(np.mean(np.sum((projected - target[inliers]) ** 2, axis=2))))
+        self.residuals.append(residual)
+        if residual > self.max_residual:
+            return None
+
+        self._points = target[inliers].reshape(-1, 1, 2)
+        self._anchors = source[inliers].reshape(-1, 1, 2)
+        return homography
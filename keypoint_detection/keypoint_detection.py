@@ -1,62 +1,240 @@
-import torch
-import torchvision.transforms as transforms
+import threading
+from pathlib import Path
+
 import cv2
-from torchvision import models
+import numpy as np
+from utils import (
+    map_frames,
+    model_cache_path,
+    onnx_model_path,
+    export_torch_onnx,
+    onnx_session,
+)
+from .quantization import (
+    quantized_engine,
+    quantize_keypoint_model,
+    save_quantized_model,
+    load_quantized_model,
+    keypoint_error,
+)
+
+IMAGE_SIZE = 224
+IMAGE_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGE_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# (pixel / 255 - mean) / std as a single multiply-add per channel
+PIXEL_SCALE = 1 / (255 * IMAGE_STD)
+PIXEL_OFFSET = -IMAGE_MEAN / IMAGE_STD
 
 
 class KeypointDetector:
-    def __init__(self, model_path):
+    def __init__(
+        self,
+        model_path,
+        backend="torch",
+        onnx_cache_dir=None,
+        threads=None,
+        precision="fp32",
+        calibration_images=None,
+        quantized_cache_dir=None,
+        batch_size=16,
+    ):
+        """
+        Court keypoint detector (ResNet-50 regressing 14 keypoints).
+
+        :param model_path: Path to the model weights (.pth).
+        :param backend: "torch" runs the model with PyTorch; "onnx" exports it to ONNX
+                        once (cached by weights hash) and runs it with ONNX Runtime on the CPU.
+        :param onnx_cache_dir: Directory of the exported graphs (next to the weights by default).
+        :param threads: ONNX Runtime intra-op threads (all cores by default).
+        :param precision: "fp32", or "int8" for a post-training quantized model on the CPU
+                          (torch backend only).
+        :param calibration_images: BGR images used to quantize the model when no quantized
+                                   model is cached yet; also used to report its error
+                                   against fp32 (see quantization_report).
+        :param quantized_cache_dir: Directory of the quantized models (next to the weights
+                                    by default).
+        :param batch_size: Images per forward pass in predict_batch.
+        """
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unknown backend: {backend} (expected 'torch' or 'onnx')")
+        if precision not in ("fp32", "int8"):
+            raise ValueError(f"Unknown precision: {precision} (expected 'fp32' or 'int8')")
+        if precision == "int8" and backend != "torch":
+            raise ValueError("int8 precision is only available with the torch backend")
+        self.model_path = model_path
+        self.backend = backend
+        self.precision = precision
+        self.quantization_report = None
+        self.batch_size = batch_size
+
+        # Model inputs are written into these buffers, reused across calls
+        self._input_buffer = np.empty((batch_size, 3, IMAGE_SIZE, IMAGE_SIZE), np.float32)
+        self._resized = np.empty((IMAGE_SIZE, IMAGE_SIZE, 3), np.uint8)
+        self._lock = threading.Lock()
+
+        if backend == "onnx":
+            # A cached graph is loaded without importing torch at all
+            onnx_path = onnx_model_path(model_path, onnx_cache_dir)
+            if not onnx_path.exists():
+                export_torch_onnx(
+                    self._load_model(model_path, "cpu"),
+                    (1, 3, IMAGE_SIZE, IMAGE_SIZE),
+                    onnx_path,
+                    input_name="image",
+                    output_name="keypoints",
+                )
+            self.session = onnx_session(onnx_path, threads=threads)
+            return
+
+        # torch/torchvision are imported here so only loading a model pays for them
+        import torch
+
+        if precision == "int8":
+            # Quantized kernels only run on the CPU
+            self.device = torch.device("cpu")
+            self.model, self.quantization_report = self._load_quantized_model(
+                model_path, calibration_images, quantized_cache_dir
+            )
+            return
+
         # Set device to MPS (Metal Performance Shaders) if available, otherwise use CPU
         self.device = torch.device(
             "mps" if torch.backends.mps.is_available() else "cpu"
         )
 
+        self.model = self._load_model(model_path, self.device)
+
+    @staticmethod
+    def _load_model(model_path, device):
+        import torch
+        from torchvision import models
+
         # Load a ResNet-50 model without pre-trained weights
-        self.model = models.resnet50(weights=None)
+        model = models.resnet50(weights=None)
 
         # Replace the final fully connected layer to output 28 values (14 keypoints with x, y coordinates)
-        self.model.fc = torch.nn.Linear(self.model.fc.in_features, 14 * 2)
+        model.fc = torch.nn.Linear(model.fc.in_features, 14 * 2)
 
         # Load model weights from the given path
-        self.model.load_state_dict(torch.load(model_path, map_location=self.device))
-
-        # Move the model to the specified device
-        self.model.to(self.device)
-
-        # Set the model to evaluation mode
-        self.model.eval()
-
-        # Define image transformation pipeline
-        self.transform = transforms.Compose(
-            [
-                transforms.ToPILImage(),
-                transforms.Resize((224, 224)),
-                transforms.ToTensor(),
-                transforms.Normalize(
-                    mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]
-                ),
-            ]
+        model.load_state_dict(torch.load(model_path, map_location=device))
+
+        # Move the model to the specified device and set it to evaluation mode
+        model.to(device)
+        model.eval()
+        return model
+
+    def _load_quantized_model(self, model_path, calibration_images, cache_dir):
+        """
+        Load the cached int8 model, or quantize the weights with the calibration
+        images, report the error against fp32 and cache the result.
+
+        :return: (model, report)
+        """
+        import torch
+
+        engine = quantized_engine()
+        if cache_dir is None:
+            cache_dir = Path(model_path).parent / "quantized"
+        quantized_path = model_cache_path(model_path, cache_dir, ".pt", tag=f"int8-{engine}")
+        if quantized_path.exists():
+            return load_quantized_model(quantized_path, engine)
+
+        if not calibration_images:
+            raise ValueError(
+                "int8 precision needs calibration_images to quantize the model "
+                f"(no quantized model cached at {quantized_path})"
+            )
+        batches = [
+            self._preprocess_batch(calibration_images[i : i + self.batch_size]).copy()
+            for i in range(0, len(calibration_images), self.batch_size)
+        ]
+        model = quantize_keypoint_model(model_path, batches, engine)
+
+        # Keypoint error of the int8 model against fp32 on the calibration set
+        fp32_model = self._load_model(model_path, "cpu")
+        with torch.no_grad():
+            fp32_keypoints, int8_keypoints = (
+                np.concatenate([m(torch.from_numpy(batch)).numpy() for batch in batches])
+                for m in (fp32_model, model)
+            )
+        report = keypoint_error(
+            self._rescale(fp32_keypoints, calibration_images),
+            self._rescale(int8_keypoints, calibration_images),
         )
+        report["engine"] = engine
+        print(
+            f"Quantized keypoint model, error against fp32 on {report['images']} images: "
+            f"mean {report['mean_px']:.2f}px, p95 {report['p95_px']:.2f}px, "
+            f"max {report['max_px']:.2f}px"
+        )
+
+        save_quantized_model(model, quantized_path, report)
+        return model, report
 
     def predict(self, image):
-        # Convert the image from BGR to RGB
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return self.predict_batch([image])[0]
 
-        # Apply transformations to the image and add a batch dimension
-        image_tensor = self.transform(image_rgb).unsqueeze(0).to(self.device)
+    def predict_batch(self, images):
+        """
+        Predict the court keypoints of several images, batch_size images per forward pass.
 
-        # Run the model in inference mode with no gradient calculation
-        with torch.no_grad():
-            outputs = self.model(image_tensor)
+        :param images: List of BGR images (of any sizes).
+        :return: (len(images), 28) float32 array, x0, y0, x1, y1, ... in each image's pixels.
+        """
+        keypoints = np.empty((len(images), 14 * 2), dtype=np.float32)
+        with self._lock:
+            for start in range(0, len(images), self.batch_size):
+                batch = images[start : start + self.batch_size]
+                keypoints[start : start + len(batch)] = self._forward(
+                    self._preprocess_batch(batch)
+                )
 
-        # Remove the batch dimension and convert the tensor to a NumPy array
-        keypoints = outputs.squeeze().cpu().numpy()
+        return self._rescale(keypoints, images)
 
-        # Rescale keypoints to the original image size
-        original_h, original_w = image.shape[:2]
-        keypoints[::2] *= original_w / 224.0
-        keypoints[1::2] *= original_h / 224.0
+    def _preprocess_batch(self, images):
+        """
+        Resize, BGR to RGB and normalize images into the (n, 3, 224, 224) input buffer.
 
+        The returned array is a view of the buffer, overwritten by the next call.
+        """
+        inputs = self._input_buffer[: len(images)]
+        for i, image in enumerate(images):
+            # Area interpolation is the closest OpenCV match to the PIL bilinear
+            # (antialiased) downscaling the model was trained with
+            cv2.resize(
+                image, (IMAGE_SIZE, IMAGE_SIZE), dst=self._resized, interpolation=cv2.INTER_AREA
+            )
+            # Channels are written in RGB order, scaled and shifted in place
+            for channel in range(3):
+                np.multiply(
+                    self._resized[:, :, 2 - channel],
+                    PIXEL_SCALE[channel],
+                    out=inputs[i, channel],
+                )
+                inputs[i, channel] += PIXEL_OFFSET[channel]
+        return inputs
+
+    def _forward(self, inputs):
+        if self.backend == "onnx":
+            return self.session.run(None, {"image": inputs})[0]
+
+        import torch
+
+        # Run the model in inference mode with no gradient calculation
+        with torch.no_grad():
+            return self.model(torch.from_numpy(inputs).to(self.device)).cpu().numpy()
+
+    @staticmethod
+    def _rescale(keypoints, images):
+        # Rescale keypoints from the model input to each image's original size, in place
+        # (reshaped so an empty batch is an empty (0, 2) array)
+        image_sizes = np.array(
+            [image.shape[1::-1] for image in images], dtype=np.float32
+        ).reshape(-1, 2)
+        keypoints.reshape(len(images), keypoints.shape[1] // 2, 2)[:] *= (
+            image_sizes / IMAGE_SIZE
+        )[:, None, :]
         return keypoints
 
     def draw_keypoints(self, image, keypoints, color=(0, 0, 255), text_size=0.5):
@@ -77,9 +255,15 @@ class KeypointDetector:
         return image
 
     def draw_keypoints_on_video(self, video_frames, keypoints):
-        output_video_frames = []
-        # Draw keypoints on each frame of the video
-        for frame in video_frames:
-            frame = self.draw_keypoints(frame, keypoints)
-            output_video_frames.append(frame)
-        return output_video_frames
+        # Draw keypoints on each frame of the video (lazily for streaming sources)
+        return map_frames(video_frames, self.keypoint_layer(keypoints))
+
+    def keypoint_layer(self, keypoints, per_frame=None):
+        # Render layer drawing the keypoints on every frame (see utils.FrameRenderer):
+        # the same keypoints, or per_frame keypoints indexed by frame number (inferred
+        # from a (num_frames, 28) array when None)
+        if per_frame is None:
+            per_frame = np.ndim(keypoints) == 2
+        if per_frame:
+            return lambda frame, frame_num: self.draw_keypoints(frame, keypoints[frame_num])
+        return lambda frame, frame_num: self.draw_keypoints(frame, keypoints)
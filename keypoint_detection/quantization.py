@@ -0,0 +1,113 @@
+import json
+import os
+
+import numpy as np
+
+
+def quantized_engine():
+    """
+    Quantized kernel backend for this CPU: fbgemm on x86, qnnpack on ARM.
+    """
+    import torch
+
+    supported = torch.backends.quantized.supported_engines
+    return "fbgemm" if "fbgemm" in supported else "qnnpack"
+
+
+def quantize_keypoint_model(model_path, calibration_batches, engine=None):
+    """
+    Post-training static int8 quantization of the keypoint ResNet-50.
+
+    Conv/BN/ReLU blocks are fused, activation ranges are observed on the
+    calibration batches, then weights and activations are converted to int8.
+
+    :param model_path: Path to the fp32 model weights (.pth).
+    :param calibration_batches: Iterable of (n, 3, 224, 224) float32 arrays,
+                                preprocessed like KeypointDetector's inputs.
+    :param engine: Quantized backend (see quantized_engine()).
+    :return: The quantized model, on the CPU in eval mode.
+    """
+    import torch
+    from torchvision.models.quantization import resnet50 as quantizable_resnet50
+
+    engine = engine or quantized_engine()
+    torch.backends.quantized.engine = engine
+
+    # Same layers and parameter names as models.resnet50, plus quant/dequant stubs
+    model = quantizable_resnet50(weights=None, quantize=False)
+    model.fc = torch.nn.Linear(model.fc.in_features, 14 * 2)
+    model.load_state_dict(torch.load(model_path, map_location="cpu"))
+    model.eval()
+
+    model.fuse_model()
+    model.qconfig = torch.ao.quantization.get_default_qconfig(engine)
+    torch.ao.quantization.prepare(model, inplace=True)
+    with torch.no_grad():
+        for batch in calibration_batches:
+            model(torch.from_numpy(batch))
+    torch.ao.quantization.convert(model, inplace=True)
+    return model
+
+
+def save_quantized_model(model, path, report=None):
+    """
+    Save a quantized model as TorchScript (written atomically), with its error report
+    as JSON next to it.
+
+    :param model: Quantized model.
+    :param path: Output .pt path.
+    :param report: Optional keypoint_error() report.
+    """
+    import torch
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(".pt.tmp")
+    with torch.no_grad():
+        scripted = torch.jit.trace(model, torch.zeros(1, 3, 224, 224))
+    torch.jit.save(scripted, str(temp_path))
+    os.replace(temp_path, path)
+
+    if report is not None:
+        with open(path.with_suffix(".json"), "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def load_quantized_model(path, engine=None):
+    """
+    Load a model saved by save_quantized_model.
+
+    :return: (model, report) with report None if none was saved.
+    """
+    import torch
+
+    torch.backends.quantized.engine = engine or quantized_engine()
+    model = torch.jit.load(str(path), map_location="cpu")
+    model.eval()
+
+    report = None
+    report_path = path.with_suffix(".json")
+    if report_path.exists():
+        with open(report_path) as f:
+            report = json.load(f)
+    return model, report
+
+
+def keypoint_error(reference, candidate):
+    """
+    Error of predicted keypoints against reference predictions.
+
+    :param reference: (n, 28) keypoints in pixels (e.g. from the fp32 model).
+    :param candidate: (n, 28) keypoints of the same images (e.g. from the int8 model).
+    :return: Dictionary with the number of images and the mean, median, 95th
+             percentile and max Euclidean keypoint distance in pixels.
+    """
+    reference = np.asarray(reference, dtype=np.float64).reshape(len(reference), -1, 2)
+    candidate = np.asarray(candidate, dtype=np.float64).reshape(len(candidate), -1, 2)
+    distances = np.linalg.norm(reference - candidate, axis=2)
+    return {
+        "images": len(reference),
+        "mean_px": float(distances.mean()),
+        "median_px": float(np.median(distances)),
+        "p95_px": float(np.percentile(distances, 95)),
+        "max_px": float(distances.max()),
+    }
@@ -1,206 +1,251 @@
-import cv2
-import pandas as pd
 from utils import (
-    load_video_frames,
+    VideoFrameSource,
+    sample_video_frames,
+    DetectionCache,
     export_video,
-    measure_distance,
-    convert_pixel_distance_to_meters,
-
-    display_stats,
+    FrameRenderer,
+    frame_number_layer,
+    stats_layer,
+    export_tracking_data,
+    StageProfiler,
 )
 from config import (
     SAMPLE_DATA_DIR,
     TEST_OUTPUT_DIR,
     MODELS_DIR,
-    TRACKER_STUB_DIR,
-    DOUBLE_LINE_WIDTH,
+    DETECTION_CACHE_DIR,
+    DETECTION_BATCH_SIZE,
+    DETECTION_CACHE_MAX_BYTES,
+    PLAYER_INTERPOLATION_MAX_GAP,
+    RENDER_WORKERS,
+    RENDER_CHUNK_SIZE,
+    RENDER_MAX_PENDING_FRAMES,
+    PROFILE_TRACE_ALLOCATIONS,
+    PROFILE_PROMETHEUS,
+    INFERENCE_BACKEND,
+    ONNX_CACHE_DIR,
+    KEYPOINT_PRECISION,
+    KEYPOINT_CALIBRATION_FRAMES,
+    QUANTIZED_CACHE_DIR,
+    KEYPOINT_TRACKING,
+    KEYPOINT_MAX_KEYFRAME_INTERVAL,
+    ensure_directories,
 )
-from trackers import PlayerTracker, BallTracker
-from keypoint_detection import KeypointDetector
+from trackers import PlayerTracker, BallTracker, DetectionEngine
+from keypoint_detection import KeypointDetector, CourtKeypointTracker
 from dotenv import load_dotenv
 from mini_court import MiniCourt
-from copy import deepcopy
-from tqdm import tqdm
+from match_stats import compute_match_stats
 
 def main():
     load_dotenv()
-
-    # Load Video Frames
+    ensure_directories()
     video_path = f"{SAMPLE_DATA_DIR}/sample.mp4"
-    video_frames = load_video_frames(video_path)
-
-    # PlayerTracker: Init + Detection
-    player_tracker = PlayerTracker(model_path=f"{MODELS_DIR}/best.pt")
-    player_detection = player_tracker.detect_frames(
-        video_frames,
-        read_from_stub=False,
-        stub_path=f"{TRACKER_STUB_DIR}/player_detection.pkl",
-    )
-
-    # BallTracker: Init + Detection
-    ball_tracker = BallTracker(model_path=f"{MODELS_DIR}/best.pt")
-    ball_detection = ball_tracker.detect_frames(
-        video_frames,
-        read_from_stub=False,
-        stub_path=f"{TRACKER_STUB_DIR}/ball_detection.pkl",
-    )
 
-    # KeypointDetector: Init + Prediction
-    keypoint_detector = KeypointDetector(model_path=f"{MODELS_DIR}/keypoints_model.pth")
-    keypoint_predictions = keypoint_detector.predict(video_frames[0])
+    # Per-stage wall time, frames/sec, peak RSS growth (+ allocations if enabled)
+    profiler = StageProfiler(trace_allocations=PROFILE_TRACE_ALLOCATIONS)
 
-    # MiniCourt: Init + Draw
-    mini_court = MiniCourt(video_frames[0])
+    # DetectionEngine + KeypointDetector: Init
+    with profiler.stage("detection_model_load"):
+        detection_engine = DetectionEngine(
+            model_path=f"{MODELS_DIR}/best.pt",
+            backend=INFERENCE_BACKEND,
+            onnx_cache_dir=ONNX_CACHE_DIR,
+        )
+    with profiler.stage("keypoint_model_load"):
+        # int8 runs on the torch backend; it is calibrated on frames of the video
+        # the first time, then loaded from the cache
+        int8 = KEYPOINT_PRECISION == "int8"
+        keypoint_detector = KeypointDetector(
+            model_path=f"{MODELS_DIR}/keypoints_model.pth",
+            backend="torch" if int8 else INFERENCE_BACKEND,
+            onnx_cache_dir=ONNX_CACHE_DIR,
+            precision=KEYPOINT_PRECISION,
+            calibration_images=(
+                sample_video_frames(video_path, KEYPOINT_CALIBRATION_FRAMES) if int8 else None
+            ),
+            quantized_cache_dir=QUANTIZED_CACHE_DIR,
+        )
 
-    # PlayerTracker: Interpolation + Filtering
-    player_detection = player_tracker.interpolate_player_positions(player_detection)
-    player_detection = player_tracker.choose_and_filter_players(
-        keypoint_predictions, player_detection
+    # Detections are cached by video content + weights + parameters, so re-runs skip inference
+    detection_cache = DetectionCache(
+        DETECTION_CACHE_DIR, max_bytes=DETECTION_CACHE_MAX_BYTES
     )
 
-    # BallTracker: Interpolation
-    ball_detection = ball_tracker.interpolate_ball_positions(ball_detection)
-
-    # BallTracker: Detect Ball Hits
-    ball_hit_frames = ball_tracker.detect_hits(ball_detection)
-
-    # MiniCourt: Convert Player + Tennis Ball Bounding Boxes to Mini Court Coordinates
-    player_mini_court_detection, ball_mini_court_detection = (
-        mini_court.add_to_minicourt(
-            player_detection, ball_detection, keypoint_predictions
+    # Court keypoints follow the camera: CNN on keyframes, homography tracking between
+    court_tracker = (
+        CourtKeypointTracker(
+            keypoint_detector, max_keyframe_interval=KEYPOINT_MAX_KEYFRAME_INTERVAL
         )
+        if KEYPOINT_TRACKING
+        else None
     )
 
-    player_stats = [
-        {
-            "frame_num": 0,
-            "player_1_number_of_shots": 0,
-            "player_1_total_shot_speed": 0,
-            "player_1_last_shot_speed": 0,
-            "player_1_total_player_speed": 0,
-            "player_1_last_player_speed": 0,
-            "player_2_number_of_shots": 0,
-            "player_2_total_shot_speed": 0,
-            "player_2_last_shot_speed": 0,
-            "player_2_total_player_speed": 0,
-            "player_2_last_player_speed": 0,
-        }
-    ]
-
-    for frame_idx in tqdm(
-        range(len(ball_hit_frames) - 1), desc="Computing Player and Ball Metrics..."
-    ):
-        # Calculate Hit Duration
-        start = ball_hit_frames[frame_idx]
-        end = ball_hit_frames[frame_idx + 1]
-        hit_duration_seconds = (end - start) / 24
-
-        # Calculate Distance
-        ball_distance_px = measure_distance(
-            ball_mini_court_detection[start][1], ball_mini_court_detection[end][1]
-        )
-        ball_distance_meters = convert_pixel_distance_to_meters(
-            ball_distance_px, DOUBLE_LINE_WIDTH, mini_court.get_width_of_mini_court()
-        )
-        ball_speed = (
-            ball_distance_meters / hit_duration_seconds * 3.6
-        )  # 3.6 to convert m/s to km/h
-
-        # Get Player Who Shot Ball
-        player_positions = player_mini_court_detection[start]
-        player_who_hit = min(
-            player_positions.keys(),
-            key=lambda id: measure_distance(
-                player_positions[id], ball_mini_court_detection[start][1]
-            ),
-        )
+    run_pipeline(
+        video_path,
+        f"{TEST_OUTPUT_DIR}/output_video_frames.mp4",
+        detection_engine,
+        keypoint_detector,
+        court_tracker=court_tracker,
+        profiler=profiler,
+        detection_cache=detection_cache,
+        tracking_data_path=f"{TEST_OUTPUT_DIR}/tracking_data.parquet",
+    )
 
-        # Opponent Player Speed
-        opponent_player = 1 if player_who_hit == 2 else 2
-        distance_covered_by_opponent_px = measure_distance(
-            player_mini_court_detection[start][opponent_player],
-            player_mini_court_detection[end][opponent_player],
+    # Profiling Report (JSON + optional Prometheus text format)
+    print(profiler.format_report())
+    profiler.write_json(f"{TEST_OUTPUT_DIR}/profile.json")
+    if PROFILE_PROMETHEUS:
+        profiler.write_prometheus(f"{TEST_OUTPUT_DIR}/profile.prom")
+
+
+def run_pipeline(
+    video_path,
+    output_path,
+    detection_engine,
+    keypoint_detector,
+    court_tracker=None,
+    profiler=None,
+    detection_cache=None,
+    tracking_data_path=None,
+    render_workers=RENDER_WORKERS,
+):
+    """
+    Analyze a video and export the annotated video, timing every stage.
+
+    :param video_path: Input video.
+    :param output_path: Annotated output video.
+    :param detection_engine: Detector with detect_frames(frames, batch_size, cache, as_tables)
+                             returning (player_detections, ball_detections) tables.
+    :param keypoint_detector: Court keypoint detector (predict + keypoint_layer).
+    :param court_tracker: Optional CourtKeypointTracker for per-frame court keypoints;
+                          otherwise the keypoints of the first frame are used throughout.
+    :param profiler: StageProfiler receiving the stage timings; a new one by default.
+    :param detection_cache: Optional DetectionCache for the detections.
+    :param tracking_data_path: Optional Parquet file for the per-frame tracking data.
+    :param render_workers: Threads drawing the annotations.
+    :return: The profiler.
+    """
+    profiler = profiler or StageProfiler()
+
+    # Open Video Frames (decoded lazily, so memory stays flat for long matches)
+    video_frames = VideoFrameSource(video_path)
+    num_frames = len(video_frames)
+
+    # DetectionEngine: Detection (one forward pass per frame for players and ball)
+    with profiler.stage("detect_frames", frames=num_frames):
+        player_detection, ball_detection = detection_engine.detect_frames(
+            video_frames,
+            batch_size=DETECTION_BATCH_SIZE,
+            cache=detection_cache,
+            # Columnar for the rest of the pipeline, with the detection confidences
+            as_tables=True,
         )
-        distance_covered_by_opponent_meters = convert_pixel_distance_to_meters(
-            distance_covered_by_opponent_px,
-            DOUBLE_LINE_WIDTH,
-            mini_court.get_width_of_mini_court(),
-        )
-        opponent_speed = (
-            distance_covered_by_opponent_meters / hit_duration_seconds * 3.6
+    if detection_cache is not None:
+        print(f"Detection cache: {detection_cache.stats()}")
+
+    # PlayerTracker + BallTracker: Init (post-processing and drawing only)
+    player_tracker = PlayerTracker()
+    ball_tracker = BallTracker()
+
+    # KeypointDetector: Prediction (per frame when tracked, else on the first frame)
+    if court_tracker is not None:
+        with profiler.stage("track_court_keypoints", frames=num_frames):
+            keypoint_predictions = court_tracker.track_frames(video_frames)
+        print(
+            f"Court keypoints: CNN on {len(court_tracker.keyframes)} of {num_frames} frames"
         )
+        first_frame_keypoints = keypoint_predictions[0]
+    else:
+        with profiler.stage("keypoint_predict", frames=1):
+            keypoint_predictions = keypoint_detector.predict(video_frames[0])
+        first_frame_keypoints = keypoint_predictions
 
-        current_frame_stats = deepcopy(player_stats[-1])
-        current_frame_stats["frame_num"] = start
-        current_frame_stats[f"player_{player_who_hit}_number_of_shots"] += 1
-        current_frame_stats[f"player_{player_who_hit}_total_shot_speed"] += ball_speed
-        current_frame_stats[f"player_{player_who_hit}_last_shot_speed"] = ball_speed
-        current_frame_stats[f"player_{opponent_player}_total_player_speed"] += (
-            opponent_speed
+    # MiniCourt: Init + Draw
+    mini_court = MiniCourt(video_frames[0])
+
+    # PlayerTracker: Filtering (chosen players become player 1 and 2) + Interpolation
+    with profiler.stage("filter_players", frames=num_frames):
+        player_detection = player_tracker.choose_and_filter_players(
+            first_frame_keypoints, player_detection, relabel=True
         )
-        current_frame_stats[f"player_{opponent_player}_last_player_speed"] = (
-            opponent_speed
+    with profiler.stage("interpolate_players", frames=num_frames):
+        player_detection = player_tracker.interpolate_player_positions(
+            player_detection, max_gap=PLAYER_INTERPOLATION_MAX_GAP
         )
 
-        player_stats.append(current_frame_stats)
-
-    player_stats_df = pd.DataFrame(player_stats)
-    frames_df = pd.DataFrame({"frame_num": range(len(video_frames))})
-    player_stats_df = pd.merge(frames_df, player_stats_df, on="frame_num", how="left")
-    player_stats_data_df = player_stats_df.ffill()
+    # BallTracker: Interpolation
+    with profiler.stage("interpolate_ball", frames=num_frames):
+        ball_detection = ball_tracker.interpolate_ball_positions(ball_detection)
 
-    player_stats_data_df["player_1_avg_shot_speed"] = (
-        player_stats_data_df["player_1_total_shot_speed"]
-        / player_stats_data_df["player_1_number_of_shots"]
-    )
-    player_stats_data_df["player_2_avg_shot_speed"] = (
-        player_stats_data_df["player_2_total_shot_speed"]
-        / player_stats_data_df["player_2_number_of_shots"]
-    )
-    player_stats_data_df["player_1_avg_player_speed"] = (
-        player_stats_data_df["player_1_total_player_speed"]
-        / player_stats_data_df["player_1_number_of_shots"]
-    )
-    player_stats_data_df["player_2_avg_player_speed"] = (
-        player_stats_data_df["player_2_total_player_speed"]
-        / player_stats_data_df["player_2_number_of_shots"]
-    )
+    # BallTracker: Detect Ball Hits
+    with profiler.stage("detect_hits", frames=num_frames):
+        ball_hit_frames = ball_tracker.detect_hits(ball_detection)
 
-    # Draw Bounding Boxes: Players + Ball + Keypoints
-    output_video_frames = player_tracker.draw_bboxes(video_frames, player_detection)
-    output_video_frames = ball_tracker.draw_bboxes(video_frames, ball_detection)
-    output_video_frames = keypoint_detector.draw_keypoints_on_video(
-        video_frames, keypoint_predictions
-    )
+    # MiniCourt: Convert Player + Tennis Ball Bounding Boxes to Mini Court Coordinates
+    with profiler.stage("add_to_minicourt", frames=num_frames):
+        player_mini_court_detection, ball_mini_court_detection = (
+            mini_court.add_to_minicourt(
+                player_detection, ball_detection, keypoint_predictions
+            )
+        )
 
-    # Add MiniCourt To Video Frames
-    output_video_frames = mini_court.add_court_to_frames(output_video_frames)
+    # Match Stats: Shot + Player Speeds per Frame
+    with profiler.stage("match_stats", frames=num_frames):
+        player_stats_data_df = compute_match_stats(
+            ball_hit_frames,
+            player_mini_court_detection,
+            ball_mini_court_detection,
+            fps=video_frames.fps,
+            mini_court_width=mini_court.get_width_of_mini_court(),
+            num_frames=num_frames,
+        )
 
-    # Draw Player + Ball Positions on MiniCourt
-    output_video_frames = mini_court.draw_positions_on_court(
-        output_video_frames, player_mini_court_detection, color=(0, 255, 255)
+    # Export Tracking Data + Stats (columnar, for analytics without re-running the pipeline)
+    if tracking_data_path is not None:
+        with profiler.stage("export_tracking_data", frames=num_frames):
+            export_tracking_data(
+                tracking_data_path,
+                player_detection,
+                ball_detection,
+                player_mini_court_detection,
+                ball_mini_court_detection,
+                player_stats_data_df,
+            )
+
+    # Render every annotation in a single pass per frame, chunks of frames in parallel
+    # (each layer is timed as "draw_<name>", summed across render threads)
+    layers = {
+        # Bounding Boxes: Players + Ball + Keypoints
+        "player_bboxes": player_tracker.bbox_layer(player_detection),
+        "ball_bboxes": ball_tracker.bbox_layer(ball_detection),
+        "keypoints": keypoint_detector.keypoint_layer(keypoint_predictions),
+        # MiniCourt + Player and Ball Positions on it
+        "mini_court": mini_court.court_layer(),
+        "player_positions": mini_court.positions_layer(
+            player_mini_court_detection, color=(0, 255, 255)
+        ),
+        "ball_positions": mini_court.positions_layer(ball_mini_court_detection),
+        # Player Stats + Frame Number (Top Left Corner)
+        "stats": stats_layer(player_stats_data_df),
+        "frame_number": frame_number_layer(),
+    }
+    renderer = FrameRenderer(
+        [profiler.wrap_layer(f"draw_{name}", layer) for name, layer in layers.items()],
+        workers=render_workers,
+        chunk_size=RENDER_CHUNK_SIZE,
+        max_pending_frames=RENDER_MAX_PENDING_FRAMES,
     )
-    output_video_frames = mini_court.draw_positions_on_court(
-        output_video_frames, ball_mini_court_detection
-    )
-
-    # Draw Player Stats on Video Frames
-    output_video_frames = display_stats(output_video_frames, player_stats_data_df)
-
-    # Draw Frame Number (Top Left Corner)
-    for i, frame in enumerate(output_video_frames):
-        cv2.putText(
-            frame,
-            f"Frame: {i}",
-            (10, 30),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (0, 0, 255),
-            2,
-        )
+    output_video_frames = renderer.render(profiler.wrap("decode", video_frames))
 
     # Export Video To Specified Path
-    export_video(output_video_frames, f"{TEST_OUTPUT_DIR}/output_video_frames.mp4")
+    # (frames are decoded and rendered as they are written, so "export_video"
+    # includes the time of "decode" and the draw stages)
+    with profiler.stage("export_video", frames=num_frames):
+        export_video(output_video_frames, output_path, fps=video_frames.fps)
+    video_frames.close()
+
+    return profiler
 
 
 if __name__ == "__main__":
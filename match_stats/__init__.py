@@ -0,0 +1,7 @@
+from .match_stats import (
+    compute_match_stats,
+    positions_to_array,
+    shot_speeds,
+    MatchStatsAccumulator,
+    MATCH_STATS_COLUMNS,
+)
@@ -0,0 +1,275 @@
+import numpy as np
+from config import DOUBLE_LINE_WIDTH
+from utils import convert_pixel_distance_to_meters
+
+# Per-player running stats, in the order of the columns of the stats table
+PLAYER_STATS = [
+    "number_of_shots",
+    "total_shot_speed",
+    "last_shot_speed",
+    "total_player_speed",
+    "last_player_speed",
+]
+
+MATCH_STATS_COLUMNS = (
+    ["frame_num"]
+    + [f"player_{pid}_{stat}" for pid in (1, 2) for stat in PLAYER_STATS]
+    + [
+        "player_1_avg_shot_speed",
+        "player_2_avg_shot_speed",
+        "player_1_avg_player_speed",
+        "player_2_avg_player_speed",
+    ]
+)
+
+
+def positions_to_array(positions, keys, num_frames=None):
+    """
+    Convert per-frame position dicts into a dense array.
+
+    Parameters:
+    positions (list | np.ndarray): One {key: (x, y)} dict per frame (as returned by
+        MiniCourt.add_to_minicourt), or an array that is returned as is.
+    keys (list): Keys to extract, in the order of the second axis of the result.
+    num_frames (int): Number of frames; defaults to len(positions).
+
+    Returns:
+    np.ndarray: (num_frames, len(keys), 2) array, NaN where a key is missing.
+    """
+    if isinstance(positions, np.ndarray):
+        return positions.astype(np.float64, copy=False)
+
+    num_frames = len(positions) if num_frames is None else num_frames
+    dense = np.full((num_frames, len(keys), 2), np.nan)
+    for frame_num, frame_positions in enumerate(positions[:num_frames]):
+        for i, key in enumerate(keys):
+            if key in frame_positions:
+                dense[frame_num, i] = frame_positions[key]
+    return dense
+
+
+def compute_match_stats(
+    ball_hit_frames,
+    player_positions,
+    ball_positions,
+    fps,
+    mini_court_width,
+    num_frames=None,
+    court_width_meters=DOUBLE_LINE_WIDTH,
+):
+    """
+    Compute shot speed, opponent speed and their running totals and averages per frame.
+
+    For every shot (from one hit to the next) the shot speed is credited to the
+    player closest to the ball at the hit, and the distance the other player
+    covered meanwhile is their player speed. Totals are running sums over the
+    shots so far and every frame carries the stats of the last hit at or before it.
+
+    Parameters:
+    ball_hit_frames (list): Frame numbers of the ball hits, in increasing order.
+    player_positions (list | np.ndarray): Mini court player positions, one
+        {player_id: (x, y)} dict per frame for players 1 and 2, or a
+        (num_frames, 2, 2) array with player 1 first.
+    ball_positions (list | np.ndarray): Mini court ball positions, one {1: (x, y)} dict
+        per frame, or a (num_frames, 2) array.
+    fps (float): Frame rate of the video.
+    mini_court_width (float): Width of the mini court in pixels
+        (MiniCourt.get_width_of_mini_court()).
+    num_frames (int): Number of frames; defaults to the length of the position inputs.
+    court_width_meters (float): Real court width matching mini_court_width.
+
+    Returns:
+    pd.DataFrame: One row per frame with the columns of MATCH_STATS_COLUMNS; speeds
+        are in km/h and averages are NaN until the player has a shot.
+    """
+    import pandas as pd  # imported on use to keep the package import fast
+
+    if num_frames is None:
+        num_frames = len(ball_positions)
+    player_xy = positions_to_array(player_positions, [1, 2], num_frames)
+    ball_xy = positions_to_array(ball_positions, [1], num_frames).reshape(-1, 2)
+
+    hit_frames = np.asarray(ball_hit_frames, dtype=np.int64)
+    start, end = hit_frames[:-1], hit_frames[1:]
+    ball_speed, hitter, opponent_speed = shot_speeds(
+        (end - start) / fps,
+        player_xy[start],
+        player_xy[end],
+        ball_xy[start],
+        ball_xy[end],
+        mini_court_width,
+        court_width_meters,
+    )
+    opponent = 1 - hitter
+
+    # Stats after each hit: row 0 is the start of the match, row k + 1 the k-th shot
+    shot_stats = {}
+    for player_index, pid in enumerate((1, 2)):
+        is_hitter = hitter == player_index
+        is_opponent = opponent == player_index
+        shot_stats[f"player_{pid}_number_of_shots"] = np.cumsum(is_hitter, dtype=np.float64)
+        shot_stats[f"player_{pid}_total_shot_speed"] = np.cumsum(
+            np.where(is_hitter, ball_speed, 0.0)
+        )
+        shot_stats[f"player_{pid}_last_shot_speed"] = _last_value(ball_speed, is_hitter)
+        shot_stats[f"player_{pid}_total_player_speed"] = np.cumsum(
+            np.where(is_opponent, opponent_speed, 0.0)
+        )
+        shot_stats[f"player_{pid}_last_player_speed"] = _last_value(
+            opponent_speed, is_opponent
+        )
+
+    # Each frame takes the stats of the last hit at or before it
+    frame_num = np.arange(num_frames)
+    stats_row = np.searchsorted(start, frame_num, side="right")
+
+    match_stats = {"frame_num": frame_num}
+    for column, values in shot_stats.items():
+        match_stats[column] = np.r_[0.0, values][stats_row]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for pid in (1, 2):
+            number_of_shots = match_stats[f"player_{pid}_number_of_shots"]
+            match_stats[f"player_{pid}_avg_shot_speed"] = (
+                match_stats[f"player_{pid}_total_shot_speed"] / number_of_shots
+            )
+            match_stats[f"player_{pid}_avg_player_speed"] = (
+                match_stats[f"player_{pid}_total_player_speed"] / number_of_shots
+            )
+
+    return pd.DataFrame(match_stats, columns=MATCH_STATS_COLUMNS)
+
+
+def shot_speeds(
+    hit_duration_seconds,
+    player_start,
+    player_end,
+    ball_start,
+    ball_end,
+    mini_court_width,
+    court_width_meters=DOUBLE_LINE_WIDTH,
+):
+    """
+    Ball speed, hitter and opponent speed of a batch of shots.
+
+    Parameters:
+    hit_duration_seconds (np.ndarray): (n,) duration of each shot.
+    player_start (np.ndarray): (n, 2, 2) mini court positions of players 1 and 2 at the hit.
+    player_end (np.ndarray): (n, 2, 2) positions of the players at the next hit.
+    ball_start (np.ndarray): (n, 2) mini court ball position at the hit.
+    ball_end (np.ndarray): (n, 2) ball position at the next hit.
+    mini_court_width (float): Width of the mini court in pixels.
+    court_width_meters (float): Real court width matching mini_court_width.
+
+    Returns:
+    tuple: (ball_speed, hitter, opponent_speed); speeds in km/h and hitter the index
+        (0 or 1) of the player who hit the ball.
+    """
+
+    def speed_kmh(from_xy, to_xy):
+        distance_px = (
+            (from_xy[:, 0] - to_xy[:, 0]) ** 2 + (from_xy[:, 1] - to_xy[:, 1]) ** 2
+        ) ** 0.5
+        distance_meters = convert_pixel_distance_to_meters(
+            distance_px, court_width_meters, mini_court_width
+        )
+        return distance_meters / hit_duration_seconds * 3.6  # m/s to km/h
+
+    # Shot speed from where the ball was hit to where the next hit happens
+    ball_speed = speed_kmh(ball_start, ball_end)
+
+    # The player closest to the ball hit it; the other one is the opponent
+    player_to_ball = (
+        (player_start[:, :, 0] - ball_start[:, None, 0]) ** 2
+        + (player_start[:, :, 1] - ball_start[:, None, 1]) ** 2
+    ) ** 0.5
+    hitter = np.argmin(np.nan_to_num(player_to_ball, nan=np.inf), axis=1)
+    shot_index = np.arange(len(hitter))
+    opponent_speed = speed_kmh(
+        player_start[shot_index, 1 - hitter], player_end[shot_index, 1 - hitter]
+    )
+
+    return ball_speed, hitter, opponent_speed
+
+
+class MatchStatsAccumulator:
+    """
+    Running match stats updated one shot at a time, for streaming use.
+
+    Produces the same rows as compute_match_stats: add each shot once its next hit
+    is known, and row() gives the stats of the frames from that shot's hit on.
+
+    Parameters:
+    fps (float): Frame rate of the video.
+    mini_court_width (float): Width of the mini court in pixels.
+    court_width_meters (float): Real court width matching mini_court_width.
+    """
+
+    def __init__(self, fps, mini_court_width, court_width_meters=DOUBLE_LINE_WIDTH):
+        self.fps = fps
+        self.mini_court_width = mini_court_width
+        self.court_width_meters = court_width_meters
+        self.stats = {
+            f"player_{pid}_{stat}": np.float64(0.0)
+            for pid in (1, 2)
+            for stat in PLAYER_STATS
+        }
+
+    def add_shot(
+        self, start_frame, end_frame, player_start, player_end, ball_start, ball_end
+    ):
+        """
+        Add the shot hit at start_frame, given the positions at its hit and the next one.
+
+        Parameters:
+        start_frame (int): Frame of the hit.
+        end_frame (int): Frame of the next hit.
+        player_start (dict): {player_id: (x, y)} mini court positions at start_frame.
+        player_end (dict): Mini court positions of the players at end_frame.
+        ball_start (dict): {1: (x, y)} mini court ball position at start_frame.
+        ball_end (dict): Mini court ball position at end_frame.
+        """
+        player_xy = positions_to_array([player_start, player_end], [1, 2])
+        ball_xy = positions_to_array([ball_start, ball_end], [1]).reshape(-1, 2)
+        ball_speed, hitter, opponent_speed = shot_speeds(
+            np.array([(end_frame - start_frame) / self.fps]),
+            player_xy[:1],
+            player_xy[1:],
+            ball_xy[:1],
+            ball_xy[1:],
+            self.mini_court_width,
+            self.court_width_meters,
+        )
+
+        hitter_id = int(hitter[0]) + 1
+        opponent_id = 3 - hitter_id
+        self.stats[f"player_{hitter_id}_number_of_shots"] += 1.0
+        self.stats[f"player_{hitter_id}_total_shot_speed"] += ball_speed[0]
+        self.stats[f"player_{hitter_id}_last_shot_speed"] = ball_speed[0]
+        self.stats[f"player_{opponent_id}_total_player_speed"] += opponent_speed[0]
+        self.stats[f"player_{opponent_id}_last_player_speed"] = opponent_speed[0]
+
+    def row(self, frame_num):
+        """
+        Stats row of a frame after the shots added so far (columns of MATCH_STATS_COLUMNS).
+        """
+        row = {"frame_num": frame_num}
+        row.update({column: float(value) for column, value in self.stats.items()})
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for pid in (1, 2):
+                number_of_shots = self.stats[f"player_{pid}_number_of_shots"]
+                row[f"player_{pid}_avg_shot_speed"] = float(
+                    self.stats[f"player_{pid}_total_shot_speed"] / number_of_shots
+                )
+                row[f"player_{pid}_avg_player_speed"] = float(
+                    self.stats[f"player_{pid}_total_player_speed"] / number_of_shots
+                )
+        return {column: row[column] for column in MATCH_STATS_COLUMNS}
+
+
+def _last_value(values, is_set):
+    """
+    Running "last value where is_set", 0 before the first one.
+    """
+    last_index = np.maximum.accumulate(np.where(is_set, np.arange(len(values)), -1))
+    return np.where(last_index >= 0, values[np.maximum(last_index, 0)], 0.0)
@@ -16,12 +16,10 @@ from config import (
 from utils import (
     convert_meters_to_pixel_distance,
     convert_pixel_distance_to_meters,
-    get_foot_position,
-    get_closest_keypoint_index,
-    get_height_of_bbox,
     measure_xy_distance,
-    get_center_of_bbox,
-    measure_distance,
+    map_frames,
+    sliding_window_max,
+    DetectionTable,
 )
 
 
@@ -36,6 +34,7 @@ class MiniCourt:
         self.set_mini_court_position()
         self.set_court_drawing_key_points()
         self.set_court_lines()
+        self.set_court_sprite()
 
     def convert_meters_to_pixels(self, meters):
         return convert_meters_to_pixel_distance(
@@ -143,37 +142,101 @@ class MiniCourt:
         self.start_x = self.end_x - self.drawing_rectangle_width
         self.start_y = self.end_y - self.drawing_rectangle_height
 
-    def draw_court(self, frame):
+    def draw_court(self, frame, origin=(0, 0)):
+        """
+        Draw the court key points, lines and net.
+
+        :param frame: Image to draw on.
+        :param origin: Frame coordinates of the image's top left corner, for drawing
+                       into a cropped region instead of a full frame.
+        """
+        origin_x, origin_y = origin
+
         for i in range(0, len(self.drawing_key_points), 2):
-            x = int(self.drawing_key_points[i])
-            y = int(self.drawing_key_points[i + 1])
+            x = int(self.drawing_key_points[i]) - origin_x
+            y = int(self.drawing_key_points[i + 1]) - origin_y
             cv2.circle(frame, (x, y), 5, (0, 0, 255), -1)
 
         # draw Lines
         for line in self.lines:
             start_point = (
-                int(self.drawing_key_points[line[0] * 2]),
-                int(self.drawing_key_points[line[0] * 2 + 1]),
+                int(self.drawing_key_points[line[0] * 2]) - origin_x,
+                int(self.drawing_key_points[line[0] * 2 + 1]) - origin_y,
             )
             end_point = (
-                int(self.drawing_key_points[line[1] * 2]),
-                int(self.drawing_key_points[line[1] * 2 + 1]),
+                int(self.drawing_key_points[line[1] * 2]) - origin_x,
+                int(self.drawing_key_points[line[1] * 2 + 1]) - origin_y,
             )
             cv2.line(frame, start_point, end_point, (0, 0, 0), 2)
 
         # Draw net
         net_start_point = (
-            self.drawing_key_points[0],
-            int((self.drawing_key_points[1] + self.drawing_key_points[5]) / 2),
+            self.drawing_key_points[0] - origin_x,
+            int((self.drawing_key_points[1] + self.drawing_key_points[5]) / 2) - origin_y,
         )
         net_end_point = (
-            self.drawing_key_points[2],
-            int((self.drawing_key_points[1] + self.drawing_key_points[5]) / 2),
+            self.drawing_key_points[2] - origin_x,
+            int((self.drawing_key_points[1] + self.drawing_key_points[5]) / 2) - origin_y,
         )
         cv2.line(frame, net_start_point, net_end_point, (255, 0, 0), 2)
 
         return frame
 
+    def set_court_sprite(self):
+        """
+        Pre-render the static court graphic once, cropped to the background rectangle.
+
+        The sprite holds the drawn pixels and a mask of which pixels were drawn on.
+        The mask comes from drawing the court on a black and a white canvas: only
+        pixels the court covers end up the same on both.
+        """
+        sprite_height = self.end_y - self.start_y + 1
+        sprite_width = self.end_x - self.start_x + 1
+        origin = (self.start_x, self.start_y)
+
+        on_black = self.draw_court(
+            np.zeros((sprite_height, sprite_width, 3), np.uint8), origin
+        )
+        on_white = self.draw_court(
+            np.full((sprite_height, sprite_width, 3), 255, np.uint8), origin
+        )
+
+        self.court_sprite = on_black
+        self.court_sprite_mask = (on_black == on_white).all(axis=2)
+        self.court_sprite_background = np.full_like(on_black, 255)
+
+    def draw_court_overlay(self, frame):
+        """
+        Blend the background rectangle and paste the court sprite, in place.
+
+        Same pixels as draw_court(draw_background_rectangle(frame)), but only the
+        rectangle's region of the frame is read or written.
+        """
+        # Clip the sprite region to the frame
+        x0, y0 = max(self.start_x, 0), max(self.start_y, 0)
+        x1 = min(self.end_x + 1, frame.shape[1])
+        y1 = min(self.end_y + 1, frame.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return frame
+
+        sprite_region = (
+            slice(y0 - self.start_y, y1 - self.start_y),
+            slice(x0 - self.start_x, x1 - self.start_x),
+        )
+        roi = frame[y0:y1, x0:x1]
+
+        alpha = 0.5
+        cv2.addWeighted(
+            roi, alpha, self.court_sprite_background[sprite_region], 1 - alpha, 0, dst=roi
+        )
+        np.copyto(
+            roi,
+            self.court_sprite[sprite_region],
+            where=self.court_sprite_mask[sprite_region][..., None],
+        )
+
+        return frame
+
     def draw_background_rectangle(self, frame):
         shapes = np.zeros_like(frame, np.uint8)
         # Draw the rectangle
@@ -243,15 +306,32 @@ class MiniCourt:
 
         return mini_court_player_position
 
-    def add_to_minicourt(self, player_boxes, ball_boxes, court_key_points):
+    def add_to_minicourt(
+        self,
+        player_boxes,
+        ball_boxes,
+        court_key_points,
+        height_window_before=20,
+        height_window_after=50,
+    ):
         """
         Convert the bounding boxes of players and the ball into their positions on the mini court.
 
+        Runs on arrays: the per-player max bbox height over the window
+        [frame - height_window_before, frame + height_window_after) is a linear-time
+        sliding max, and every detection is projected in one vectorized pass.
+
         :param player_boxes: List of dictionaries, one per frame. Each dictionary has:
                             { player_id: [x1, y1, x2, y2], ... }
+                            A DetectionTable is accepted as well.
         :param ball_boxes:   List of dictionaries, one per frame. Each dictionary has:
                             { 1: [x1, y1, x2, y2] } or possibly empty if no ball was detected.
-        :param court_key_points: The key points of the mini court [x0,y0,x1,y1,...].
+                            A DetectionTable is accepted as well.
+        :param court_key_points: The key points of the court [x0,y0,x1,y1,...], or one
+                                 row of key points per frame (num_frames, 28) when
+                                 they are tracked through a moving camera.
+        :param height_window_before: Frames before the current one used for the max player height.
+        :param height_window_after: Frames from the current one on used for the max player height.
         :return: (mini_court_player_boxes, mini_court_ball_boxes)
                 where each is a list (one entry per frame).
                 mini_court_player_boxes[frame] => { player_id: (x,y) on mini court }
@@ -263,123 +343,180 @@ class MiniCourt:
             2: PLAYER_2_HEIGHT_METERS,
         }
 
-        mini_court_player_boxes = []
-        mini_court_ball_boxes = []
-
-        # Go through each frame
-        for frame_num, player_dict in enumerate(player_boxes):
-            # Grab the ball bounding box if it exists. (ball_boxes[frame_num] might be empty)
-            ball_dict = ball_boxes[frame_num]
-            ball_box = ball_dict.get(1, None)  # If not detected, returns None
-
-            if ball_box is not None:
-                # If we found a ball in this frame, get its center
-                ball_center = get_center_of_bbox(ball_box)
-            else:
-                # No ball detected this frame
-                ball_center = None
-
-            # Decide which player is "closest" to the ball — but only if we have a ball
-            if ball_center is not None and len(player_dict) > 0:
-                # If at least one player is detected, find the player with minimal distance to the ball
-                # (Assuming player_dict has {player_id: [x1, y1, x2, y2]} items)
-                closest_player_id = min(
-                    player_dict.keys(),
-                    key=lambda pid: measure_distance(
-                        ball_center, get_center_of_bbox(player_dict[pid])
-                    ),
-                )
-            else:
-                # No ball or no players => can't determine a closest player
-                closest_player_id = None
-
-            # We pick a window around the current frame to find the max player heights
-            frame_min = max(0, frame_num - 20)
-            frame_max = min(len(player_boxes), frame_num + 50)
-
-            # Build a dict: {player_id: max_height_in_bbox_over_window}
-            # Only if that player_id is in our expected dictionary
-            max_heights = {}
-            for pid, bbox in player_dict.items():
-                if pid not in player_heights:
-                    continue  # Skip unknown players to avoid KeyError
-                # Collect all bounding boxes for this pid in [frame_min, frame_max)
-                heights_for_pid = []
-                for i in range(frame_min, frame_max):
-                    if pid in player_boxes[i]:
-                        heights_for_pid.append(get_height_of_bbox(player_boxes[i][pid]))
-                if len(heights_for_pid) > 0:
-                    max_heights[pid] = max(heights_for_pid)
-                else:
-                    # Fallback if we never found any bounding box
-                    max_heights[pid] = get_height_of_bbox(bbox)
-
-            mini_court_player_dict = {}
-
-            # Convert each player's foot position to mini-court coordinates
-            for pid, bbox in player_dict.items():
-                # Skip if this player's ID isn't in our dictionary or we have no max height
-                if pid not in player_heights or pid not in max_heights:
-                    continue
-
-                foot_pos = get_foot_position(bbox)
-                # We pick among the "four corners" [0,2,12,13] to find the nearest key point
-                closest_key_idx = get_closest_keypoint_index(
-                    foot_pos, court_key_points, [0, 2, 12, 13]
-                )
-                closest_key = (
-                    court_key_points[closest_key_idx * 2],
-                    court_key_points[closest_key_idx * 2 + 1],
-                )
-
-                # Convert foot position to mini court position
-                mini_court_player_pos = self.get_mini_court_coordinates(
-                    object_position=foot_pos,
-                    closest_key_point=closest_key,
-                    closest_key_point_index=closest_key_idx,
-                    player_height_in_pixels=max_heights[pid],
-                    player_height_in_meters=player_heights[pid],
-                )
-                mini_court_player_dict[pid] = mini_court_player_pos
-
-                # If this player is the closest to the ball, we also map the ball
-                if pid == closest_player_id and ball_center is not None:
-                    # Recompute which key point is closest to the ball
-                    ball_closest_key_idx = get_closest_keypoint_index(
-                        ball_center, court_key_points, [0, 2, 12, 13]
-                    )
-                    ball_closest_key = (
-                        court_key_points[ball_closest_key_idx * 2],
-                        court_key_points[ball_closest_key_idx * 2 + 1],
-                    )
-
-                    # Convert ball center to mini court position
-                    mini_court_ball_pos = self.get_mini_court_coordinates(
-                        object_position=ball_center,
-                        closest_key_point=ball_closest_key,
-                        closest_key_point_index=ball_closest_key_idx,
-                        player_height_in_pixels=max_heights[pid],
-                        player_height_in_meters=player_heights[pid],
-                    )
-                    mini_court_ball_boxes.append({1: mini_court_ball_pos})
-
-            # If no ball mapped (e.g., no players or no ball), append an empty dict or a None
-            if len(mini_court_ball_boxes) < (frame_num + 1):
-                mini_court_ball_boxes.append({})
-
-            mini_court_player_boxes.append(mini_court_player_dict)
+        if not isinstance(player_boxes, DetectionTable):
+            player_boxes = DetectionTable.from_dicts(player_boxes)
+        num_frames = player_boxes.num_frames
+
+        # Ball bounding box (key 1) per frame, NaN if not detected
+        if not isinstance(ball_boxes, DetectionTable):
+            ball_boxes = DetectionTable.from_dicts(ball_boxes)
+        ball_xyxy = np.full((num_frames, 4), np.nan)
+        ball_track = ball_boxes.dense_track(1)[:num_frames]
+        ball_xyxy[: len(ball_track)] = ball_track
+
+        # Do the court math in the precision of the key points, like the scalar version did
+        court_key_points = np.asarray(court_key_points)
+        dtype = (
+            court_key_points.dtype
+            if np.issubdtype(court_key_points.dtype, np.floating)
+            else np.float64
+        )
+
+        player_frames = player_boxes.frame
+        player_ids = player_boxes.track_id
+        x1, y1, x2, y2 = player_boxes.xyxy.T
+
+        # Max bbox height of each player over its window, looked up per detection
+        player_height_pixels = np.full(player_boxes.num_rows, np.nan)
+        player_height_meters = np.full(player_boxes.num_rows, np.nan)
+        for pid, height_in_meters in player_heights.items():
+            heights = player_boxes.dense_track(pid)
+            max_heights = sliding_window_max(
+                heights[:, 3] - heights[:, 1],
+                height_window_before,
+                height_window_after - 1,
+            )
+            rows = player_ids == pid
+            player_height_pixels[rows] = max_heights[player_frames[rows]]
+            player_height_meters[rows] = height_in_meters
+        is_known_player = ~np.isnan(player_height_meters)
+
+        # Closest player to the ball in each frame (ties go to the first detection)
+        ball_center_x = np.trunc((ball_xyxy[:, 0] + ball_xyxy[:, 2]) / 2)
+        ball_center_y = np.trunc((ball_xyxy[:, 1] + ball_xyxy[:, 3]) / 2)
+        player_center_x = np.trunc((x1 + x2) / 2)
+        player_center_y = np.trunc((y1 + y2) / 2)
+        ball_distance = (
+            (ball_center_x[player_frames] - player_center_x) ** 2
+            + (ball_center_y[player_frames] - player_center_y) ** 2
+        ) ** 0.5
+        by_distance = np.lexsort(
+            (np.arange(player_boxes.num_rows), ball_distance, player_frames)
+        )
+        is_first_in_frame = np.r_[True, np.diff(player_frames[by_distance]) != 0]
+        closest_rows = by_distance[is_first_in_frame]
+        closest_rows = closest_rows[~np.isnan(ball_distance[closest_rows])]
+
+        # Per-frame key points are looked up at each detection's frame
+        ball_rows = closest_rows[is_known_player[closest_rows]]
+        ball_frames = player_frames[ball_rows]
+        if court_key_points.ndim == 2:
+            player_key_points = court_key_points[player_frames[is_known_player]]
+            ball_key_points = court_key_points[ball_frames]
+        else:
+            player_key_points = ball_key_points = court_key_points
+
+        # Convert each player's foot position to mini-court coordinates
+        player_x, player_y = self._project_to_mini_court(
+            np.trunc((x1 + x2) / 2)[is_known_player],
+            y2[is_known_player],
+            player_key_points,
+            player_height_pixels[is_known_player],
+            player_height_meters[is_known_player],
+            dtype,
+        )
+
+        # If the closest player is one we know the height of, we also map the ball
+        ball_x, ball_y = self._project_to_mini_court(
+            ball_center_x[ball_frames],
+            ball_center_y[ball_frames],
+            ball_key_points,
+            player_height_pixels[ball_rows],
+            player_height_meters[ball_rows],
+            dtype,
+        )
+
+        # Back to one dictionary per frame
+        mini_court_player_boxes = [{} for _ in range(num_frames)]
+        for frame_num, pid, position in zip(
+            player_frames[is_known_player].tolist(),
+            player_ids[is_known_player].tolist(),
+            zip(player_x.tolist(), player_y.tolist()),
+        ):
+            mini_court_player_boxes[frame_num][pid] = position
+
+        mini_court_ball_boxes = [{} for _ in range(num_frames)]
+        for frame_num, position in zip(
+            ball_frames.tolist(), zip(ball_x.tolist(), ball_y.tolist())
+        ):
+            mini_court_ball_boxes[frame_num] = {1: position}
 
         return mini_court_player_boxes, mini_court_ball_boxes
 
+    def _project_to_mini_court(
+        self,
+        position_x,
+        position_y,
+        court_key_points,
+        height_in_pixels,
+        height_in_meters,
+        dtype,
+    ):
+        """
+        Vectorized get_mini_court_coordinates using the closest of the four court corners.
+
+        court_key_points is either one set of key points for all positions or one
+        row per position.
+
+        :return: (x, y) arrays of mini court coordinates.
+        """
+        position_x = position_x.astype(dtype)
+        position_y = position_y.astype(dtype)
+        court_key_points = np.broadcast_to(
+            court_key_points.astype(dtype), (len(position_x), court_key_points.shape[-1])
+        )
+        rows = np.arange(len(position_x))
+        drawing_key_points = np.asarray(self.drawing_key_points, dtype=np.float64).astype(dtype)
+
+        # We pick among the "four corners" [0,2,12,13] to find the nearest key point (by y)
+        corner_indices = np.array([0, 2, 12, 13])
+        corner_y = court_key_points[:, corner_indices * 2 + 1]
+        closest_corner = np.argmin(np.abs(position_y[:, None] - corner_y), axis=1)
+        closest_key_point_index = corner_indices[closest_corner]
+
+        distance_x_pixels = np.abs(
+            position_x - court_key_points[rows, closest_key_point_index * 2]
+        )
+        distance_y_pixels = np.abs(
+            position_y - court_key_points[rows, closest_key_point_index * 2 + 1]
+        )
+
+        # Convert pixel distance to meters, then to mini court pixels
+        height_in_pixels = height_in_pixels.astype(dtype)
+        height_in_meters = height_in_meters.astype(dtype)
+        mini_court_x_distance_pixels = self.convert_meters_to_pixels(
+            convert_pixel_distance_to_meters(
+                distance_x_pixels, height_in_meters, height_in_pixels
+            )
+        )
+        mini_court_y_distance_pixels = self.convert_meters_to_pixels(
+            convert_pixel_distance_to_meters(
+                distance_y_pixels, height_in_meters, height_in_pixels
+            )
+        )
+
+        return (
+            drawing_key_points[closest_key_point_index * 2] + mini_court_x_distance_pixels,
+            drawing_key_points[closest_key_point_index * 2 + 1]
+            + mini_court_y_distance_pixels,
+        )
 
     def draw_positions_on_court(self, frames, positions, color=(0, 255, 0)):
-        for frame_num, frame in enumerate(frames):
+        return map_frames(frames, self.positions_layer(positions, color))
+
+    def add_court_to_frames(self, frames):
+        return map_frames(frames, self.court_layer())
+
+    def positions_layer(self, positions, color=(0, 255, 0)):
+        # Render layer drawing one frame's mini court positions (see utils.FrameRenderer)
+        def draw_frame(frame, frame_num):
             for pos in positions[frame_num].values():
                 x, y = map(int, pos)
                 cv2.circle(frame, (x, y), 5, color, -1)
-        return frames
+            return frame
 
-    def add_court_to_frames(self, frames):
-        return [
-            self.draw_court(self.draw_background_rectangle(frame)) for frame in frames
-        ]
+        return draw_frame
+
+    def court_layer(self):
+        # Render layer drawing the mini court overlay
+        return lambda frame, frame_num: self.draw_court_overlay(frame)
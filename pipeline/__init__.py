@@ -0,0 +1,13 @@
+from .runner import StageRunner
+
+_STREAMING_EXPORTS = ("analyze_frames", "analyze_records", "run_streaming_pipeline")
+
+
+def __getattr__(name):
+    # The streaming pipeline imports the trackers and models; load it on first use
+    # so that importing the package (e.g. for the CLI's --help) stays cheap
+    if name in _STREAMING_EXPORTS:
+        from . import streaming
+
+        return getattr(streaming, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
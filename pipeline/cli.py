@@ -0,0 +1,137 @@
+import argparse
+
+from config import (
+    MODELS_DIR,
+    DETECTION_BATCH_SIZE,
+    PLAYER_INTERPOLATION_MAX_GAP,
+    RENDER_WORKERS,
+    RENDER_CHUNK_SIZE,
+    STREAM_BLOCK_SIZE,
+    STREAM_INTERPOLATION_WINDOW,
+    STREAM_PLAYER_CHOICE_FRAMES,
+    STREAM_MAX_SHOT_FRAMES,
+    PIPELINE_QUEUE_SIZE,
+    INFERENCE_BACKEND,
+    KEYPOINT_PRECISION,
+    KEYPOINT_TRACKING,
+)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Analyze a tennis video in streaming mode with bounded memory."
+    )
+    parser.add_argument("video", help="Input video file.")
+    parser.add_argument("output", help="Annotated output video file.")
+    parser.add_argument(
+        "--model", default=str(MODELS_DIR / "best.pt"), help="YOLO weights (players + ball)."
+    )
+    parser.add_argument(
+        "--keypoints-model",
+        default=str(MODELS_DIR / "keypoints_model.pth"),
+        help="Court keypoint model weights.",
+    )
+    parser.add_argument(
+        "--tracking-data", default=None, help="Also write per-frame tracking data (Parquet)."
+    )
+    parser.add_argument("--batch-size", type=int, default=DETECTION_BATCH_SIZE)
+    parser.add_argument(
+        "--backend",
+        choices=["torch", "onnx"],
+        default=INFERENCE_BACKEND,
+        help="Inference backend (onnx: ONNX Runtime on the CPU, exported once and cached).",
+    )
+    parser.add_argument(
+        "--keypoint-precision",
+        choices=["fp32", "int8"],
+        default=KEYPOINT_PRECISION,
+        help="int8: post-training quantized keypoint model (CPU, cached after the first run).",
+    )
+    parser.add_argument(
+        "--keypoint-tracking",
+        action=argparse.BooleanOptionalAction,
+        default=KEYPOINT_TRACKING,
+        help="Track the court keypoints through camera motion (CNN on keyframes only).",
+    )
+    parser.add_argument(
+        "--interpolation-window",
+        type=int,
+        default=STREAM_INTERPOLATION_WINDOW,
+        help="Frames of context used to interpolate missing detections.",
+    )
+    parser.add_argument(
+        "--player-max-gap",
+        type=int,
+        default=PLAYER_INTERPOLATION_MAX_GAP,
+        help="Longest player gap (frames) that is filled; all gaps by default.",
+    )
+    parser.add_argument(
+        "--player-choice-frames",
+        type=int,
+        default=STREAM_PLAYER_CHOICE_FRAMES,
+        help="Frames to wait for both players to be visible.",
+    )
+    parser.add_argument(
+        "--max-shot-frames",
+        type=int,
+        default=STREAM_MAX_SHOT_FRAMES,
+        help="Longest shot (hit to hit, frames) that counts in the stats.",
+    )
+    parser.add_argument("--block-size", type=int, default=STREAM_BLOCK_SIZE)
+    parser.add_argument("--render-workers", type=int, default=RENDER_WORKERS)
+    parser.add_argument("--render-chunk-size", type=int, default=RENDER_CHUNK_SIZE)
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=PIPELINE_QUEUE_SIZE,
+        help="Capacity of the queues between the concurrent stages.",
+    )
+    parser.add_argument("--profile", default=None, help="Write a JSON profiling report.")
+    parser.add_argument(
+        "--prometheus",
+        default=None,
+        help="Write the profiling report in Prometheus text format.",
+    )
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Imported after parsing, so --help and argument errors return immediately
+    from dotenv import load_dotenv
+    from utils import StageProfiler
+    from .streaming import run_streaming_pipeline
+
+    load_dotenv()
+    profiler = StageProfiler() if args.profile or args.prometheus else None
+
+    run_streaming_pipeline(
+        args.video,
+        args.output,
+        model_path=args.model,
+        keypoints_model_path=args.keypoints_model,
+        tracking_data_path=args.tracking_data,
+        batch_size=args.batch_size,
+        interpolation_window=args.interpolation_window,
+        player_max_gap=args.player_max_gap,
+        player_choice_frames=args.player_choice_frames,
+        max_shot_frames=args.max_shot_frames,
+        block_size=args.block_size,
+        render_workers=args.render_workers,
+        render_chunk_size=args.render_chunk_size,
+        queue_size=args.queue_size,
+        profiler=profiler,
+        backend=args.backend,
+        keypoint_precision=args.keypoint_precision,
+        keypoint_tracking=args.keypoint_tracking,
+    )
+
+    if args.profile:
+        profiler.write_json(args.profile)
+    if args.prometheus:
+        profiler.write_prometheus(args.prometheus)
+
+
+if __name__ == "__main__":
+    main()
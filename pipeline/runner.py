@@ -0,0 +1,235 @@
+import queue
+import threading
+import time
+
+# Marks the end of a stage's output
+_END = object()
+
+
+class StageRunner:
+    """
+    Runs pipeline stages concurrently, each on its own thread.
+
+    A stage is a function ``stage(items) -> iterable`` like the generator stages
+    in pipeline.stages. Every stage consumes the output of the one before it
+    through a bounded queue, so a slow stage makes the faster ones upstream block
+    (back-pressure) instead of buffering without limit, and the wall-clock time
+    approaches that of the slowest stage rather than the sum of all of them.
+
+    If a stage raises, every other stage is stopped and the error is re-raised
+    to the consumer of run(). Each stage counts the items it produced and the
+    time it spent working, waiting for input and waiting for room downstream.
+
+    Parameters:
+    queue_size (int): Capacity of the queue after each stage.
+    """
+
+    def __init__(self, queue_size=8):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.queue_size = queue_size
+        self.stages = []
+        self._counters = {}
+        self._failure = None
+        self._failure_lock = threading.Lock()
+
+    def add_stage(self, name, stage):
+        """
+        Append a stage.
+
+        Parameters:
+        name (str): Stage name used in the counters and thread name.
+        stage (callable): stage(items) -> iterable of output items.
+
+        Returns:
+        StageRunner: self, so calls can be chained.
+        """
+        if name in self._counters or name == "source":
+            raise ValueError(f"Duplicate stage name: {name}")
+        self.stages.append((name, stage))
+        self._counters[name] = None
+        return self
+
+    def run(self, source):
+        """
+        Start all stages on source and yield the output of the last one.
+
+        The source is iterated on its own thread as well (stage "source").
+
+        Parameters:
+        source (iterable): Input items of the first stage, e.g. decoded frames.
+
+        Yields:
+        The items produced by the last stage, in order.
+        """
+        stop_event = threading.Event()
+        self._failure = None
+        self._counters = {"source": _new_counters()}
+        self._counters.update({name: _new_counters() for name, _ in self.stages})
+
+        stage_functions = [("source", lambda items: items)] + self.stages
+        threads = []
+        input_queue = None
+        for name, stage in stage_functions:
+            output_queue = queue.Queue(maxsize=self.queue_size)
+            items = source if input_queue is None else input_queue
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(
+                    name,
+                    stage,
+                    items,
+                    input_queue is not None,
+                    output_queue,
+                    stop_event,
+                ),
+                name=f"pipeline-{name}",
+                daemon=True,
+            )
+            threads.append(thread)
+            input_queue = output_queue
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                try:
+                    item = _get_until_stopped(input_queue, stop_event)
+                except _Stopped:
+                    break
+                if item is _END:
+                    break
+                yield item
+
+            if self._failure is not None:
+                stage_name, error = self._failure
+                raise RuntimeError(f"Pipeline stage '{stage_name}' failed") from error
+        finally:
+            # Stop the stages (a no-op when they already finished) and wait for them
+            stop_event.set()
+            for thread in threads:
+                while thread.is_alive():
+                    _drain(input_queue)
+                    thread.join(timeout=0.05)
+
+    def stats(self):
+        """
+        Per-stage counters of the last run.
+
+        Returns:
+        dict: {stage_name: {"items", "seconds", "busy_seconds", "input_wait_seconds",
+            "output_wait_seconds", "items_per_second"}}; items_per_second is over the
+            time the stage was busy.
+        """
+        stats = {}
+        for name, counters in self._counters.items():
+            if counters is None:
+                continue
+            busy_seconds = max(
+                counters["seconds"]
+                - counters["input_wait_seconds"]
+                - counters["output_wait_seconds"],
+                0.0,
+            )
+            stats[name] = dict(
+                counters,
+                busy_seconds=busy_seconds,
+                items_per_second=counters["items"] / busy_seconds if busy_seconds else 0.0,
+            )
+        return stats
+
+    def format_stats(self):
+        """
+        The per-stage counters as a printable table.
+        """
+        lines = [
+            f"{'stage':<12} {'items':>8} {'busy s':>8} {'in wait s':>10} "
+            f"{'out wait s':>10} {'items/s':>9}"
+        ]
+        for name, stage_stats in self.stats().items():
+            lines.append(
+                f"{name:<12} {stage_stats['items']:>8} {stage_stats['busy_seconds']:>8.2f} "
+                f"{stage_stats['input_wait_seconds']:>10.2f} "
+                f"{stage_stats['output_wait_seconds']:>10.2f} "
+                f"{stage_stats['items_per_second']:>9.1f}"
+            )
+        return "\n".join(lines)
+
+    def _run_stage(self, name, stage, items, from_queue, output_queue, stop_event):
+        counters = self._counters[name]
+        start = time.perf_counter()
+        outputs = None
+        try:
+            if from_queue:
+                items = self._queue_items(items, counters, stop_event)
+            outputs = stage(items)
+            for item in outputs:
+                wait_start = time.perf_counter()
+                if not _put_until_stopped(output_queue, item, stop_event):
+                    return
+                counters["output_wait_seconds"] += time.perf_counter() - wait_start
+                counters["items"] += 1
+            _put_until_stopped(output_queue, _END, stop_event)
+        except _Stopped:
+            pass
+        except Exception as e:
+            # Keep the first failure and stop every stage
+            with self._failure_lock:
+                if self._failure is None:
+                    self._failure = (name, e)
+            stop_event.set()
+        finally:
+            if hasattr(outputs, "close"):
+                outputs.close()
+            counters["seconds"] = time.perf_counter() - start
+
+    def _queue_items(self, input_queue, counters, stop_event):
+        while True:
+            wait_start = time.perf_counter()
+            item = _get_until_stopped(input_queue, stop_event)
+            counters["input_wait_seconds"] += time.perf_counter() - wait_start
+            if item is _END:
+                return
+            yield item
+
+
+class _Stopped(Exception):
+    pass
+
+
+def _new_counters():
+    return {
+        "items": 0,
+        "seconds": 0.0,
+        "input_wait_seconds": 0.0,
+        "output_wait_seconds": 0.0,
+    }
+
+
+def _put_until_stopped(target_queue, item, stop_event):
+    # Block for room, but give up once the pipeline is stopping
+    while not stop_event.is_set():
+        try:
+            target_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get_until_stopped(source_queue, stop_event):
+    while True:
+        try:
+            return source_queue.get(timeout=0.1)
+        except queue.Empty:
+            if stop_event.is_set():
+                raise _Stopped()
+
+
+def _drain(target_queue):
+    try:
+        while True:
+            target_queue.get_nowait()
+    except queue.Empty:
+        pass
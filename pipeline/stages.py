@@ -0,0 +1,292 @@
+"""
+Generator stages of the streaming pipeline.
+
+Every stage takes an iterable of per-frame records (dicts with at least
+"frame_num") and yields the same records, in order, with more keys filled in.
+Stages that need to look ahead hold a bounded window of records, so memory
+depends on the window sizes and not on the length of the video. Records only
+carry detections and positions; frames are decoded again for rendering.
+"""
+import numpy as np
+
+from utils import DetectionTable
+
+
+def detect_stage(frames, detection_engine, batch_size=1, court_tracker=None):
+    """
+    Run the detection engine over the frames.
+
+    With a CourtKeypointTracker, the court keypoints of every frame are tracked
+    as the frames go by and added as "court_keypoints".
+
+    Yields:
+    dict: {"frame_num", "player_detections", "ball_detections"} per frame
+        (and "court_keypoints" with a court_tracker).
+    """
+    frame_num = 0
+    batch = []
+    court_keypoints = []
+
+    def flush():
+        nonlocal frame_num
+        for i, (player_dict, ball_dict) in enumerate(detection_engine.detect_batch(batch)):
+            record = {
+                "frame_num": frame_num,
+                "player_detections": player_dict,
+                "ball_detections": ball_dict,
+            }
+            if court_tracker is not None:
+                record["court_keypoints"] = court_keypoints[i]
+            yield record
+            frame_num += 1
+
+    for frame in frames:
+        batch.append(frame)
+        if court_tracker is not None:
+            court_keypoints.append(court_tracker.update(frame))
+        if len(batch) == batch_size:
+            yield from flush()
+            batch = []
+            court_keypoints = []
+    if batch:
+        yield from flush()
+
+
+def filter_players_stage(records, player_tracker, court_keypoints, max_wait=300):
+    """
+    Keep only the two players on court, relabelled 1 and 2.
+
+    Like PlayerTracker.choose_and_filter_players, the players are chosen from the
+    first frame with at least two detections; records are held until that frame
+    arrives, or for at most max_wait frames before falling back to the first frame.
+
+    Fills "player_detections" in place with the filtered dicts.
+    """
+    pending = []
+    player_ids = None
+
+    def choose(player_dict):
+        chosen_players = player_tracker.choose_players(court_keypoints, player_dict)
+        return {
+            track_id: player_num
+            for player_num, track_id in enumerate(chosen_players, start=1)
+        }
+
+    def relabel(record):
+        record["player_detections"] = {
+            player_ids[track_id]: bbox
+            for track_id, bbox in record["player_detections"].items()
+            if track_id in player_ids
+        }
+        return record
+
+    for record in records:
+        if player_ids is not None:
+            yield relabel(record)
+            continue
+
+        pending.append(record)
+        if len(record["player_detections"]) >= 2:
+            player_ids = choose(record["player_detections"])
+        elif len(pending) > max_wait:
+            player_ids = choose(pending[0]["player_detections"])
+        else:
+            continue
+
+        for pending_record in pending:
+            yield relabel(pending_record)
+        pending = []
+
+    # No frame with two players: choose from the first frame, like the batch version
+    if pending:
+        player_ids = choose(pending[0]["player_detections"])
+        for pending_record in pending:
+            yield relabel(pending_record)
+
+
+def windowed_stage(records, process, before, after, block_size=64):
+    """
+    Apply a batch function to blocks of records with context on both sides.
+
+    Records are processed in blocks of block_size; process is called with the
+    block plus up to `before` records preceding it and `after` records following
+    it, and returns one dict per record it was given. The dicts of the block's own
+    records are merged into them. Any batch computation whose result for a frame
+    only depends on the frames [frame - before, frame + after] therefore gives the
+    same result as on the whole video.
+
+    Parameters:
+    records (iterable): Per-frame records.
+    process (callable): process(window_records) -> list of dicts, one per record.
+    before (int): Records of context before each block.
+    after (int): Records of context after each block.
+    block_size (int): Records processed per call.
+    """
+    history = []
+    pending = []
+
+    def process_block(block_size):
+        window = history + pending
+        results = process(window)
+        block = pending[:block_size]
+        block_results = results[len(history) : len(history) + block_size]
+        for record, result in zip(block, block_results):
+            record.update(result)
+        return block
+
+    for record in records:
+        pending.append(record)
+        if len(pending) >= block_size + after:
+            block = process_block(block_size)
+            yield from block
+            history = (history + block)[-before:] if before else []
+            pending = pending[block_size:]
+
+    if pending:
+        yield from process_block(len(pending))
+
+
+def interpolate_players_stage(
+    records, player_tracker, window=60, max_gap=None, block_size=64
+):
+    """
+    Interpolate the player boxes within a window of frames.
+
+    Gaps of up to `window` frames are filled exactly as
+    PlayerTracker.interpolate_player_positions would; longer gaps are filled from
+    the detections inside the window only. With max_gap set, use window > max_gap
+    for results identical to the batch version.
+
+    Reads "player_detections" and fills "players".
+    """
+
+    def process(window_records):
+        interpolated = player_tracker.interpolate_player_positions(
+            [record["player_detections"] for record in window_records], max_gap=max_gap
+        )
+        return [{"players": player_dict} for player_dict in interpolated]
+
+    return windowed_stage(records, process, window, window, block_size)
+
+
+def interpolate_ball_stage(records, ball_tracker, window=60, block_size=64):
+    """
+    Interpolate the ball box within a window of frames (see interpolate_players_stage).
+
+    Reads "ball_detections" and fills "ball".
+    """
+
+    def process(window_records):
+        ball_detections = DetectionTable.from_dicts(
+            [record["ball_detections"] for record in window_records]
+        )
+        interpolated = ball_tracker.interpolate_ball_positions(ball_detections)
+        return [{"ball": ball_dict} for ball_dict in interpolated]
+
+    return windowed_stage(records, process, window, window, block_size)
+
+
+def hit_stage(records, ball_tracker, minimum_change_frames_for_hit=25, block_size=64):
+    """
+    Flag the ball hits, as BallTracker.detect_hits does on the whole video.
+
+    A hit at a frame depends on the 5-frame rolling mean before it and on the
+    change window after it, so that much context is kept around each block.
+
+    Reads "ball" and fills "is_hit".
+    """
+    change_window = int(minimum_change_frames_for_hit * 1.2)
+    rolling_window = 5
+
+    def process(window_records):
+        hit_frames = set(
+            ball_tracker.detect_hits(
+                [record["ball"] for record in window_records],
+                minimum_change_frames_for_hit=minimum_change_frames_for_hit,
+                change_window=change_window,
+            )
+        )
+        return [{"is_hit": i in hit_frames} for i in range(len(window_records))]
+
+    return windowed_stage(records, process, rolling_window, change_window + 1, block_size)
+
+
+def court_stage(
+    records,
+    mini_court,
+    court_keypoints,
+    height_window_before=20,
+    height_window_after=50,
+    block_size=64,
+):
+    """
+    Map players and ball to mini court coordinates, as MiniCourt.add_to_minicourt does.
+
+    Reads "players" and "ball" and fills "player_court" and "ball_court". With
+    court_keypoints None, each record's "court_keypoints" (see detect_stage) are used.
+    """
+
+    def process(window_records):
+        player_court, ball_court = mini_court.add_to_minicourt(
+            [record["players"] for record in window_records],
+            [record["ball"] for record in window_records],
+            (
+                np.array([record["court_keypoints"] for record in window_records])
+                if court_keypoints is None
+                else court_keypoints
+            ),
+            height_window_before=height_window_before,
+            height_window_after=height_window_after,
+        )
+        return [
+            {"player_court": player_dict, "ball_court": ball_dict}
+            for player_dict, ball_dict in zip(player_court, ball_court)
+        ]
+
+    return windowed_stage(
+        records, process, height_window_before, height_window_after, block_size
+    )
+
+
+def stats_stage(records, stats_accumulator, max_shot_frames=300):
+    """
+    Attach the match stats row of every frame.
+
+    The stats shown from a hit on include that shot's speed, which is only known
+    at the next hit, so the records from the last hit on are held until the next
+    hit arrives. A shot longer than max_shot_frames is dropped (treated like the
+    last hit of the video) so the wait stays bounded.
+
+    Reads "is_hit", "player_court" and "ball_court" and fills "stats".
+    """
+    pending = []
+
+    def release():
+        for pending_record in pending:
+            pending_record["stats"] = stats_accumulator.row(pending_record["frame_num"])
+        return pending
+
+    for record in records:
+        if record["is_hit"]:
+            if pending and pending[0]["is_hit"]:
+                shot_start = pending[0]
+                stats_accumulator.add_shot(
+                    shot_start["frame_num"],
+                    record["frame_num"],
+                    shot_start["player_court"],
+                    record["player_court"],
+                    shot_start["ball_court"],
+                    record["ball_court"],
+                )
+            yield from release()
+            pending = [record]
+        elif pending and pending[0]["is_hit"]:
+            pending.append(record)
+            if len(pending) > max_shot_frames:
+                yield from release()
+                pending = []
+        else:
+            record["stats"] = stats_accumulator.row(record["frame_num"])
+            yield record
+
+    yield from release()
@@ -0,0 +1,340 @@
+from tqdm import tqdm
+from utils import (
+    VideoFrameSource,
+    AsyncVideoWriter,
+    sample_video_frames,
+    FrameRenderer,
+    StatsOverlay,
+    TrackingExporter,
+    frame_number_layer,
+)
+from utils.display_stats import STATS_COLUMNS
+from config import (
+    DETECTION_BATCH_SIZE,
+    PLAYER_INTERPOLATION_MAX_GAP,
+    RENDER_WORKERS,
+    RENDER_CHUNK_SIZE,
+    RENDER_MAX_PENDING_FRAMES,
+    STREAM_BLOCK_SIZE,
+    STREAM_INTERPOLATION_WINDOW,
+    STREAM_PLAYER_CHOICE_FRAMES,
+    STREAM_MAX_SHOT_FRAMES,
+    PIPELINE_QUEUE_SIZE,
+    INFERENCE_BACKEND,
+    ONNX_CACHE_DIR,
+    KEYPOINT_PRECISION,
+    KEYPOINT_CALIBRATION_FRAMES,
+    QUANTIZED_CACHE_DIR,
+    KEYPOINT_TRACKING,
+    KEYPOINT_MAX_KEYFRAME_INTERVAL,
+)
+from trackers import PlayerTracker, BallTracker, DetectionEngine
+from keypoint_detection import KeypointDetector, CourtKeypointTracker
+from mini_court import MiniCourt
+from match_stats import MatchStatsAccumulator
+from .runner import StageRunner
+from .stages import (
+    detect_stage,
+    filter_players_stage,
+    interpolate_players_stage,
+    interpolate_ball_stage,
+    hit_stage,
+    court_stage,
+    stats_stage,
+)
+
+
+class _RecordField:
+    """
+    Per-frame view of one key of the in-flight records, for the render layers.
+    """
+
+    def __init__(self, records, key):
+        self.records = records
+        self.key = key
+
+    def __getitem__(self, frame_num):
+        return self.records[frame_num][self.key]
+
+
+def analyze_frames(
+    frames,
+    detection_engine,
+    court_keypoints,
+    mini_court,
+    fps,
+    batch_size=DETECTION_BATCH_SIZE,
+    interpolation_window=STREAM_INTERPOLATION_WINDOW,
+    player_max_gap=PLAYER_INTERPOLATION_MAX_GAP,
+    player_choice_frames=STREAM_PLAYER_CHOICE_FRAMES,
+    max_shot_frames=STREAM_MAX_SHOT_FRAMES,
+    block_size=STREAM_BLOCK_SIZE,
+    court_tracker=None,
+):
+    """
+    Chain the analysis stages into one generator of per-frame records.
+
+    Parameters:
+    frames (iterable): Video frames, in order.
+    detection_engine (DetectionEngine): Player and ball detector.
+    court_keypoints (list): Court keypoints [x0, y0, x1, y1, ...] (of the first
+        frame when court_tracker is given, used to choose the players).
+    mini_court (MiniCourt): Mini court the positions are mapped onto.
+    fps (float): Frame rate of the video.
+    batch_size (int): Frames per detection forward pass.
+    interpolation_window (int): Frames of context used to interpolate gaps.
+    player_max_gap (int): Longest player gap that is filled; None fills every gap.
+    player_choice_frames (int): Frames waited for two players to be visible.
+    max_shot_frames (int): Longest shot (hit to hit) that counts in the stats.
+    block_size (int): Frames processed together by the windowed stages.
+    court_tracker (CourtKeypointTracker): Optional tracker for per-frame court
+        keypoints, which the court mapping then uses.
+
+    Yields:
+    dict: One record per frame with "players", "ball", "is_hit", "player_court",
+        "ball_court" and "stats" (a row of MATCH_STATS_COLUMNS).
+    """
+    records = detect_stage(frames, detection_engine, batch_size, court_tracker)
+    return analyze_records(
+        records,
+        court_keypoints,
+        mini_court,
+        fps,
+        interpolation_window=interpolation_window,
+        player_max_gap=player_max_gap,
+        player_choice_frames=player_choice_frames,
+        max_shot_frames=max_shot_frames,
+        block_size=block_size,
+        tracked_court_keypoints=court_tracker is not None,
+    )
+
+
+def analyze_records(
+    records,
+    court_keypoints,
+    mini_court,
+    fps,
+    interpolation_window=STREAM_INTERPOLATION_WINDOW,
+    player_max_gap=PLAYER_INTERPOLATION_MAX_GAP,
+    player_choice_frames=STREAM_PLAYER_CHOICE_FRAMES,
+    max_shot_frames=STREAM_MAX_SHOT_FRAMES,
+    block_size=STREAM_BLOCK_SIZE,
+    tracked_court_keypoints=False,
+):
+    """
+    The stages of analyze_frames after detection, on the records of detect_stage.
+
+    With tracked_court_keypoints, the court mapping uses each record's
+    "court_keypoints" and court_keypoints only serve to choose the players.
+    """
+    player_tracker = PlayerTracker()
+    ball_tracker = BallTracker()
+
+    if player_max_gap is not None:
+        # Enough context to tell every fillable gap from a longer one
+        interpolation_window = max(interpolation_window, player_max_gap + 1)
+
+    records = filter_players_stage(
+        records, player_tracker, court_keypoints, player_choice_frames
+    )
+    records = interpolate_players_stage(
+        records, player_tracker, interpolation_window, player_max_gap, block_size
+    )
+    records = interpolate_ball_stage(
+        records, ball_tracker, interpolation_window, block_size
+    )
+    records = hit_stage(records, ball_tracker, block_size=block_size)
+    records = court_stage(
+        records,
+        mini_court,
+        None if tracked_court_keypoints else court_keypoints,
+        block_size=block_size,
+    )
+    records = stats_stage(
+        records,
+        MatchStatsAccumulator(fps, mini_court.get_width_of_mini_court()),
+        max_shot_frames,
+    )
+    return records
+
+
+def run_streaming_pipeline(
+    video_path,
+    output_path,
+    model_path,
+    keypoints_model_path,
+    tracking_data_path=None,
+    batch_size=DETECTION_BATCH_SIZE,
+    interpolation_window=STREAM_INTERPOLATION_WINDOW,
+    player_max_gap=PLAYER_INTERPOLATION_MAX_GAP,
+    player_choice_frames=STREAM_PLAYER_CHOICE_FRAMES,
+    max_shot_frames=STREAM_MAX_SHOT_FRAMES,
+    block_size=STREAM_BLOCK_SIZE,
+    render_workers=RENDER_WORKERS,
+    render_chunk_size=RENDER_CHUNK_SIZE,
+    queue_size=PIPELINE_QUEUE_SIZE,
+    profiler=None,
+    backend=INFERENCE_BACKEND,
+    keypoint_precision=KEYPOINT_PRECISION,
+    keypoint_tracking=KEYPOINT_TRACKING,
+):
+    """
+    Analyze a video and write the annotated video, frame by frame.
+
+    Decode, detect, filter, interpolate, hit detection, court mapping, stats and
+    render/encode run as chained generators. Stages that look ahead keep only
+    their window of per-frame records, and the video is decoded a second time
+    for rendering instead of holding frames across those windows, so peak memory
+    is bounded by the window sizes rather than by the length of the match.
+    The stages run concurrently (see StageRunner), so the wall-clock time
+    approaches that of the slowest stage.
+
+    Parameters:
+    video_path (str): Input video.
+    output_path (str): Annotated output video.
+    model_path (str): YOLO weights for players and ball.
+    keypoints_model_path (str): Court keypoint model weights.
+    tracking_data_path (str): Optional Parquet file for the per-frame tracking data.
+    render_workers (int): Threads drawing the annotations.
+    render_chunk_size (int): Frames per render task.
+    queue_size (int): Capacity of the queues between the concurrent stages.
+    profiler (StageProfiler): Optional profiler that receives the busy time and
+        frame count of every stage.
+    backend (str): Inference backend of the models, "torch" or "onnx".
+    keypoint_precision (str): "fp32", or "int8" for the quantized keypoint model
+        (torch backend, calibrated on frames of the video the first time).
+    keypoint_tracking (bool): Track the court keypoints through camera motion (see
+        CourtKeypointTracker) instead of using those of the first frame throughout.
+    Other parameters: see analyze_frames.
+
+    Returns:
+    int: Number of frames written.
+    """
+    video_frames = VideoFrameSource(video_path)
+    first_frame = video_frames[0]
+
+    detection_engine = DetectionEngine(
+        model_path=model_path, backend=backend, onnx_cache_dir=ONNX_CACHE_DIR
+    )
+    int8 = keypoint_precision == "int8"
+    keypoint_detector = KeypointDetector(
+        model_path=keypoints_model_path,
+        backend="torch" if int8 else backend,
+        onnx_cache_dir=ONNX_CACHE_DIR,
+        precision=keypoint_precision,
+        calibration_images=(
+            sample_video_frames(video_path, KEYPOINT_CALIBRATION_FRAMES) if int8 else None
+        ),
+        quantized_cache_dir=QUANTIZED_CACHE_DIR,
+    )
+    keypoint_predictions = keypoint_detector.predict(first_frame)
+    court_tracker = (
+        CourtKeypointTracker(
+            keypoint_detector, max_keyframe_interval=KEYPOINT_MAX_KEYFRAME_INTERVAL
+        )
+        if keypoint_tracking
+        else None
+    )
+    mini_court = MiniCourt(first_frame)
+
+    # Records between analysis and encoding, looked up by the render layers
+    in_flight = {}
+    stats_overlay = StatsOverlay()
+    renderer = FrameRenderer(
+        [
+            PlayerTracker().bbox_layer(_RecordField(in_flight, "players")),
+            BallTracker().bbox_layer(_RecordField(in_flight, "ball")),
+            (
+                keypoint_detector.keypoint_layer(
+                    _RecordField(in_flight, "court_keypoints"), per_frame=True
+                )
+                if keypoint_tracking
+                else keypoint_detector.keypoint_layer(keypoint_predictions)
+            ),
+            mini_court.court_layer(),
+            mini_court.positions_layer(
+                _RecordField(in_flight, "player_court"), color=(0, 255, 255)
+            ),
+            mini_court.positions_layer(_RecordField(in_flight, "ball_court")),
+            lambda frame, frame_num: stats_overlay.draw(
+                frame, [in_flight[frame_num]["stats"][c] for c in STATS_COLUMNS]
+            ),
+            frame_number_layer(),
+        ],
+        workers=render_workers,
+        chunk_size=render_chunk_size,
+        max_pending_frames=RENDER_MAX_PENDING_FRAMES,
+    )
+
+    def render_stage(records):
+        # Second decode of the video, in step with the analysis records
+        def frames_to_render():
+            for frame, record in zip(video_frames, records):
+                in_flight[record["frame_num"]] = record
+                yield frame
+
+        for frame_num, frame in enumerate(renderer.render(frames_to_render())):
+            yield frame, in_flight.pop(frame_num)
+
+    # Decode, detection, analysis and rendering each run on their own thread,
+    # and encoding on the writer's, connected by bounded queues
+    runner = StageRunner(queue_size=queue_size)
+    runner.add_stage(
+        "detect",
+        lambda frames: detect_stage(frames, detection_engine, batch_size, court_tracker),
+    )
+    runner.add_stage(
+        "analyze",
+        lambda records: analyze_records(
+            records,
+            keypoint_predictions,
+            mini_court,
+            video_frames.fps,
+            interpolation_window=interpolation_window,
+            player_max_gap=player_max_gap,
+            player_choice_frames=player_choice_frames,
+            max_shot_frames=max_shot_frames,
+            block_size=block_size,
+            tracked_court_keypoints=keypoint_tracking,
+        ),
+    )
+    runner.add_stage("render", render_stage)
+
+    exporter = (
+        TrackingExporter(tracking_data_path) if tracking_data_path is not None else None
+    )
+    try:
+        with AsyncVideoWriter(output_path, fps=video_frames.fps) as writer:
+            for frame_num, (frame, record) in enumerate(
+                tqdm(
+                    runner.run(video_frames),
+                    desc="Streaming Analysis",
+                    total=len(video_frames),
+                )
+            ):
+                writer.write(frame)
+                if exporter is not None:
+                    exporter.write(
+                        frame_num,
+                        record["players"],
+                        record["ball"],
+                        record["player_court"],
+                        record["ball_court"],
+                        record["stats"],
+                    )
+    finally:
+        if exporter is not None:
+            exporter.close()
+        video_frames.close()
+
+    print(f"\nSaved To: {output_path}")
+    print(runner.format_stats())
+    if court_tracker is not None:
+        print(
+            f"Court keypoints: CNN on {len(court_tracker.keyframes)} of "
+            f"{len(video_frames)} frames"
+        )
+    if profiler is not None:
+        for name, stage_stats in runner.stats().items():
+            profiler.record(name, stage_stats["busy_seconds"], stage_stats["items"])
+    return writer.frames_written
@@ -28,5 +28,14 @@ setup(
     author='Ryan Tri',
     author_email='ry4ntr1@gmail.com',
     packages=find_packages(),
-    install_requires=get_requirements('requirements.txt')
+    py_modules=['config'],
+    install_requires=get_requirements('requirements.txt'),
+    extras_require={
+        'onnx': ['onnx', 'onnxruntime'],
+    },
+    entry_points={
+        'console_scripts': [
+            'tennis-cv-stream=pipeline.cli:main',
+        ],
+    },
 )
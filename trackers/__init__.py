@@ -1,2 +1,3 @@
 from .player_tracker import PlayerTracker
-from .ball_tracker import BallTracker
\ No newline at end of file
+from .ball_tracker import BallTracker
+from .detection_engine import DetectionEngine
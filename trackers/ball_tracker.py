@@ -1,117 +1,133 @@
-
-from ultralytics import YOLO
 import cv2
-import pickle
-import pandas as pd
+import numpy as np
 from tqdm import tqdm
+from utils import (
+    DetectionTable,
+    interpolate_track,
+    map_frames,
+    save_detections,
+    load_detections,
+)
 import logging
 
 logging.getLogger("ultralytics").setLevel(logging.CRITICAL)
 
 class BallTracker:
-    def __init__(self, model_path):
+    def __init__(self, model_path=None, conf=0.125):
         """
         Initialize the BallTracker with the YOLO model from the specified path.
 
-        :param model_path: Path to the YOLO model file.
+        :param model_path: Path to the YOLO model file. Leave as None when detections
+                           come from a shared DetectionEngine.
+        :param conf: Confidence threshold for ball detections.
+        """
+        self.model_path = model_path
+        self.model = None
+        if model_path is not None:
+            # Imported here so post-processing and drawing don't load ultralytics/torch
+            from ultralytics import YOLO
+
+            self.model = YOLO(model_path)
+        self.conf = conf
+
+    def detect_hits(
+        self, ball_positions, minimum_change_frames_for_hit=25, change_window=None
+    ):
+        """
+        Detect the frames where the ball is hit, from changes in its vertical direction.
+
+        A frame is a hit when the ball's smoothed vertical motion flips sign there and
+        keeps the new direction for at least ``minimum_change_frames_for_hit`` of the
+        following ``change_window`` frames.
+
+        :param ball_positions: List of dictionaries containing ball positions for each frame,
+                               or a DetectionTable.
+        :param minimum_change_frames_for_hit: Frames that must follow the new direction.
+        :param change_window: Frames after the change that are checked
+                              (defaults to 1.2 * minimum_change_frames_for_hit).
+        :return: List of frame numbers with ball hits.
         """
-        self.model = YOLO(model_path)
+        import pandas as pd  # imported on use to keep the package import fast
+
+        if change_window is None:
+            change_window = int(minimum_change_frames_for_hit * 1.2)
 
-    def detect_hits(self, ball_positions):
         # Extract the ball positions for key 1 from each dictionary in the ball_positions list
-        ball_positions = [x.get(1, []) for x in ball_positions]
+        if isinstance(ball_positions, DetectionTable):
+            ball_positions = ball_positions.dense_track(1)
+        else:
+            ball_positions = [x.get(1, []) for x in ball_positions]
 
         # Convert the list of ball positions into a pandas DataFrame with columns x1, y1, x2, y2
         df_ball_positions = pd.DataFrame(
             ball_positions, columns=["x1", "y1", "x2", "y2"]
         )
 
-        # Initialize a new column "ball_hit" with all values set to 0
-        df_ball_positions["ball_hit"] = 0
-
         # Calculate the vertical midpoint (mid_y) of the ball's bounding box
-        df_ball_positions["mid_y"] = (
-            df_ball_positions["y1"] + df_ball_positions["y2"]
-        ) / 2
-
-        # Calculate the rolling mean of the mid_y values over a window of 5 frames
-        df_ball_positions["mid_y_rolling_mean"] = (
-            df_ball_positions["mid_y"]
-            .rolling(window=5, min_periods=1, center=False)
-            .mean()
+        mid_y = (df_ball_positions["y1"] + df_ball_positions["y2"]) / 2
+
+        # Calculate the difference between consecutive rolling mean values (window of 5 frames) of mid_y
+        delta_y = (
+            mid_y.rolling(window=5, min_periods=1, center=False).mean().diff().to_numpy()
         )
 
-        # Calculate the difference between consecutive rolling mean values of mid_y
-        df_ball_positions["delta_y"] = df_ball_positions["mid_y_rolling_mean"].diff()
+        return self._hit_frames_from_delta_y(
+            delta_y, minimum_change_frames_for_hit, change_window
+        )
 
-        # Set the minimum number of frames required to detect a hit
-        minimum_change_frames_for_hit = 25
+    def _hit_frames_from_delta_y(
+        self, delta_y, minimum_change_frames_for_hit, change_window
+    ):
+        """
+        Helper method to find hit frames from the frame-to-frame vertical motion of the ball.
 
-        # Iterate over each frame, up to a point where there are enough frames left to detect a hit
-        for i in range(
-            1, len(df_ball_positions) - int(minimum_change_frames_for_hit * 1.2)
-        ):
-            # Detect a change in direction from positive to negative in delta_y
-            negative_position_change = (
-                df_ball_positions["delta_y"].iloc[i] > 0
-                and df_ball_positions["delta_y"].iloc[i + 1] < 0
-            )
+        :param delta_y: Array of vertical motion per frame (NaN where unknown).
+        :param minimum_change_frames_for_hit: Frames that must follow the new direction.
+        :param change_window: Frames after the change that are checked.
+        :return: List of frame numbers with ball hits.
+        """
+        # Candidate frames need a full window of following frames
+        candidate_frames = np.arange(1, len(delta_y) - change_window)
+        if len(candidate_frames) == 0:
+            return []
+
+        moving_down = delta_y > 0
+        moving_up = delta_y < 0
+
+        # Direction flips between frame i and i + 1
+        down_to_up = moving_down[candidate_frames] & moving_up[candidate_frames + 1]
+        up_to_down = moving_up[candidate_frames] & moving_down[candidate_frames + 1]
+
+        # Frames in (i, i + change_window] moving in the new direction, via prefix sums
+        moving_up_count = np.concatenate(([0], np.cumsum(moving_up)))
+        moving_down_count = np.concatenate(([0], np.cumsum(moving_down)))
+        window_start = candidate_frames + 1
+        window_end = candidate_frames + change_window + 1
+        up_in_window = moving_up_count[window_end] - moving_up_count[window_start]
+        down_in_window = moving_down_count[window_end] - moving_down_count[window_start]
+
+        change_count = np.where(
+            down_to_up, up_in_window, np.where(up_to_down, down_in_window, 0)
+        )
 
-            # Detect a change in direction from negative to positive in delta_y
-            positive_position_change = (
-                df_ball_positions["delta_y"].iloc[i] < 0
-                and df_ball_positions["delta_y"].iloc[i + 1] > 0
-            )
+        # Mark the frame as a hit if the number of changes exceeds the threshold
+        is_hit = change_count > minimum_change_frames_for_hit - 1
 
-            # If a change in direction is detected
-            if negative_position_change or positive_position_change:
-                change_count = 0
-                # Count subsequent changes in direction within a certain range
-                for change_frame in range(
-                    i + 1, i + int(minimum_change_frames_for_hit * 1.2) + 1
-                ):
-                    # Check for subsequent negative position changes
-                    negative_position_change_following_frame = (
-                        df_ball_positions["delta_y"].iloc[i] > 0
-                        and df_ball_positions["delta_y"].iloc[change_frame] < 0
-                    )
-
-                    # Check for subsequent positive position changes
-                    positive_position_change_following_frame = (
-                        df_ball_positions["delta_y"].iloc[i] < 0
-                        and df_ball_positions["delta_y"].iloc[change_frame] > 0
-                    )
-
-                    # Increment change count based on detected changes
-                    if (
-                        negative_position_change
-                        and negative_position_change_following_frame
-                    ):
-                        change_count += 1
-                    elif (
-                        positive_position_change
-                        and positive_position_change_following_frame
-                    ):
-                        change_count += 1
-
-                # Mark the frame as a hit if the number of changes exceeds the threshold
-                if change_count > minimum_change_frames_for_hit - 1:
-                    df_ball_positions.loc[i, "ball_hit"] = 1
-
-        # Extract the indices of the frames where ball_hit is 1
-        frame_nums_with_ball_hits = df_ball_positions[
-            df_ball_positions["ball_hit"] == 1
-        ].index.tolist()
-
-        return frame_nums_with_ball_hits
+        return candidate_frames[is_hit].tolist()
 
     def interpolate_ball_positions(self, ball_positions):
         """
         Interpolate missing ball positions in a sequence of frames.
 
-        :param ball_positions: List of dictionaries containing ball positions for each frame.
-        :return: Interpolated list of ball positions.
+        :param ball_positions: List of dictionaries containing ball positions for each frame,
+                               or a DetectionTable.
+        :return: Interpolated list of ball positions (a DetectionTable if given one).
         """
+        if isinstance(ball_positions, DetectionTable):
+            return self._interpolate_ball_table(ball_positions)
+
+        import pandas as pd  # imported on use to keep the package import fast
+
         # Extract coordinates from ball_positions, replacing empty positions with [None, None, None, None]
         extracted_positions = []
         for pos in ball_positions:
@@ -147,32 +163,67 @@ class BallTracker:
 
         return ball_positions
 
-    def detect_frames(self, frames, read_from_stub=False, stub_path=None):
+    def _interpolate_ball_table(self, ball_table):
+        """
+        Helper method to interpolate ball positions held in a DetectionTable.
+
+        :param ball_table: DetectionTable of ball detections.
+        :return: DetectionTable with one interpolated ball (track id 1) per frame.
+        """
+        # Like the dict path, only the first ball detected in each frame is kept
+        ball_boxes = ball_table.first_per_frame()
+        if np.isnan(ball_boxes).all():
+            return ball_table
+
+        return DetectionTable.from_tracks({1: interpolate_track(ball_boxes)}, class_id=2)
+
+    def detect_frames(
+        self, frames, read_from_stub=False, stub_path=None, batch_size=1, cache=None
+    ):
         """
         Detect balls in a list of frames.
 
-        :param frames: List of frames to be processed.
+        :param frames: List of frames or a streaming frame source (e.g. VideoFrameSource).
         :param read_from_stub: Flag indicating whether to read detections from a pre-saved file.
-        :param stub_path: Path to the file for saving/loading detections.
+        :param stub_path: Path to the file for saving/loading detections (a ".dets"
+                          path uses a memory-mapped DetectionStore, anything else pickle).
+        :param batch_size: Number of frames passed to the model per forward pass.
+        :param cache: Optional DetectionCache; detections for a video already processed
+                      with the same weights and parameters are loaded instead of recomputed.
         :return: List of ball detections for each frame.
         """
         ball_detections = []
 
         # Load detections from stub file if specified
         if read_from_stub and stub_path is not None:
-            with open(stub_path, "rb") as f:
-                ball_detections = pickle.load(f)
-            return ball_detections
+            return load_detections(stub_path)
 
-        # Detect balls in each frame
-        for frame in tqdm(frames, desc="Detecting Balls"):
-            ball_dict = self.detect_frame(frame)
-            ball_detections.append(ball_dict)
+        # Load detections from the cache if this video was already processed
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key_for_frames(
+                frames, self.model_path, task="ball", conf=self.conf, classes=[2]
+            )
+            if cache_key is not None:
+                cached_detections = cache.get(cache_key)
+                if cached_detections is not None:
+                    return cached_detections
 
-        # Save detections to stub file if specified
+        # Detect balls in batches of frames
+        batch = []
+        for frame in tqdm(frames, desc="Detecting Balls"):
+            batch.append(frame)
+            if len(batch) == batch_size:
+                ball_detections.extend(self.detect_batch(batch))
+                batch = []
+        if batch:
+            ball_detections.extend(self.detect_batch(batch))
+
+        # Save detections to stub file / cache if specified
         if stub_path is not None:
-            with open(stub_path, "wb") as f:
-                pickle.dump(ball_detections, f)
+            save_detections(stub_path, ball_detections, class_id=2)
+        if cache_key is not None:
+            cache.put(cache_key, ball_detections)
 
         return ball_detections
 
@@ -183,9 +234,27 @@ class BallTracker:
         :param frame: Frame to be processed.
         :return: Dictionary of detected balls with their bounding boxes.
         """
-        # Run YOLO model prediction on the frame with a confidence threshold
-        results = self.model.predict(frame, conf=0.125)[0]
+        return self.detect_batch([frame])[0]
 
+    def detect_batch(self, frames):
+        """
+        Detect balls in several frames with a single batched model call.
+
+        :param frames: List of frames to be processed together.
+        :return: List with one dictionary of detected balls per frame.
+        """
+        # Run YOLO model prediction on the stacked frames with a confidence threshold
+        results = self.model.predict(frames, conf=self.conf)
+
+        return [self._ball_dict_from_results(result) for result in results]
+
+    def _ball_dict_from_results(self, results):
+        """
+        Helper method to extract ball bounding boxes from the results of one frame.
+
+        :param results: YOLO results for a single frame.
+        :return: Dictionary of detected balls with their bounding boxes.
+        """
         ball_dict = {}
         # Filter detections to include only 'tennis_ball' class (assuming class id 2)
         for i, box in enumerate(results.boxes):
@@ -199,32 +268,50 @@ class BallTracker:
         """
         Draw bounding boxes around detected balls in video frames.
 
-        :param video_frames: List of video frames.
+        :param video_frames: List of video frames, or a streaming frame source.
         :param ball_detections: List of ball detection dictionaries for each frame.
-        :return: List of video frames with bounding boxes drawn.
-        """
-        output_video_frames = []
-
-        # Draw bounding boxes on each frame
-        for frame, ball_dict in zip(video_frames, ball_detections):
-            # Ensure ball_dict is a dictionary
-            if isinstance(ball_dict, dict):
-                for track_id, bbox in ball_dict.items():
-                    x1, y1, x2, y2 = bbox
-                    # Draw the label "Tennis Ball" above the bounding box
-                    cv2.putText(
-                        frame,
-                        "Tennis Ball",
-                        (int(bbox[0]), int(bbox[1] - 10)),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.9,
-                        (0, 255, 255),
-                        2,
-                    )
-                    # Draw the bounding box around the ball
-                    cv2.rectangle(
-                        frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 255), 2
-                    )
-            output_video_frames.append(frame)
-
-        return output_video_frames
+        :return: List of video frames with bounding boxes drawn (a generator for streaming sources).
+        """
+        return map_frames(video_frames, self.bbox_layer(ball_detections))
+
+    def bbox_layer(self, ball_detections):
+        """
+        Render layer drawing the ball bounding boxes (see utils.FrameRenderer).
+
+        :param ball_detections: List of ball detection dictionaries for each frame.
+        :return: Callable layer(frame, frame_num) drawing that frame's boxes in place.
+        """
+
+        def draw_frame(frame, frame_num):
+            self._draw_frame_bboxes(frame, ball_detections[frame_num])
+            return frame
+
+        return draw_frame
+
+    def _draw_frame_bboxes(self, frame, ball_dict):
+        """
+        Helper method to draw ball bounding boxes on a single frame.
+
+        :param frame: Frame to be processed.
+        :param ball_dict: Dictionary of detected balls with their bounding boxes.
+        """
+        # Ensure ball_dict is a dictionary
+        if not isinstance(ball_dict, dict):
+            return
+
+        for track_id, bbox in ball_dict.items():
+            x1, y1, x2, y2 = bbox
+            # Draw the label "Tennis Ball" above the bounding box
+            cv2.putText(
+                frame,
+                "Tennis Ball",
+                (int(bbox[0]), int(bbox[1] - 10)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.9,
+                (0, 255, 255),
+                2,
+            )
+            # Draw the bounding box around the ball
+            cv2.rectangle(
+                frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 255), 2
+            )
@@ -0,0 +1,286 @@
+from types import SimpleNamespace
+import numpy as np
+from utils import DetectionTable, save_detections, load_detections, export_yolo_onnx
+from tqdm import tqdm
+import logging
+
+logging.getLogger("ultralytics").setLevel(logging.CRITICAL)
+
+
+class DetectionEngine:
+    def __init__(
+        self,
+        model_path,
+        player_conf=0.1,
+        ball_conf=0.125,
+        player_class_name="players",
+        ball_class_id=2,
+        tracker_config="bytetrack.yaml",
+        backend="torch",
+        onnx_cache_dir=None,
+        imgsz=640,
+    ):
+        """
+        Load the YOLO model once and run a single forward pass per frame for both
+        players and the ball.
+
+        Player boxes are fed to a ByteTrack tracker to get persistent track IDs (what
+        PlayerTracker gets from model.track); ball boxes are kept as plain detections
+        (what BallTracker gets from model.predict).
+
+        :param model_path: Path to the YOLO model file.
+        :param player_conf: Confidence threshold for player detections (model.track's default).
+        :param ball_conf: Confidence threshold for ball detections.
+        :param player_class_name: Class name of the player detections.
+        :param ball_class_id: Class id of the tennis ball detections.
+        :param tracker_config: Ultralytics tracker config used for the players.
+        :param backend: "torch" runs the weights with PyTorch; "onnx" exports them to ONNX
+                        once (cached by weights hash) and runs them with ONNX Runtime on the CPU.
+        :param onnx_cache_dir: Directory of the exported graphs (next to the weights by default).
+        :param imgsz: Input size (longest side) of the model.
+        """
+        # Imported here so importing the trackers package doesn't load ultralytics/torch
+        from ultralytics import YOLO
+
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unknown backend: {backend} (expected 'torch' or 'onnx')")
+        self.model_path = model_path
+        self.backend = backend
+        self.imgsz = imgsz
+        if backend == "onnx":
+            # Same Results API as the PyTorch model, so the post-processing is shared
+            onnx_path = export_yolo_onnx(model_path, onnx_cache_dir, imgsz=imgsz)
+            self.model = YOLO(str(onnx_path), task="detect")
+        else:
+            self.model = YOLO(model_path)
+        self.player_conf = player_conf
+        self.ball_conf = ball_conf
+        self.player_class_name = player_class_name
+        self.ball_class_id = ball_class_id
+        self.tracker_config = tracker_config
+        self.reset_tracker()
+
+    def reset_tracker(self):
+        """
+        Start a fresh player tracker (e.g. before processing a new video).
+        """
+        import yaml
+        from ultralytics.trackers.byte_tracker import BYTETracker
+        from ultralytics.utils.checks import check_yaml
+
+        with open(check_yaml(self.tracker_config)) as f:
+            tracker_args = SimpleNamespace(**yaml.safe_load(f))
+        self.player_tracker = BYTETracker(args=tracker_args, frame_rate=30)
+
+    def detect_frames(
+        self,
+        frames,
+        read_from_stub=False,
+        player_stub_path=None,
+        ball_stub_path=None,
+        batch_size=1,
+        cache=None,
+        as_tables=False,
+    ):
+        """
+        Detect players and balls in a list of frames.
+
+        :param frames: List of frames or a streaming frame source (e.g. VideoFrameSource).
+        :param read_from_stub: Flag indicating whether to read detections from pre-saved files.
+        :param player_stub_path: Path to the file for saving/loading player detections
+                                 (a ".dets" path uses a memory-mapped DetectionStore).
+        :param ball_stub_path: Path to the file for saving/loading ball detections.
+        :param batch_size: Number of frames passed to the model per forward pass.
+        :param cache: Optional DetectionCache; detections for a video already processed
+                      with the same weights and parameters are loaded instead of recomputed.
+        :param as_tables: Return DetectionTables, which also hold the confidence of each
+                          detection (the track score for players), instead of dicts.
+        :return: (player_detections, ball_detections), each a list with one dictionary per
+                 frame, or a DetectionTable with as_tables.
+        """
+        if read_from_stub and player_stub_path and ball_stub_path:
+            player_detections = load_detections(player_stub_path)
+            ball_detections = load_detections(ball_stub_path)
+            if as_tables:
+                # .pkl stubs hold dicts, without confidences
+                if not isinstance(player_detections, DetectionTable):
+                    player_detections = DetectionTable.from_dicts(player_detections)
+                if not isinstance(ball_detections, DetectionTable):
+                    ball_detections = DetectionTable.from_dicts(
+                        ball_detections, class_id=self.ball_class_id
+                    )
+            return player_detections, ball_detections
+
+        # Load detections from the cache if this video was already processed
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key_for_frames(
+                frames,
+                self.model_path,
+                task="players+ball",
+                player_conf=self.player_conf,
+                ball_conf=self.ball_conf,
+                classes=[self.player_class_name, self.ball_class_id],
+                tracker=self.tracker_config,
+                backend=self.backend,
+                imgsz=self.imgsz,
+                output="tables",
+            )
+            if cache_key is not None:
+                cached_tables = cache.get(cache_key)
+                if cached_tables is not None:
+                    return self._detections_output(cached_tables, as_tables)
+
+        player_detections, ball_detections = [], []
+        player_confidences, ball_confidences = [], []
+
+        def add(batch):
+            for player_dict, ball_dict, player_conf, ball_conf in self._detect_batch(batch):
+                player_detections.append(player_dict)
+                ball_detections.append(ball_dict)
+                player_confidences.append(player_conf)
+                ball_confidences.append(ball_conf)
+
+        batch = []
+        for frame in tqdm(frames, desc="Detecting Players and Balls"):
+            batch.append(frame)
+            if len(batch) == batch_size:
+                add(batch)
+                batch = []
+        if batch:
+            add(batch)
+
+        tables = (
+            DetectionTable.from_dicts(player_detections, confidences=player_confidences),
+            DetectionTable.from_dicts(
+                ball_detections,
+                class_id=self.ball_class_id,
+                confidences=ball_confidences,
+            ),
+        )
+
+        # Save detections to stub files if specified (a .dets store keeps the confidences)
+        if player_stub_path:
+            save_detections(player_stub_path, tables[0])
+        if ball_stub_path:
+            save_detections(ball_stub_path, tables[1], class_id=self.ball_class_id)
+        if cache_key is not None:
+            cache.put(cache_key, tables)
+
+        if as_tables:
+            return tables
+        return player_detections, ball_detections
+
+    @staticmethod
+    def _detections_output(tables, as_tables):
+        """
+        (player, ball) tables as returned by detect_frames: as is, or as per-frame dicts.
+        """
+        if as_tables:
+            return tables
+        return tuple(table.to_dicts() for table in tables)
+
+    def detect_frame(self, frame):
+        """
+        Detect players and balls in a single frame.
+
+        :param frame: Frame to be processed.
+        :return: (player_dict, ball_dict) of bounding boxes for this frame.
+        """
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        """
+        Detect players and balls in consecutive frames with one batched model call.
+
+        Frames must be passed in video order, since the player tracker is updated
+        frame by frame.
+
+        :param frames: List of consecutive frames.
+        :return: List of (player_dict, ball_dict) tuples, one per frame.
+        """
+        return [
+            (player_dict, ball_dict)
+            for player_dict, ball_dict, _, _ in self._detect_batch(frames)
+        ]
+
+    def _detect_batch(self, frames):
+        """
+        detect_batch, also returning the confidences of the detections.
+
+        :return: List of (player_dict, ball_dict, player_conf, ball_conf) tuples, one per
+                 frame, the last two mapping the same keys to the confidences.
+        """
+        results = self.predict(frames)
+
+        return [
+            self._split_results(result, frame) for result, frame in zip(results, frames)
+        ]
+
+    def predict(self, frames):
+        """
+        Raw model results (before ball filtering and player tracking) for a batch of frames.
+
+        :param frames: List of frames of the same size.
+        :return: List of ultralytics Results, one per frame.
+        """
+        predict_args = {}
+        if self.backend == "onnx":
+            predict_args["imgsz"] = self._letterbox_shape(frames[0].shape)
+        return self.model.predict(
+            frames, conf=min(self.player_conf, self.ball_conf), **predict_args
+        )
+
+    def _letterbox_shape(self, frame_shape, stride=32):
+        """
+        Input (height, width) the PyTorch model letterboxes a frame to: longest side
+        imgsz, the other one padded to a multiple of the stride.
+
+        Exported models are letterboxed to a square by default; with a dynamic graph
+        the same rectangular input keeps the outputs (and the compute) the same.
+        """
+        height, width = frame_shape[:2]
+        scale = self.imgsz / max(height, width)
+        return tuple(
+            int(-(-round(side * scale) // stride) * stride) for side in (height, width)
+        )
+
+    def _split_results(self, results, frame):
+        """
+        Helper method to route one frame's detections to the player tracker and the ball pipeline.
+
+        :param results: YOLO results for a single frame.
+        :param frame: The frame the results belong to.
+        :return: (player_dict, ball_dict) of bounding boxes for this frame, then
+                 (player_conf, ball_conf) of their confidences.
+        """
+        boxes = results.boxes.cpu().numpy()
+        class_ids = boxes.cls.astype(int)
+        id_name_dict = results.names
+
+        # Ball: keep every confident tennis_ball box, keyed like BallTracker.detect_frame
+        ball_dict, ball_conf = {}, {}
+        for i, (class_id, conf, bbox) in enumerate(zip(class_ids, boxes.conf, boxes.xyxy)):
+            if class_id == self.ball_class_id and conf >= self.ball_conf:
+                ball_dict[i] = bbox.tolist()
+                ball_conf[i] = float(conf)
+
+        # Players: track the confident player boxes to get persistent track IDs
+        player_mask = np.array(
+            [
+                id_name_dict[class_id] == self.player_class_name
+                and conf >= self.player_conf
+                for class_id, conf in zip(class_ids, boxes.conf)
+            ],
+            dtype=bool,
+        )
+        tracks = self.player_tracker.update(boxes[player_mask], frame)
+
+        # Tracks are [x1, y1, x2, y2, track_id, score, cls, idx]
+        player_dict, player_conf = {}, {}
+        for track in tracks:
+            track_id = int(track[4])
+            player_dict[track_id] = track[:4].tolist()
+            player_conf[track_id] = float(track[5])
+
+        return player_dict, ball_dict, player_conf, ball_conf
@@ -1,9 +1,14 @@
-import pickle
 import cv2
-from ultralytics import YOLO
 import sys
-import pandas as pd
-from utils import approx_center, euclidean_distance
+from utils import (
+    approx_center,
+    euclidean_distance,
+    interpolate_track,
+    map_frames,
+    DetectionTable,
+    save_detections,
+    load_detections,
+)
 from tqdm import tqdm
 import logging
 # Add the "../utils" directory to the system path to import custom utilities if needed
@@ -12,89 +17,91 @@ sys.path.append("../utils")
 logging.getLogger("ultralytics").setLevel(logging.CRITICAL)
 
 class PlayerTracker:
-    def __init__(self, model_path):
+    def __init__(self, model_path=None):
         """
         Initialize the PlayerTracker with the YOLO model from the specified path.
 
-        :param model_path: Path to the YOLO model file.
+        :param model_path: Path to the YOLO model file. Leave as None when detections
+                           come from a shared DetectionEngine.
         """
-        self.model = YOLO(model_path)
+        self.model_path = model_path
+        self.model = None
+        if model_path is not None:
+            # Imported here so post-processing and drawing don't load ultralytics/torch
+            from ultralytics import YOLO
 
-    def interpolate_player_positions(self, player_positions):
+            self.model = YOLO(model_path)
+
+    def interpolate_player_positions(self, player_positions, max_gap=None):
         """
         Interpolate missing player positions in a sequence of frames.
 
-        :param player_positions: List of dictionaries containing player positions for each frame.
-        :return: Interpolated list of player positions.
-        """
-        # Extract coordinates from player_positions, replacing empty positions with [None, None, None, None]
-        extracted_positions = []
-        for pos in player_positions:
-            if len(pos) == 2:
-                coordinates = list(pos.values())
-                extracted_positions.append(coordinates)
-            else:
-                extracted_positions.append(
-                    [[None, None, None, None], [None, None, None, None]]
-                )
-
-        # Flatten the list of coordinates for the DataFrame
-        flattened_positions = []
-        for frame in extracted_positions:
-            flattened_positions.extend(frame)
-
-        # Return original player_positions if extracted_positions is empty or contains only None values
-        if not flattened_positions or all(
-            len(pos) == 0 or all(v is None for v in pos) for pos in flattened_positions
-        ):
-            return player_positions
+        Every track id is interpolated on its own, so positions never bleed between
+        players, and the output keeps the original track ids.
 
-        try:
-            # Create a DataFrame from the extracted positions
-            df_player_positions = pd.DataFrame(
-                flattened_positions, columns=["x1", "y1", "x2", "y2"]
-            )
-        except ValueError as e:
-            # Print the contents causing the ValueError for debugging
-            print("ValueError:", e)
-            print("flattened_positions causing error:", flattened_positions)
-            raise e
-
-        # Interpolate missing values and backfill remaining NaNs
-        df_player_positions = df_player_positions.interpolate()
-        df_player_positions = df_player_positions.bfill()
-
-        # Convert DataFrame back to list of dictionaries
-        player_positions = []
-        for i in range(0, len(df_player_positions), 2):
-            player_positions.append(
-                {
-                    1: df_player_positions.iloc[i].tolist(),
-                    2: df_player_positions.iloc[i + 1].tolist(),
-                }
-            )
+        :param player_positions: List of dictionaries containing player positions for each frame,
+                                 or a DetectionTable.
+        :param max_gap: Longest run of missing frames to fill for a track; longer gaps are
+                        left empty. None fills every gap.
+        :return: Interpolated list of player positions (a DetectionTable if given one).
+        """
+        if isinstance(player_positions, DetectionTable):
+            player_table = player_positions
+        else:
+            player_table = DetectionTable.from_dicts(player_positions)
+
+        # Interpolate each track's (num_frames, 4) box array independently
+        interpolated_tracks = {
+            track_id: interpolate_track(player_table.dense_track(track_id), max_gap)
+            for track_id in player_table.track_ids().tolist()
+        }
+        interpolated_table = DetectionTable.from_tracks(
+            interpolated_tracks, num_frames=player_table.num_frames
+        )
 
-        return player_positions
+        if isinstance(player_positions, DetectionTable):
+            return interpolated_table
+        return interpolated_table.to_dicts()
 
-    def choose_and_filter_players(self, court_keypoints, player_detections):
+    def choose_and_filter_players(
+        self, court_keypoints, player_detections, relabel=False
+    ):
         """
         Choose key players based on court keypoints and filter the detected players.
 
+        The players are chosen from the first frame where at least two players were
+        detected (frame 0 if there is none), as the streaming pipeline does, so a
+        player missed in the opening frame isn't dropped for the whole video.
+
         :param court_keypoints: List of court keypoints.
-        :param player_detections: List of dictionaries containing player detections for each frame.
-        :return: Filtered list of player detections.
+        :param player_detections: List of dictionaries containing player detections for each frame,
+                                  or a DetectionTable.
+        :param relabel: Rename the chosen track ids to 1 and 2 (in the order they were chosen).
+        :return: Filtered list of player detections (a DetectionTable if given one).
         """
-        # Choose players from the first frame based on court keypoints
-        player_detections_first_frame = player_detections[0]
+        # Choose players from the first frame where at least two players were detected
+        player_detections_first_frame = next(
+            (player_dict for player_dict in player_detections if len(player_dict) >= 2),
+            player_detections[0],
+        )
         chosen_player = self.choose_players(
             court_keypoints, player_detections_first_frame
         )
+        player_ids = {
+            track_id: (player_num if relabel else track_id)
+            for player_num, track_id in enumerate(chosen_player, start=1)
+        }
 
         # Filter player detections to keep only chosen players
+        if isinstance(player_detections, DetectionTable):
+            return player_detections.filter_tracks(chosen_player).relabel_tracks(
+                player_ids
+            )
+
         filtered_player_detections = []
         for player_dict in player_detections:
             filtered_player_dict = {
-                track_id: bbox
+                player_ids[track_id]: bbox
                 for track_id, bbox in player_dict.items()
                 if track_id in chosen_player
             }
@@ -135,27 +142,43 @@ class PlayerTracker:
         chosen_players = [distances[0][0], distances[1][0]]
         return chosen_players
 
-    def detect_frames(self, frames, read_from_stub=False, stub_path=None):
+    def detect_frames(self, frames, read_from_stub=False, stub_path=None, cache=None):
         """
         Detect players in a list of frames.
 
-        :param frames: List of frames to be processed.
+        :param frames: List of frames or a streaming frame source (e.g. VideoFrameSource).
         :param read_from_stub: Flag indicating whether to read detections from a pre-saved file.
-        :param stub_path: Path to the file for saving/loading detections.
+        :param stub_path: Path to the file for saving/loading detections (a ".dets"
+                          path uses a memory-mapped DetectionStore, anything else pickle).
+        :param cache: Optional DetectionCache; detections for a video already processed
+                      with the same weights and parameters are loaded instead of recomputed.
         :return: List of player detections for each frame.
         """
         if read_from_stub and stub_path:
             return self._load_detections(stub_path)
 
+        # Load detections from the cache if this video was already processed
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key_for_frames(
+                frames, self.model_path, task="players", classes=["players"]
+            )
+            if cache_key is not None:
+                cached_detections = cache.get(cache_key)
+                if cached_detections is not None:
+                    return cached_detections
+
         # Detect players in each frame with progress tracking using tqdm
         player_detections = []
         for frame in tqdm(frames, desc="Detecting Players"):
             detection = self.detect_frame(frame)
             player_detections.append(detection)
 
-        # If stub_path is provided, save player detections to .pkl file
+        # If stub_path is provided, save player detections to the stub file
         if stub_path:
             self._save_detections(player_detections, stub_path)
+        if cache_key is not None:
+            cache.put(cache_key, player_detections)
 
         return player_detections
 
@@ -195,21 +218,27 @@ class PlayerTracker:
         """
         Draw bounding boxes around detected players in video frames.
 
-        :param video_frames: List of video frames.
+        :param video_frames: List of video frames, or a streaming frame source.
+        :param player_detections: List of player detection dictionaries for each frame.
+        :return: List of video frames with bounding boxes drawn (a generator for streaming sources).
+        """
+        return map_frames(video_frames, self.bbox_layer(player_detections))
+
+    def bbox_layer(self, player_detections):
+        """
+        Render layer drawing the player bounding boxes (see utils.FrameRenderer).
+
         :param player_detections: List of player detection dictionaries for each frame.
-        :return: List of video frames with bounding boxes drawn.
+        :return: Callable layer(frame, frame_num) drawing that frame's boxes in place.
         """
-        # List to store video frames with bounding boxes
-        output_video_frames = []
 
-        # Loop through each frame and its corresponding player detections
-        for frame, player_dict in zip(video_frames, player_detections):
+        def draw_frame(frame, frame_num):
             self._draw_frame_bboxes(
-                frame, player_dict
+                frame, player_detections[frame_num]
             )  # Draw bounding boxes on the frame
-            output_video_frames.append(frame)  # Add the annotated frame to the list
+            return frame
 
-        return output_video_frames
+        return draw_frame
 
     def _draw_frame_bboxes(self, frame, player_dict):
         """
@@ -243,9 +272,8 @@ class PlayerTracker:
         :param path: Path to the file where detections will be saved.
         """
         try:
-            # Open the file in write-binary mode and save detections using pickle
-            with open(path, "wb") as f:
-                pickle.dump(detections, f)
+            # Pickle, or a DetectionStore for ".dets" paths
+            save_detections(path, detections)
         except Exception as e:
             print(f"Error saving detections: {e}")
 
@@ -254,12 +282,11 @@ class PlayerTracker:
         Load the detection results from a file.
 
         :param path: Path to the file from which detections will be loaded.
-        :return: List of detection results.
+        :return: List of detection results (a DetectionTable for ".dets" paths).
         """
         try:
-            # Open the file in read-binary mode and load detections using pickle
-            with open(path, "rb") as f:
-                return pickle.load(f)
+            # Pickle, or a DetectionStore for ".dets" paths
+            return load_detections(path)
         except Exception as e:
             print(f"Error loading detections: {e}")
             return []
@@ -1,4 +1,11 @@
-from .video_utils import load_video_frames, export_video
+from .video_utils import (
+    VideoFrameSource,
+    AsyncVideoWriter,
+    load_video_frames,
+    sample_video_frames,
+    export_video,
+    map_frames,
+)
 from .bbox_utils import (
     approx_center,
     euclidean_distance,
@@ -13,4 +20,23 @@ from .conversions import (
     convert_pixel_distance_to_meters,
     convert_meters_to_pixel_distance,
 )
-from .display_stats import display_stats
+from .display_stats import display_stats, stats_layer, StatsOverlay
+from .rendering import FrameRenderer, frame_number_layer
+from .detection_cache import DetectionCache
+from .detection_table import DetectionTable
+from .detection_store import DetectionStore, save_detections, load_detections
+from .interpolation import interpolate_track
+from .window_utils import sliding_window_max
+from .profiling import StageProfiler, peak_rss_bytes
+from .tracking_export import (
+    TrackingExporter,
+    export_tracking_data,
+    read_tracking_data,
+)
+from .onnx_export import (
+    model_cache_path,
+    onnx_model_path,
+    export_yolo_onnx,
+    export_torch_onnx,
+    onnx_session,
+)
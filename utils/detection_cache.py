@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+
+
+class DetectionCache:
+    """
+    On-disk detection cache keyed by content rather than by file name.
+
+    A key combines a hash of the video file, a hash of the model weights and the
+    inference parameters, so a different video, retrained weights or a changed
+    threshold all miss instead of silently reusing stale detections. Entries are
+    written atomically and the least recently used ones are evicted once the cache
+    grows past ``max_bytes``.
+
+    Parameters:
+    cache_dir (str | Path): Directory holding the cache entries.
+    max_bytes (int): Size limit for all entries together.
+    """
+
+    ENTRY_SUFFIX = ".pkl"
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024**3):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._file_hashes = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, video_path, model_path, **params):
+        """
+        Build the cache key for running a model over a video.
+
+        Parameters:
+        video_path (str | Path): Video the detections come from.
+        model_path (str | Path): Weights used for inference.
+        **params: Inference parameters that change the output (conf, class filter, ...).
+
+        Returns:
+        str: Hex digest identifying the detections.
+        """
+        key_material = {
+            "video": self.hash_file(video_path),
+            "model": self.hash_file(model_path),
+            "params": params,
+        }
+        encoded = json.dumps(key_material, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def key_for_frames(self, frames, model_path, **params):
+        """
+        Like make_key, for a frame source that knows its video file.
+
+        Returns:
+        str | None: The cache key, or None for frames without a video_path
+            (e.g. an in-memory list), which cannot be cached.
+        """
+        video_path = getattr(frames, "video_path", None)
+        if video_path is None or model_path is None:
+            return None
+        return self.make_key(video_path, model_path, **params)
+
+    def hash_file(self, path, chunk_size=1024 * 1024):
+        """
+        SHA-256 of a file's content, memoized per (path, size, mtime).
+        """
+        path = Path(path).resolve()
+        file_stat = path.stat()
+        memo_key = (str(path), file_stat.st_size, file_stat.st_mtime_ns)
+
+        with self._lock:
+            if memo_key in self._file_hashes:
+                return self._file_hashes[memo_key]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+
+        with self._lock:
+            self._file_hashes[memo_key] = digest.hexdigest()
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Load cached detections, or None on a miss.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as f:
+                detections = pickle.load(f)
+        except FileNotFoundError:
+            self._record(hit=False)
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            # Unreadable entry: drop it and recompute
+            print(f"Discarding corrupt detection cache entry {entry_path.name}: {e}")
+            entry_path.unlink(missing_ok=True)
+            self._record(hit=False)
+            return None
+
+        # Touch the entry so eviction treats it as recently used
+        os.utime(entry_path)
+        self._record(hit=True)
+        return detections
+
+    def put(self, key, detections):
+        """
+        Atomically store detections under key, then evict old entries if over the size limit.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry_path = self._entry_path(key)
+
+        # Write to a temporary file in the same directory, then rename over the entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(detections, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        self.evict(keep=entry_path)
+
+    def evict(self, keep=None):
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+
+        Parameters:
+        keep (Path): Entry that must not be evicted (e.g. the one just written).
+        """
+        entries = []
+        for entry_path in self.cache_dir.glob(f"*{self.ENTRY_SUFFIX}"):
+            try:
+                entry_stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((entry_stat.st_mtime_ns, entry_stat.st_size, entry_path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if keep is not None and entry_path == keep:
+                continue
+            entry_path.unlink(missing_ok=True)
+            total_bytes -= size
+
+    def stats(self):
+        """
+        Hit/miss counters for this cache instance.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}{self.ENTRY_SUFFIX}"
+
+    def _record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
@@ -0,0 +1,251 @@
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+from .detection_table import DetectionTable
+
+# One fixed-width little-endian record per detection
+RECORD_DTYPE = np.dtype(
+    [
+        ("frame", "<i8"),
+        ("track_id", "<i8"),
+        ("cls", "<i8"),
+        ("x1", "<f8"),
+        ("y1", "<f8"),
+        ("x2", "<f8"),
+        ("y2", "<f8"),
+        ("conf", "<f8"),
+    ]
+)
+OFFSET_DTYPE = np.dtype("<i8")
+
+
+class DetectionStore:
+    """
+    Binary on-disk detection store with random frame access.
+
+    Detections are kept as fixed-width records (RECORD_DTYPE) in ``<path>``,
+    sorted by frame, next to an index ``<path>.idx`` holding the end row of every
+    frame. Both files are opened with np.memmap, so reading frames N..M only
+    touches the pages of those rows instead of loading the whole file, and
+    frames can be appended while detection is still running.
+
+    The index is written after the records, so it is the commit point: a crash
+    mid-append leaves at most some records past the last indexed frame and part of
+    an index entry. Readers only map the whole entries and the rows they cover and
+    leave the rest alone (it may be another process's append in progress); the
+    next append truncates them away. Both files are fsynced, records first.
+
+    Parameters:
+    path (str | Path): Records file; the index is stored next to it.
+    """
+
+    SUFFIX = ".dets"
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self._records = None
+        self._offsets = None
+
+    @classmethod
+    def create(cls, path):
+        """
+        Create an empty store, replacing any existing one at path.
+        """
+        store = cls(path)
+        store.path.parent.mkdir(parents=True, exist_ok=True)
+        store.path.write_bytes(b"")
+        store.index_path.write_bytes(b"")
+        store._invalidate()
+        return store
+
+    @classmethod
+    def from_detections(cls, path, detections, class_id=-1):
+        """
+        Write a whole video's detections to a new store.
+
+        Parameters:
+        path (str | Path): Records file of the store.
+        detections (list | DetectionTable): One {track_id: bbox} dict per frame, or a table.
+        class_id (int): Class id stored for dict detections.
+        """
+        store = cls.create(path)
+        store.append_table(detections, class_id=class_id)
+        return store
+
+    @property
+    def num_frames(self):
+        return len(self._offsets_map()) if self.index_path.exists() else 0
+
+    @property
+    def num_rows(self):
+        return self._read_num_rows()
+
+    def append_frame(self, detection_dict, class_id=-1):
+        """
+        Append the detections of the next frame.
+
+        Parameters:
+        detection_dict (dict): {track_id: [x1, y1, x2, y2]} for this frame.
+        class_id (int): Class id stored for every detection.
+        """
+        self.append_table(
+            DetectionTable.from_dicts([detection_dict], class_id=class_id), class_id
+        )
+
+    def append_table(self, table, class_id=-1):
+        """
+        Append consecutive frames; frame 0 of table becomes the store's next frame.
+
+        Parameters:
+        table (DetectionTable | list): Detections to append, or per-frame dicts.
+        class_id (int): Class id stored for dict detections.
+        """
+        if not isinstance(table, DetectionTable):
+            table = DetectionTable.from_dicts(table, class_id=class_id)
+
+        first_frame = self.num_frames
+        first_row = self.num_rows
+
+        records = np.empty(table.num_rows, dtype=RECORD_DTYPE)
+        records["frame"] = table.frame + first_frame
+        records["track_id"] = table.track_id
+        records["cls"] = table.cls
+        for i, column in enumerate(("x1", "y1", "x2", "y2")):
+            records[column] = table.xyxy[:, i]
+        records["conf"] = table.conf
+        frame_ends = (table.frame_offsets[1:] + first_row).astype(OFFSET_DTYPE)
+
+        # Drop records written after the last indexed frame (interrupted append),
+        # then a partly written index entry
+        indexed_bytes = first_row * RECORD_DTYPE.itemsize
+        if self.path.exists() and self.path.stat().st_size > indexed_bytes:
+            os.truncate(self.path, indexed_bytes)
+        index_bytes = first_frame * OFFSET_DTYPE.itemsize
+        if self.index_path.exists() and self.index_path.stat().st_size > index_bytes:
+            os.truncate(self.index_path, index_bytes)
+
+        with open(self.path, "ab") as f:
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.index_path, "ab") as f:
+            f.write(frame_ends.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._invalidate()
+
+    def read(self, start_frame=0, end_frame=None):
+        """
+        Read frames [start_frame, end_frame) without loading the rest of the store.
+
+        Returns:
+        DetectionTable: The detections, with frame numbers relative to start_frame
+            (table[i] is frame start_frame + i).
+        """
+        num_frames = self.num_frames
+        end_frame = num_frames if end_frame is None else min(end_frame, num_frames)
+        start_frame = min(max(start_frame, 0), end_frame)
+
+        offsets = self._offsets_map()
+        first_row = int(offsets[start_frame - 1]) if start_frame > 0 else 0
+        last_row = int(offsets[end_frame - 1]) if end_frame > 0 else 0
+        records = self._records_map()[first_row:last_row]
+
+        return DetectionTable(
+            records["frame"] - start_frame,
+            records["track_id"],
+            np.stack([records[c] for c in ("x1", "y1", "x2", "y2")], axis=1),
+            cls=records["cls"],
+            conf=records["conf"],
+            num_frames=end_frame - start_frame,
+        )
+
+    def __len__(self):
+        return self.num_frames
+
+    def __getitem__(self, frame_num):
+        if frame_num < 0:
+            frame_num += self.num_frames
+        if not 0 <= frame_num < self.num_frames:
+            raise IndexError(f"Frame {frame_num} out of range for {self.num_frames} frames")
+        return self.read(frame_num, frame_num + 1)[0]
+
+    def _read_num_rows(self):
+        index_size = self.index_path.stat().st_size if self.index_path.exists() else 0
+        if index_size < OFFSET_DTYPE.itemsize:
+            return 0
+        with open(self.index_path, "rb") as f:
+            f.seek(index_size - index_size % OFFSET_DTYPE.itemsize - OFFSET_DTYPE.itemsize)
+            return int(np.frombuffer(f.read(OFFSET_DTYPE.itemsize), OFFSET_DTYPE)[0])
+
+    def _offsets_map(self):
+        if self._offsets is None:
+            num_frames = self.index_path.stat().st_size // OFFSET_DTYPE.itemsize
+            self._offsets = (
+                np.memmap(
+                    self.index_path, dtype=OFFSET_DTYPE, mode="r", shape=(num_frames,)
+                )
+                if num_frames
+                else np.empty(0, OFFSET_DTYPE)
+            )
+        return self._offsets
+
+    def _records_map(self):
+        if self._records is None:
+            num_rows = self.num_rows
+            self._records = (
+                np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", shape=(num_rows,))
+                if num_rows
+                else np.empty(0, RECORD_DTYPE)
+            )
+        return self._records
+
+    def _invalidate(self):
+        # Appends grow the files; map them again on the next read
+        self._records = None
+        self._offsets = None
+
+    def __repr__(self):
+        return f"DetectionStore({str(self.path)!r}, num_frames={self.num_frames})"
+
+
+def save_detections(path, detections, class_id=-1):
+    """
+    Save per-frame detections to a stub file.
+
+    Paths ending in DetectionStore.SUFFIX (".dets") are written as a detection
+    store; anything else is pickled, as the existing .pkl stubs are (a table is
+    pickled as its per-frame dicts, so those stubs keep their format).
+
+    Parameters:
+    path (str | Path): Stub file.
+    detections (list | DetectionTable): One {track_id: bbox} dict per frame, or a table.
+    class_id (int): Class id stored in a detection store.
+    """
+    if Path(path).suffix == DetectionStore.SUFFIX:
+        DetectionStore.from_detections(path, detections, class_id=class_id)
+        return
+
+    if isinstance(detections, DetectionTable):
+        detections = detections.to_dicts()
+    with open(path, "wb") as f:
+        pickle.dump(detections, f)
+
+
+def load_detections(path):
+    """
+    Load per-frame detections saved with save_detections.
+
+    Returns:
+    list | DetectionTable: A DetectionTable for a detection store, otherwise the
+        pickled list.
+    """
+    if Path(path).suffix == DetectionStore.SUFFIX:
+        return DetectionStore(path).read()
+
+    with open(path, "rb") as f:
+        return pickle.load(f)
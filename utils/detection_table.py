@@ -0,0 +1,233 @@
+import numpy as np
+
+
+class DetectionTable:
+    """
+    Columnar detections for a whole video, backed by NumPy arrays.
+
+    One row per detection with the columns frame, track_id, cls, x1, y1, x2, y2
+    and conf; rows are sorted by frame so every per-frame view is a slice. The
+    table also behaves like the list of per-frame dicts used throughout the
+    pipeline: ``len(table)`` is the number of frames, ``table[frame_num]`` is
+    ``{track_id: [x1, y1, x2, y2]}`` and iterating yields one dict per frame, so
+    code written against the dict format accepts a table unchanged.
+
+    Parameters:
+    frame (array-like): Frame number of each detection.
+    track_id (array-like): Track id (or detection index) of each detection.
+    xyxy (array-like): (N, 4) bounding boxes.
+    cls (array-like): Class id of each detection, -1 if unknown.
+    conf (array-like): Confidence of each detection, NaN if unknown.
+    num_frames (int): Number of frames in the video; defaults to the last frame + 1.
+    """
+
+    COLUMNS = ("frame", "track_id", "cls", "x1", "y1", "x2", "y2", "conf")
+
+    def __init__(self, frame, track_id, xyxy, cls=None, conf=None, num_frames=None):
+        frame = np.asarray(frame, dtype=np.int64).reshape(-1)
+        num_rows = len(frame)
+
+        # Sort rows by frame, keeping the original order within a frame
+        order = np.argsort(frame, kind="stable")
+
+        self.frame = frame[order]
+        self.track_id = np.asarray(track_id, dtype=np.int64).reshape(-1)[order]
+        self.xyxy = np.asarray(xyxy, dtype=np.float64).reshape(num_rows, 4)[order]
+        self.cls = (
+            np.full(num_rows, -1, dtype=np.int64)
+            if cls is None
+            else np.asarray(cls, dtype=np.int64).reshape(-1)[order]
+        )
+        self.conf = (
+            np.full(num_rows, np.nan)
+            if conf is None
+            else np.asarray(conf, dtype=np.float64).reshape(-1)[order]
+        )
+
+        if num_frames is None:
+            num_frames = int(self.frame[-1]) + 1 if num_rows else 0
+        self.num_frames = num_frames
+
+        # frame_offsets[f]:frame_offsets[f + 1] are the rows of frame f
+        self.frame_offsets = np.searchsorted(self.frame, np.arange(num_frames + 1))
+
+    @property
+    def x1(self):
+        return self.xyxy[:, 0]
+
+    @property
+    def y1(self):
+        return self.xyxy[:, 1]
+
+    @property
+    def x2(self):
+        return self.xyxy[:, 2]
+
+    @property
+    def y2(self):
+        return self.xyxy[:, 3]
+
+    @property
+    def num_rows(self):
+        return len(self.frame)
+
+    @classmethod
+    def from_dicts(cls, detections, class_id=-1, confidences=None):
+        """
+        Build a table from the per-frame dict format.
+
+        Parameters:
+        detections (list): One {track_id: [x1, y1, x2, y2]} dict per frame.
+        class_id (int): Class id stored for every detection.
+        confidences (list): One {track_id: conf} dict per frame, keyed like detections;
+            conf is NaN for detections without one (and for all without confidences).
+        """
+        frames, track_ids, boxes, confs = [], [], [], []
+        for frame_num, detection_dict in enumerate(detections):
+            frame_confidences = confidences[frame_num] if confidences is not None else {}
+            for track_id, bbox in detection_dict.items():
+                frames.append(frame_num)
+                track_ids.append(track_id)
+                boxes.append(bbox)
+                confs.append(frame_confidences.get(track_id, np.nan))
+
+        return cls(
+            frames,
+            track_ids,
+            np.asarray(boxes, dtype=np.float64).reshape(-1, 4),
+            cls=np.full(len(frames), class_id),
+            conf=confs,
+            num_frames=len(detections),
+        )
+
+    @classmethod
+    def from_tracks(cls, tracks, class_id=-1, num_frames=None):
+        """
+        Build a table from dense per-track arrays.
+
+        Parameters:
+        tracks (dict): {track_id: (num_frames, 4) array}, NaN rows meaning "not detected".
+        class_id (int): Class id stored for every detection.
+        num_frames (int): Number of frames; defaults to the length of the track arrays.
+        """
+        if num_frames is None:
+            num_frames = len(next(iter(tracks.values()))) if tracks else 0
+        frames, track_ids, boxes = [], [], []
+        for track_id, track_boxes in tracks.items():
+            present = ~np.isnan(track_boxes).any(axis=1)
+            frames.append(np.flatnonzero(present))
+            track_ids.append(np.full(present.sum(), track_id))
+            boxes.append(track_boxes[present])
+
+        if not frames:
+            return cls([], [], np.empty((0, 4)), num_frames=num_frames)
+
+        frames = np.concatenate(frames)
+        return cls(
+            frames,
+            np.concatenate(track_ids),
+            np.concatenate(boxes),
+            cls=np.full(len(frames), class_id),
+            num_frames=num_frames,
+        )
+
+    def to_dicts(self):
+        """
+        Convert back to the per-frame dict format.
+        """
+        return [self[frame_num] for frame_num in range(self.num_frames)]
+
+    def frame_slice(self, frame_num):
+        """
+        Row slice holding the detections of one frame.
+        """
+        return slice(self.frame_offsets[frame_num], self.frame_offsets[frame_num + 1])
+
+    def track_ids(self):
+        """
+        Sorted unique track ids in the table.
+        """
+        return np.unique(self.track_id)
+
+    def track(self, track_id):
+        """
+        Frames and boxes of a single track.
+
+        Returns:
+        tuple: (frames, xyxy) arrays for the rows of this track.
+        """
+        rows = self.track_id == track_id
+        return self.frame[rows], self.xyxy[rows]
+
+    def dense_track(self, track_id):
+        """
+        (num_frames, 4) boxes of a single track, NaN where it was not detected.
+
+        If a track appears more than once in a frame, the last row wins.
+        """
+        frames, boxes = self.track(track_id)
+        dense = np.full((self.num_frames, 4), np.nan)
+        dense[frames] = boxes
+        return dense
+
+    def first_per_frame(self):
+        """
+        (num_frames, 4) boxes of the first detection in each frame, NaN for empty frames.
+        """
+        dense = np.full((self.num_frames, 4), np.nan)
+        starts = self.frame_offsets[:-1]
+        has_rows = self.frame_offsets[1:] > starts
+        dense[has_rows] = self.xyxy[starts[has_rows]]
+        return dense
+
+    def filter_tracks(self, track_ids):
+        """
+        New table with only the rows of the given track ids.
+        """
+        rows = np.isin(self.track_id, list(track_ids))
+        return self._take(rows)
+
+    def relabel_tracks(self, mapping):
+        """
+        New table with track ids replaced according to mapping; unmapped ids are kept.
+        """
+        track_id = self.track_id.copy()
+        for old_track_id, new_track_id in mapping.items():
+            track_id[self.track_id == old_track_id] = new_track_id
+        return DetectionTable(
+            self.frame,
+            track_id,
+            self.xyxy,
+            cls=self.cls,
+            conf=self.conf,
+            num_frames=self.num_frames,
+        )
+
+    def _take(self, rows):
+        return DetectionTable(
+            self.frame[rows],
+            self.track_id[rows],
+            self.xyxy[rows],
+            cls=self.cls[rows],
+            conf=self.conf[rows],
+            num_frames=self.num_frames,
+        )
+
+    def __len__(self):
+        return self.num_frames
+
+    def __getitem__(self, frame_num):
+        if frame_num < 0:
+            frame_num += self.num_frames
+        if not 0 <= frame_num < self.num_frames:
+            raise IndexError(f"Frame {frame_num} out of range for {self.num_frames} frames")
+
+        rows = self.frame_slice(frame_num)
+        return dict(zip(self.track_id[rows].tolist(), self.xyxy[rows].tolist()))
+
+    def __iter__(self):
+        for frame_num in range(self.num_frames):
+            yield self[frame_num]
+
+    def __repr__(self):
+        return f"DetectionTable(num_frames={self.num_frames}, num_rows={self.num_rows})"
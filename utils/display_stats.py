@@ -1,130 +1,190 @@
+import threading
+from collections import OrderedDict
+
 import cv2
+import numpy as np
+from .video_utils import map_frames
 
+STATS_COLUMNS = [
+    "player_1_last_shot_speed",
+    "player_2_last_shot_speed",
+    "player_1_last_player_speed",
+    "player_2_last_player_speed",
+    "player_1_avg_shot_speed",
+    "player_2_avg_shot_speed",
+    "player_1_avg_player_speed",
+    "player_2_avg_player_speed",
+]
 
-def display_stats(output_video_frames, player_stats):
-    for index, row in player_stats.iterrows():
-        player_1_shot_speed = row["player_1_last_shot_speed"]
-        player_2_shot_speed = row["player_2_last_shot_speed"]
-        player_1_speed = row["player_1_last_player_speed"]
-        player_2_speed = row["player_2_last_player_speed"]
-
-        avg_player_1_shot_speed = row["player_1_avg_shot_speed"]
-        avg_player_2_shot_speed = row["player_2_avg_shot_speed"]
-        avg_player_1_speed = row["player_1_avg_player_speed"]
-        avg_player_2_speed = row["player_2_avg_player_speed"]
-
-        frame = output_video_frames[index]
-        # shapes = np.zeros_like(frame, np.uint8)
-
-        width = 350
-        height = 230
-
-        start_x = frame.shape[1] - 400
-        start_y = frame.shape[0] - 500
-        end_x = start_x + width
-        end_y = start_y + height
-
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (start_x, start_y), (end_x, end_y), (0, 0, 0), -1)
-        alpha = 0.5
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-        output_video_frames[index] = frame
-
-        text = "     Player 1     Player 2"
-        output_video_frames[index] = cv2.putText(
-            output_video_frames[index],
-            text,
-            (start_x + 80, start_y + 30),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.6,
-            (255, 255, 255),
-            2,
-        )
 
-        text = "Shot Speed"
-        output_video_frames[index] = cv2.putText(
-            output_video_frames[index],
-            text,
-            (start_x + 10, start_y + 80),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.45,
-            (255, 255, 255),
-            1,
-        )
-        text = f"{player_1_shot_speed:.1f} km/h    {player_2_shot_speed:.1f} km/h"
-        output_video_frames[index] = cv2.putText(
-            output_video_frames[index],
-            text,
-            (start_x + 130, start_y + 80),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            (255, 255, 255),
-            2,
-        )
+class StatsOverlay:
+    """
+    Renders the player stats panel, touching only the panel's region of the frame.
 
-        text = "Player Speed"
-        output_video_frames[index] = cv2.putText(
-            output_video_frames[index],
-            text,
-            (start_x + 10, start_y + 120),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.45,
-            (255, 255, 255),
-            1,
-        )
-        text = f"{player_1_speed:.1f} km/h    {player_2_speed:.1f} km/h"
-        output_video_frames[index] = cv2.putText(
-            output_video_frames[index],
-            text,
-            (start_x + 130, start_y + 120),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            (255, 255, 255),
-            2,
-        )
+    The text of a panel is rasterized once per distinct set of stats into a small
+    coverage layer and cached; since the stats only change at hit frames, most
+    frames just blend the background box and composite the cached text pixels.
+
+    Parameters:
+    width (int): Width of the background box.
+    height (int): Height of the background box.
+    cache_size (int): Number of rendered text layers kept.
+    """
+
+    def __init__(self, width=350, height=230, cache_size=8):
+        self.width = width
+        self.height = height
+        self.cache_size = cache_size
+        self.alpha = 0.5
+        self.text_color = np.array([255, 255, 255], np.float32)
+        self._text_layers = OrderedDict()
+        self._lock = threading.Lock()
 
-        text = "avg. S. Speed"
-        output_video_frames[index] = cv2.putText(
-            output_video_frames[index],
-            text,
-            (start_x + 10, start_y + 160),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.45,
-            (255, 255, 255),
-            1,
+    def panel_position(self, frame_shape):
+        """
+        (start_x, start_y, end_x, end_y) of the background box, in frame coordinates.
+        """
+        start_x = frame_shape[1] - 400
+        start_y = frame_shape[0] - 500
+        return start_x, start_y, start_x + self.width, start_y + self.height
+
+    def draw(self, frame, stats):
+        """
+        Draw the stats panel onto frame in place.
+
+        :param frame: Frame to draw on.
+        :param stats: The eight values of STATS_COLUMNS, in that order.
+        :return: The frame.
+        """
+        start_x, start_y, end_x, end_y = self.panel_position(frame.shape)
+
+        # Darken the background box (the rectangle includes its end points)
+        box = frame[
+            max(start_y, 0) : max(end_y + 1, 0), max(start_x, 0) : max(end_x + 1, 0)
+        ]
+        if box.size:
+            cv2.addWeighted(
+                box, self.alpha, np.zeros_like(box), 1 - self.alpha, 0, dst=box
+            )
+
+        # Paste the text for these stats
+        (x0, y0, x1, y1), text_pixels, alpha = self._text_layer(
+            self._texts(stats), frame.shape, start_x, start_y
         )
-        text = (
+        text_region = frame[y0:y1, x0:x1]
+        background = text_region[text_pixels].astype(np.float32)
+        text_region[text_pixels] = np.rint(
+            background + (self.text_color - background) * alpha
+        ).astype(np.uint8)
+
+        return frame
+
+    def _texts(self, stats):
+        (
+            player_1_shot_speed,
+            player_2_shot_speed,
+            player_1_speed,
+            player_2_speed,
+            avg_player_1_shot_speed,
+            avg_player_2_shot_speed,
+            avg_player_1_speed,
+            avg_player_2_speed,
+        ) = stats
+
+        shot_speed = f"{player_1_shot_speed:.1f} km/h    {player_2_shot_speed:.1f} km/h"
+        player_speed = f"{player_1_speed:.1f} km/h    {player_2_speed:.1f} km/h"
+        avg_shot_speed = (
             f"{avg_player_1_shot_speed:.1f} km/h    {avg_player_2_shot_speed:.1f} km/h"
         )
-        output_video_frames[index] = cv2.putText(
-            output_video_frames[index],
-            text,
-            (start_x + 130, start_y + 160),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            (255, 255, 255),
-            2,
-        )
+        avg_player_speed = f"{avg_player_1_speed:.1f} km/h    {avg_player_2_speed:.1f} km/h"
 
-        text = "avg. P. Speed"
-        output_video_frames[index] = cv2.putText(
-            output_video_frames[index],
-            text,
-            (start_x + 10, start_y + 200),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.45,
-            (255, 255, 255),
-            1,
-        )
-        text = f"{avg_player_1_speed:.1f} km/h    {avg_player_2_speed:.1f} km/h"
-        output_video_frames[index] = cv2.putText(
-            output_video_frames[index],
-            text,
-            (start_x + 130, start_y + 200),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            (255, 255, 255),
-            2,
+        # (text, offset from the box's top left corner, font scale, thickness)
+        return (
+            ("     Player 1     Player 2", (80, 30), 0.6, 2),
+            ("Shot Speed", (10, 80), 0.45, 1),
+            (shot_speed, (130, 80), 0.5, 2),
+            ("Player Speed", (10, 120), 0.45, 1),
+            (player_speed, (130, 120), 0.5, 2),
+            ("avg. S. Speed", (10, 160), 0.45, 1),
+            (avg_shot_speed, (130, 160), 0.5, 2),
+            ("avg. P. Speed", (10, 200), 0.45, 1),
+            (avg_player_speed, (130, 200), 0.5, 2),
         )
 
-    return output_video_frames
+    def _text_layer(self, texts, frame_shape, start_x, start_y):
+        key = (texts, frame_shape[:2])
+        with self._lock:
+            if key in self._text_layers:
+                self._text_layers.move_to_end(key)
+                return self._text_layers[key]
+
+        # Bounding box of all the text, clipped to the frame
+        x0, y0, x1, y1 = np.inf, np.inf, -np.inf, -np.inf
+        for text, (offset_x, offset_y), font_scale, thickness in texts:
+            (text_width, text_height), baseline = cv2.getTextSize(
+                text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness
+            )
+            margin = thickness + 1
+            x0 = min(x0, start_x + offset_x - margin)
+            y0 = min(y0, start_y + offset_y - text_height - margin)
+            x1 = max(x1, start_x + offset_x + text_width + margin)
+            y1 = max(y1, start_y + offset_y + baseline + margin)
+        x0, y0 = max(int(x0), 0), max(int(y0), 0)
+        x1, y1 = min(int(x1), frame_shape[1]), min(int(y1), frame_shape[0])
+        x1, y1 = max(x1, x0), max(y1, y0)
+
+        # Render white text on black: each pixel's value is the text's coverage there
+        # (nothing to render when the text is entirely outside the frame)
+        coverage = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        if coverage.size:
+            for text, (offset_x, offset_y), font_scale, thickness in texts:
+                cv2.putText(
+                    coverage,
+                    text,
+                    (start_x + offset_x - x0, start_y + offset_y - y0),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale,
+                    255,
+                    thickness,
+                )
+        text_pixels = np.nonzero(coverage)
+        alpha = (coverage[text_pixels].astype(np.float32) / 255)[:, None]
+
+        text_layer = ((x0, y0, x1, y1), text_pixels, alpha)
+        with self._lock:
+            self._text_layers[key] = text_layer
+            if len(self._text_layers) > self.cache_size:
+                self._text_layers.popitem(last=False)
+        return text_layer
+
+
+def display_stats(output_video_frames, player_stats, stats_overlay=None):
+    """
+    Draw the player stats panel on every frame.
+
+    Parameters:
+    output_video_frames (list | iterable): Frames to draw on (lazily for streaming sources).
+    player_stats (pd.DataFrame): One row of stats per frame.
+    stats_overlay (StatsOverlay): Renderer to use; a new one by default.
+
+    Returns:
+    list | generator: Frames with the stats panel drawn.
+    """
+    return map_frames(output_video_frames, stats_layer(player_stats, stats_overlay))
+
+
+def stats_layer(player_stats, stats_overlay=None):
+    """
+    Render layer drawing the player stats panel (see FrameRenderer).
+
+    Parameters:
+    player_stats (pd.DataFrame): One row of stats per frame.
+    stats_overlay (StatsOverlay): Renderer to use; a new one by default.
+
+    Returns:
+    callable: Layer(frame, frame_num) drawing that frame's stats in place.
+    """
+    stats_overlay = stats_overlay or StatsOverlay()
+    stats_values = player_stats[STATS_COLUMNS].to_numpy().tolist()
+
+    return lambda frame, frame_num: stats_overlay.draw(frame, stats_values[frame_num])
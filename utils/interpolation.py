@@ -0,0 +1,61 @@
+import numpy as np
+
+
+def interpolate_track(boxes, max_gap=None):
+    """
+    Linearly fill the frames where a track was not detected.
+
+    Gaps between two detections are interpolated; frames before the first or after
+    the last detection take the nearest detected value (like pandas interpolate()
+    followed by bfill()).
+
+    Parameters:
+    boxes (np.ndarray): (num_frames, k) values of one track, NaN rows where missing.
+    max_gap (int): Longest run of missing frames that is filled. Longer runs stay NaN.
+        None fills every gap.
+
+    Returns:
+    np.ndarray: (num_frames, k) array with the gaps filled.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    present = ~np.isnan(boxes).any(axis=1)
+    if present.all() or not present.any():
+        return boxes.copy()
+
+    frame_nums = np.arange(len(boxes))
+    present_frames = np.flatnonzero(present)
+    filled = np.column_stack(
+        [
+            np.interp(frame_nums, present_frames, boxes[present_frames, column])
+            for column in range(boxes.shape[1])
+        ]
+    )
+
+    if max_gap is not None:
+        filled[missing_runs_longer_than(~present, max_gap)] = np.nan
+
+    return filled
+
+
+def missing_runs_longer_than(missing, max_gap):
+    """
+    Mask of the entries that belong to a run of True values longer than max_gap.
+
+    Parameters:
+    missing (np.ndarray): Boolean array, True where a value is missing.
+    max_gap (int): Longest run that is not flagged.
+
+    Returns:
+    np.ndarray: Boolean mask with the same shape as missing.
+    """
+    padded = np.concatenate(([False], missing, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    run_starts, run_ends = edges[::2], edges[1::2]
+    run_lengths = run_ends - run_starts
+
+    # Mark each too-long run with +1 at its start and -1 after its end, then accumulate
+    marks = np.zeros(len(missing) + 1, dtype=np.int64)
+    too_long = run_lengths > max_gap
+    np.add.at(marks, run_starts[too_long], 1)
+    np.add.at(marks, run_ends[too_long], -1)
+    return np.cumsum(marks[:-1]) > 0
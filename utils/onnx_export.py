@@ -0,0 +1,145 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+
+def _import_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError(
+            "The ONNX backend requires onnxruntime (pip install -e '.[onnx]')"
+        ) from e
+    return onnxruntime
+
+
+def model_cache_path(model_path, cache_dir, suffix, tag=""):
+    """
+    Where a model derived from a weights file (an export, a quantized copy) is cached.
+
+    The file name includes a hash of the weights, so retrained weights are
+    converted again instead of reusing a stale model.
+
+    Parameters:
+    model_path (str | Path): Weights file (e.g. best.pt, keypoints_model.pth).
+    cache_dir (str | Path): Directory of the derived models.
+    suffix (str): File extension, e.g. ".onnx".
+    tag (str): Settings that change the derived model (e.g. the input size).
+
+    Returns:
+    Path: The cached path (which may not exist yet).
+    """
+    model_path = Path(model_path)
+
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    name = f"{model_path.stem}-{digest.hexdigest()[:16]}{'-' + tag if tag else ''}{suffix}"
+    return Path(cache_dir) / name
+
+
+def onnx_model_path(model_path, cache_dir=None, tag=""):
+    """
+    Where the ONNX export of a weights file is cached (see model_cache_path).
+
+    Parameters:
+    model_path (str | Path): Weights file (e.g. best.pt, keypoints_model.pth).
+    cache_dir (str | Path): Directory of the exported graphs; an "onnx" directory
+        next to the weights by default.
+    tag (str): Export settings that change the graph (e.g. the input size).
+
+    Returns:
+    Path: The .onnx path (which may not exist yet).
+    """
+    if cache_dir is None:
+        cache_dir = Path(model_path).parent / "onnx"
+    return model_cache_path(model_path, cache_dir, ".onnx", tag=tag)
+
+
+def export_yolo_onnx(model_path, cache_dir=None, imgsz=640):
+    """
+    Export YOLO weights to ONNX once, with a dynamic batch size.
+
+    Parameters:
+    model_path (str | Path): YOLO weights (.pt).
+    cache_dir (str | Path): Directory of the exported graphs (see onnx_model_path).
+    imgsz (int): Input size of the exported model.
+
+    Returns:
+    Path: The cached .onnx file, loadable with YOLO(path, task="detect").
+    """
+    onnx_path = onnx_model_path(model_path, cache_dir, tag=f"{imgsz}")
+    if onnx_path.exists():
+        return onnx_path
+
+    from ultralytics import YOLO
+
+    # Ultralytics writes the graph next to the weights; move it into the cache
+    exported_path = YOLO(str(model_path)).export(
+        format="onnx", imgsz=imgsz, dynamic=True
+    )
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = onnx_path.with_suffix(".onnx.tmp")
+    shutil.move(str(exported_path), temp_path)
+    os.replace(temp_path, onnx_path)
+    return onnx_path
+
+
+def export_torch_onnx(model, input_shape, onnx_path, input_name="input", output_name="output"):
+    """
+    Export a PyTorch model to ONNX with a dynamic batch size.
+
+    Parameters:
+    model (torch.nn.Module): Model to export (moved to the CPU, in eval mode).
+    input_shape (tuple): Shape of an example input, batch first.
+    onnx_path (str | Path): Output file; written atomically.
+    input_name (str): Name of the graph input.
+    output_name (str): Name of the graph output.
+
+    Returns:
+    Path: onnx_path.
+    """
+    import torch
+
+    onnx_path = Path(onnx_path)
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = onnx_path.with_suffix(".onnx.tmp")
+
+    model = model.cpu().eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            torch.zeros(input_shape),
+            str(temp_path),
+            input_names=[input_name],
+            output_names=[output_name],
+            dynamic_axes={input_name: {0: "batch"}, output_name: {0: "batch"}},
+            opset_version=17,
+        )
+    os.replace(temp_path, onnx_path)
+    return onnx_path
+
+
+def onnx_session(onnx_path, threads=None):
+    """
+    ONNX Runtime session on the CPU execution provider.
+
+    Parameters:
+    onnx_path (str | Path): Exported graph.
+    threads (int): Intra-op threads; ONNX Runtime's default (all cores) if None.
+
+    Returns:
+    onnxruntime.InferenceSession
+    """
+    onnxruntime = _import_onnxruntime()
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+    return onnxruntime.InferenceSession(
+        str(onnx_path), options, providers=["CPUExecutionProvider"]
+    )
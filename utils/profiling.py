@@ -0,0 +1,323 @@
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process so far, or None where unsupported.
+    """
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _rss_growth(peak_rss_before):
+    # Growth of the process peak RSS since peak_rss_before (None where unsupported)
+    if peak_rss_before is None:
+        return None
+    return peak_rss_bytes() - peak_rss_before
+
+
+class _LayerTiming:
+    """
+    Render layer timings of one thread, not yet added to the profiler.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.frames = 0
+        # Only contended when a report is made while the thread is rendering
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.seconds += seconds
+            self.frames += 1
+            return self.frames
+
+    def take(self):
+        with self._lock:
+            seconds, frames = self.seconds, self.frames
+            self.seconds, self.frames = 0.0, 0
+        return seconds, frames
+
+
+class StageProfiler:
+    """
+    Collects wall time, throughput, memory and allocation figures per pipeline stage.
+
+    Stages are measured with the ``stage`` context manager, or with ``wrap`` for
+    lazy iterables (e.g. decoding, or a generator of rendered frames) where only
+    the time spent producing items is counted, and ``wrap_layer`` for render
+    layers.
+
+    ``stage`` and ``wrap`` also record how much they raised the process peak RSS
+    (ru_maxrss can only grow, so a stage that stays below an earlier peak shows 0);
+    the stage that raised it most is the one that sizes the machine. Stages that
+    run concurrently share the growth between them.
+
+    With ``trace_allocations`` the net and peak Python allocations of each
+    ``stage`` block are recorded with tracemalloc (which slows everything down).
+    tracemalloc has a single, process-wide peak, so allocations are only recorded
+    for stages that don't overlap another traced stage: a stage nested in another
+    one, or started while another thread's stage runs, is timed without them (and
+    counts towards the enclosing stage's allocations).
+
+    Parameters:
+    trace_allocations (bool): Record allocation deltas with tracemalloc.
+    """
+
+    def __init__(self, trace_allocations=False):
+        self.trace_allocations = trace_allocations
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._layer_timings = []
+        self._tracing_allocations = False
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, frames=None):
+        """
+        Measure the block as stage name.
+
+        Parameters:
+        name (str): Stage name.
+        frames (int): Frames processed by the stage, for frames/sec.
+        """
+        # Only one stage at a time may reset tracemalloc's process-wide peak
+        trace_allocations = False
+        if self.trace_allocations:
+            with self._lock:
+                trace_allocations = not self._tracing_allocations
+                self._tracing_allocations = True
+        if trace_allocations:
+            allocated_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        peak_rss_before = peak_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - start
+            allocation = None
+            if trace_allocations:
+                allocated_after, allocated_peak = tracemalloc.get_traced_memory()
+                allocation = (
+                    allocated_after - allocated_before,
+                    allocated_peak - allocated_before,
+                )
+                with self._lock:
+                    self._tracing_allocations = False
+            self.record(
+                name, seconds, frames, allocation, _rss_growth(peak_rss_before)
+            )
+
+    def wrap(self, name, iterable):
+        """
+        Iterate over iterable, timing only the production of each item as stage name.
+
+        Returns:
+        generator: The items of iterable.
+        """
+        iterator = iter(iterable)
+        seconds = 0.0
+        frames = 0
+        peak_rss_before = peak_rss_bytes()
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - start
+                frames += 1
+                yield item
+        finally:
+            self.record(name, seconds, frames, rss_growth=_rss_growth(peak_rss_before))
+
+    def wrap_layer(self, name, layer, flush_frames=16):
+        """
+        Render layer that times each call of layer (summed across render threads).
+
+        Each render thread sums its own timings and adds them to the stage every
+        flush_frames frames (and when the report is made), so the threads don't
+        contend on the profiler's lock or sample the RSS for every frame.
+        """
+        local = threading.local()
+
+        def timed_layer(frame, frame_num):
+            timing = getattr(local, "timing", None)
+            if timing is None:
+                timing = local.timing = _LayerTiming(name)
+                with self._lock:
+                    self._layer_timings.append(timing)
+
+            start = time.perf_counter()
+            frame = layer(frame, frame_num)
+            if timing.add(time.perf_counter() - start) >= flush_frames:
+                self._flush_layer_timing(timing)
+            return frame
+
+        return timed_layer
+
+    def _flush_layer_timing(self, timing):
+        seconds, frames = timing.take()
+        if frames:
+            self.record(timing.name, seconds, frames)
+
+    def record(self, name, seconds, frames=None, allocation=None, rss_growth=None):
+        """
+        Add a measurement to stage name; repeated measurements accumulate.
+
+        Parameters:
+        name (str): Stage name.
+        seconds (float): Wall time.
+        frames (int): Frames processed.
+        allocation (tuple): (net bytes, peak bytes) allocated, if traced.
+        rss_growth (int): Bytes the process peak RSS grew by during the measurement.
+        """
+        with self._lock:
+            stage = self.stages.setdefault(
+                name,
+                {
+                    "seconds": 0.0,
+                    "frames": 0,
+                    "calls": 0,
+                    "peak_rss_growth_bytes": None,
+                    "allocated_bytes": None,
+                    "peak_allocated_bytes": None,
+                },
+            )
+            stage["seconds"] += seconds
+            stage["calls"] += 1
+            if frames is not None:
+                stage["frames"] += frames
+            if rss_growth is not None:
+                stage["peak_rss_growth_bytes"] = (
+                    stage["peak_rss_growth_bytes"] or 0
+                ) + rss_growth
+            if allocation is not None:
+                net_bytes, peak_bytes = allocation
+                stage["allocated_bytes"] = (stage["allocated_bytes"] or 0) + net_bytes
+                stage["peak_allocated_bytes"] = max(
+                    stage["peak_allocated_bytes"] or 0, peak_bytes
+                )
+
+    def report(self):
+        """
+        All measurements, with frames/sec per stage.
+
+        Returns:
+        dict: {"stages": {name: {...}}, "peak_rss_bytes": int | None}
+        """
+        with self._lock:
+            layer_timings = list(self._layer_timings)
+        for timing in layer_timings:
+            self._flush_layer_timing(timing)
+
+        with self._lock:
+            stages = {
+                name: dict(
+                    stage,
+                    fps=stage["frames"] / stage["seconds"] if stage["seconds"] else None,
+                )
+                for name, stage in self.stages.items()
+            }
+        return {"stages": stages, "peak_rss_bytes": peak_rss_bytes()}
+
+    def write_json(self, path):
+        """
+        Write the report as JSON.
+        """
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def to_prometheus(self, prefix="tennis_cv"):
+        """
+        The report in the Prometheus text exposition format.
+        """
+        report = self.report()
+        metrics = [
+            ("stage_seconds", "seconds", "Wall time spent in the stage."),
+            ("stage_frames", "frames", "Frames processed by the stage."),
+            ("stage_fps", "fps", "Frames per second of the stage."),
+            (
+                "stage_peak_rss_growth_bytes",
+                "peak_rss_growth_bytes",
+                "Growth of the process peak RSS during the stage.",
+            ),
+            (
+                "stage_allocated_bytes",
+                "allocated_bytes",
+                "Net Python allocations of the stage.",
+            ),
+            (
+                "stage_peak_allocated_bytes",
+                "peak_allocated_bytes",
+                "Peak Python allocations during the stage.",
+            ),
+        ]
+
+        lines = []
+        for metric, key, description in metrics:
+            samples = [
+                (name, stage[key])
+                for name, stage in report["stages"].items()
+                if stage[key] is not None
+            ]
+            if not samples:
+                continue
+            lines.append(f"# HELP {prefix}_{metric} {description}")
+            lines.append(f"# TYPE {prefix}_{metric} gauge")
+            for name, value in samples:
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{prefix}_{metric}{{stage="{label}"}} {value}')
+
+        if report["peak_rss_bytes"] is not None:
+            lines.append(f"# HELP {prefix}_peak_rss_bytes Process peak RSS.")
+            lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+            lines.append(f"{prefix}_peak_rss_bytes {report['peak_rss_bytes']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Write the report in the Prometheus text format (e.g. for a textfile collector).
+        """
+        with open(path, "w") as f:
+            f.write(self.to_prometheus())
+
+    def format_report(self):
+        """
+        The per-stage figures as a printable table.
+        """
+        lines = [
+            f"{'stage':<24} {'seconds':>8} {'frames':>7} {'fps':>9} {'+peak RSS MB':>12}"
+        ]
+        report = self.report()
+        for name, stage in report["stages"].items():
+            fps = f"{stage['fps']:.1f}" if stage["fps"] is not None else "-"
+            rss = (
+                f"{stage['peak_rss_growth_bytes'] / 1024**2:.0f}"
+                if stage["peak_rss_growth_bytes"] is not None
+                else "-"
+            )
+            lines.append(
+                f"{name:<24} {stage['seconds']:>8.2f} {stage['frames']:>7} {fps:>9} {rss:>12}"
+            )
+        if report["peak_rss_bytes"] is not None:
+            lines.append(f"Process peak RSS: {report['peak_rss_bytes'] / 1024**2:.0f} MB")
+        return "\n".join(lines)
@@ -0,0 +1,224 @@
+import math
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            "Exporting tracking data requires pyarrow (pip install pyarrow)"
+        ) from e
+    return pa, pq
+
+
+class TrackingExporter:
+    """
+    Streams per-frame tracking data and stats to a Parquet file.
+
+    Each frame becomes one row of a wide table: the player and ball boxes, their
+    mini court positions and the match stats of that frame, NaN where something
+    was not detected. Rows are written in row groups of ``row_group_frames``
+    consecutive frames as soon as a group is full, so memory stays bounded and a
+    frame range can be read back by loading only the row groups that cover it.
+
+    Columns:
+    frame_num, player_<id>_x1/y1/x2/y2, ball_x1/y1/x2/y2,
+    player_<id>_court_x/y, ball_court_x/y, then one column per stat.
+
+    Parameters:
+    output_path (str | Path): Parquet file to write.
+    player_ids (tuple): Track ids of the players, one column group each.
+    row_group_frames (int): Number of frames per row group.
+    compression (str): Parquet compression codec.
+    """
+
+    def __init__(
+        self, output_path, player_ids=(1, 2), row_group_frames=1024, compression="zstd"
+    ):
+        self.pa, self.pq = _import_pyarrow()
+        self.output_path = str(output_path)
+        self.player_ids = tuple(player_ids)
+        self.row_group_frames = row_group_frames
+        self.compression = compression
+        self.frames_written = 0
+
+        self.columns = ["frame_num"]
+        for pid in self.player_ids:
+            self.columns += [f"player_{pid}_{c}" for c in ("x1", "y1", "x2", "y2")]
+        self.columns += ["ball_x1", "ball_y1", "ball_x2", "ball_y2"]
+        for pid in self.player_ids:
+            self.columns += [f"player_{pid}_court_x", f"player_{pid}_court_y"]
+        self.columns += ["ball_court_x", "ball_court_y"]
+        self.stats_columns = None
+
+        self._rows = {column: [] for column in self.columns}
+        self._writer = None
+
+    def write(
+        self,
+        frame_num,
+        player_boxes,
+        ball_boxes,
+        player_positions=None,
+        ball_positions=None,
+        stats=None,
+    ):
+        """
+        Add one frame.
+
+        Parameters:
+        frame_num (int): Frame number.
+        player_boxes (dict): {player_id: [x1, y1, x2, y2]} for this frame.
+        ball_boxes (dict): {1: [x1, y1, x2, y2]} for this frame, empty if no ball.
+        player_positions (dict): {player_id: (x, y)} mini court positions.
+        ball_positions (dict): {1: (x, y)} mini court position of the ball.
+        stats (dict): Stat name -> value for this frame; every frame must have the same stats.
+        """
+        rows = self._rows
+        rows["frame_num"].append(int(frame_num))
+        for pid in self.player_ids:
+            self._append(f"player_{pid}_", ("x1", "y1", "x2", "y2"), player_boxes.get(pid))
+        self._append("ball_", ("x1", "y1", "x2", "y2"), ball_boxes.get(1))
+        for pid in self.player_ids:
+            self._append(
+                f"player_{pid}_",
+                ("court_x", "court_y"),
+                (player_positions or {}).get(pid),
+            )
+        self._append("ball_", ("court_x", "court_y"), (ball_positions or {}).get(1))
+
+        if stats is not None:
+            if self.stats_columns is None:
+                if self.frames_written or len(rows["frame_num"]) > 1:
+                    raise ValueError("Stats must be given for every frame or for none")
+                self.stats_columns = [c for c in stats if c != "frame_num"]
+                for column in self.stats_columns:
+                    rows[column] = []
+            for column in self.stats_columns:
+                rows[column].append(float(stats[column]))
+        elif self.stats_columns is not None:
+            raise ValueError("Stats must be given for every frame or for none")
+
+        if len(rows["frame_num"]) >= self.row_group_frames:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered frames as one row group.
+        """
+        if not self._rows["frame_num"]:
+            return
+
+        pa = self.pa
+        table = pa.table(
+            {
+                column: pa.array(
+                    values, type=pa.int64() if column == "frame_num" else pa.float64()
+                )
+                for column, values in self._rows.items()
+            }
+        )
+        if self._writer is None:
+            self._writer = self.pq.ParquetWriter(
+                self.output_path, table.schema, compression=self.compression
+            )
+        self._writer.write_table(table, row_group_size=table.num_rows)
+
+        self.frames_written += table.num_rows
+        self._rows = {column: [] for column in self._rows}
+
+    def close(self):
+        """
+        Write the remaining frames and finalize the file.
+        """
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _append(self, prefix, names, values):
+        for i, name in enumerate(names):
+            self._rows[prefix + name].append(
+                float(values[i]) if values is not None else math.nan
+            )
+
+
+def export_tracking_data(
+    output_path,
+    player_detections,
+    ball_detections,
+    player_mini_court_detections=None,
+    ball_mini_court_detections=None,
+    player_stats=None,
+    row_group_frames=1024,
+):
+    """
+    Export the tracking results of a whole video to Parquet (see TrackingExporter).
+
+    Parameters:
+    output_path (str | Path): Parquet file to write.
+    player_detections (list): One {player_id: bbox} dict per frame (or a DetectionTable).
+    ball_detections (list): One {1: bbox} dict per frame (or a DetectionTable).
+    player_mini_court_detections (list): One {player_id: (x, y)} dict per frame.
+    ball_mini_court_detections (list): One {1: (x, y)} dict per frame.
+    player_stats (pd.DataFrame): One row of stats per frame.
+    row_group_frames (int): Number of frames per row group.
+
+    Returns:
+    int: Number of frames written.
+    """
+    stats_records = (
+        player_stats.to_dict("records") if player_stats is not None else None
+    )
+
+    with TrackingExporter(output_path, row_group_frames=row_group_frames) as exporter:
+        for frame_num in range(len(player_detections)):
+            exporter.write(
+                frame_num,
+                player_detections[frame_num],
+                ball_detections[frame_num],
+                player_mini_court_detections[frame_num]
+                if player_mini_court_detections is not None
+                else None,
+                ball_mini_court_detections[frame_num]
+                if ball_mini_court_detections is not None
+                else None,
+                stats_records[frame_num] if stats_records is not None else None,
+            )
+
+    print(f"Saved Tracking Data To: {output_path}")
+    return exporter.frames_written
+
+
+def read_tracking_data(path, columns=None, start_frame=None, end_frame=None):
+    """
+    Load exported tracking data, optionally only some columns and a frame range.
+
+    Only the row groups overlapping [start_frame, end_frame) are read.
+
+    Parameters:
+    path (str | Path): Parquet file written by TrackingExporter.
+    columns (list): Columns to load; all by default.
+    start_frame (int): First frame to load.
+    end_frame (int): Frame after the last one to load.
+
+    Returns:
+    pd.DataFrame: The selected rows and columns.
+    """
+    _, pq = _import_pyarrow()
+
+    filters = []
+    if start_frame is not None:
+        filters.append(("frame_num", ">=", start_frame))
+    if end_frame is not None:
+        filters.append(("frame_num", "<", end_frame))
+
+    table = pq.read_table(path, columns=columns, filters=filters or None)
+    return table.to_pandas()
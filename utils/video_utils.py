@@ -1,11 +1,207 @@
+import queue
+import threading
+
 import cv2
+import numpy as np
 from tqdm import tqdm
 
 
+class VideoFrameSource:
+    """
+    Lazy, re-iterable frame source backed by cv2.VideoCapture.
+
+    Frames are decoded on a background thread into a bounded read-ahead buffer,
+    so only ``buffer_size`` frames are held in memory at any time regardless of
+    the length of the video. Every call to ``iter()`` starts a fresh decode from
+    the first frame, which lets several stages (player detection, ball detection,
+    rendering) walk the video one after another without keeping it in memory.
+
+    Parameters:
+    video_path (str): Path to the video file.
+    buffer_size (int): Maximum number of decoded frames buffered ahead of the consumer.
+    """
+
+    def __init__(self, video_path, buffer_size=32):
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+
+        self.video_path = str(video_path)
+        self.buffer_size = buffer_size
+
+        video_capture = self._open_capture()
+        self.frame_count = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = video_capture.get(cv2.CAP_PROP_FPS)
+        self.width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        video_capture.release()
+
+        # Dedicated capture for random access, opened on first use
+        self._seek_capture = None
+        self._seek_position = None
+        self._seek_lock = threading.Lock()
+
+    @property
+    def size(self):
+        """(width, height) of the decoded frames."""
+        return (self.width, self.height)
+
+    def __len__(self):
+        return self.frame_count
+
+    def __iter__(self):
+        return self._read_frames()
+
+    def __getitem__(self, index):
+        """
+        Decode a single frame by index.
+
+        Sequential indices reuse the open capture; anything else seeks first.
+        """
+        if index < 0:
+            index += self.frame_count
+        if not 0 <= index < self.frame_count:
+            raise IndexError(f"Frame index {index} out of range for {self.frame_count} frames")
+
+        with self._seek_lock:
+            if self._seek_capture is None:
+                self._seek_capture = self._open_capture()
+                self._seek_position = 0
+
+            if index != self._seek_position:
+                self._seek_capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+
+            frame_success, frame = self._seek_capture.read()
+            if not frame_success:
+                self._seek_position = None
+                raise IndexError(f"Unable to decode frame {index} from: {self.video_path}")
+
+            self._seek_position = index + 1
+            return frame
+
+    def close(self):
+        """Release the random access capture, if one was opened."""
+        with self._seek_lock:
+            if self._seek_capture is not None:
+                self._seek_capture.release()
+                self._seek_capture = None
+                self._seek_position = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open_capture(self):
+        video_capture = cv2.VideoCapture(self.video_path)
+        if not video_capture.isOpened():
+            raise IOError(f"Unable to open video file at: {self.video_path}")
+        return video_capture
+
+    def _read_frames(self):
+        frame_buffer = queue.Queue(maxsize=self.buffer_size)
+        stop_event = threading.Event()
+        end_of_stream = object()
+
+        def decode():
+            video_capture = None
+            try:
+                video_capture = self._open_capture()
+                while not stop_event.is_set():
+                    frame_success, frame = video_capture.read()
+                    if not frame_success:
+                        break
+                    _put_until_stopped(frame_buffer, frame, stop_event)
+            except Exception as e:
+                _put_until_stopped(frame_buffer, e, stop_event)
+            finally:
+                if video_capture is not None:
+                    video_capture.release()
+                _put_until_stopped(frame_buffer, end_of_stream, stop_event)
+
+        decoder = threading.Thread(target=decode, name="frame-decoder", daemon=True)
+        decoder.start()
+
+        try:
+            while True:
+                item = frame_buffer.get()
+                if item is end_of_stream:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Unblock the decoder if the consumer stopped early
+            stop_event.set()
+            while decoder.is_alive():
+                try:
+                    frame_buffer.get_nowait()
+                except queue.Empty:
+                    decoder.join(timeout=0.05)
+
+
+def _put_until_stopped(target_queue, item, stop_event):
+    while not stop_event.is_set():
+        try:
+            target_queue.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _drain(target_queue):
+    try:
+        while True:
+            target_queue.get_nowait()
+    except queue.Empty:
+        pass
+
+
+def map_frames(video_frames, draw_frame):
+    """
+    Apply a per-frame drawing function to a sequence of frames.
+
+    Parameters:
+    video_frames (list | iterable): Frames to draw on. Lists are processed eagerly;
+        any other iterable (e.g. a VideoFrameSource) is processed lazily.
+    draw_frame (callable): Called as draw_frame(frame, frame_num) and returns the annotated frame.
+
+    Returns:
+    list | generator: A list when given a list, otherwise a generator of annotated frames.
+    """
+    annotated_frames = (
+        draw_frame(frame, frame_num) for frame_num, frame in enumerate(video_frames)
+    )
+
+    if isinstance(video_frames, (list, tuple)):
+        return list(annotated_frames)
+
+    return annotated_frames
+
+
+def sample_video_frames(video_path, count):
+    """
+    Decode frames spread evenly over a video (e.g. to calibrate a model).
+
+    Parameters:
+    video_path (str): Path to the video file.
+    count (int): Number of frames; fewer when the video is shorter.
+
+    Returns:
+    list: The sampled frames as numpy arrays, in video order.
+    """
+    with VideoFrameSource(video_path) as video_frames:
+        num_frames = len(video_frames)
+        indices = sorted(set(np.linspace(0, num_frames - 1, min(count, num_frames)).astype(int)))
+        return [video_frames[index] for index in indices]
+
+
 def load_video_frames(video_path):
     """
     Loads all frames from a specified video file.
 
+    Prefer VideoFrameSource for long videos, which decodes frames lazily.
+
     Parameters:
     video_path (str): Path to the video file.
 
@@ -38,37 +234,157 @@ def load_video_frames(video_path):
     return video_frames
 
 
-def export_video(video_frames, output_path, fps=24):
+class AsyncVideoWriter:
     """
-    Exports a list of video frames to a new video file.
+    cv2.VideoWriter running on its own thread behind a bounded queue.
+
+    write() hands a frame to the encoder thread and returns immediately, blocking
+    only when ``queue_size`` frames are already waiting (back-pressure). Errors
+    raised by the encoder are re-raised on the producer's next write() or close().
 
     Parameters:
-    video_frames (list): A list containing frames to be written to the video.
     output_path (str): Path to save the output video file.
-    fps (int): Frames per second for the output video.
+    fps (float): Frames per second for the output video.
+    size (tuple): (width, height) of the frames. If None, taken from the first frame.
+    queue_size (int): Maximum number of frames waiting to be encoded.
+    fourcc (str): Four character codec code.
     """
 
-    # Check if the list of frames is empty
-    if not video_frames:
-        raise ValueError("Unable to export video frames. The frame list is empty.")
+    def __init__(self, output_path, fps=24, size=None, queue_size=64, fourcc="mp4v"):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+
+        self.output_path = str(output_path)
+        self.fps = fps
+        self.size = size
+        self.fourcc = fourcc
+        self.frames_written = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._abort = threading.Event()
+        self._closed = False
+        self._end_of_stream = object()
+        self._encoder = None
+
+    def write(self, frame):
+        """Queue a frame for encoding, waiting while the queue is full."""
+        if self._closed:
+            raise ValueError("Cannot write to a closed AsyncVideoWriter")
+        self._raise_encoder_error()
 
-    # Get the height and width of the frames from the first frame in the list
-    height, width, _ = video_frames[0].shape
-    size = (width, height)
+        if self._encoder is None:
+            self._start(frame)
 
-    # Define the codec for the video file (here, "mp4v" for MPEG-4 encoding)
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+        # Wait for room in the queue, but stop waiting if the encoder died
+        while True:
+            try:
+                self._queue.put(frame, timeout=0.1)
+                break
+            except queue.Full:
+                self._raise_encoder_error()
 
-    # Create a VideoWriter object to write the frames to the video file
-    out = cv2.VideoWriter(output_path, fourcc, fps, size)
+    def close(self):
+        """Flush the queued frames, release the encoder and re-raise any encoder error."""
+        if self._closed:
+            self._raise_encoder_error()
+            return
+        self._closed = True
 
-    # Check if the VideoWriter object was successfully created
-    if not out.isOpened():
-        raise IOError(f"Unable to create video file at: {output_path}")
+        if self._encoder is not None:
+            while self._encoder.is_alive():
+                try:
+                    self._queue.put(self._end_of_stream, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            self._encoder.join()
 
-    for frame in tqdm(video_frames, desc="Exporting Video Analysis..."):
-        out.write(frame)
+        self._raise_encoder_error()
 
-    out.release()
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+
+        # Already failing: drop the queued frames without masking the original error
+        self._closed = True
+        self._abort.set()
+        if self._encoder is not None:
+            while self._encoder.is_alive():
+                try:
+                    self._queue.put_nowait(self._end_of_stream)
+                except queue.Full:
+                    _drain(self._queue)
+                self._encoder.join(timeout=0.05)
+
+    def _start(self, first_frame):
+        if self.size is None:
+            height, width = first_frame.shape[:2]
+            self.size = (width, height)
+
+        # Create the writer on the calling thread so open failures surface immediately
+        writer = cv2.VideoWriter(
+            self.output_path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, self.size
+        )
+        if not writer.isOpened():
+            raise IOError(f"Unable to create video file at: {self.output_path}")
+
+        self._encoder = threading.Thread(
+            target=self._encode, args=(writer,), name="video-encoder", daemon=True
+        )
+        self._encoder.start()
+
+    def _encode(self, writer):
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is self._end_of_stream or self._abort.is_set():
+                    break
+                if frame.shape[1::-1] != self.size:
+                    raise ValueError(
+                        f"Frame size {frame.shape[1::-1]} does not match video size {self.size}"
+                    )
+                writer.write(frame)
+                self.frames_written += 1
+        except Exception as e:
+            self._error = e
+        finally:
+            writer.release()
+
+    def _raise_encoder_error(self):
+        if self._error is not None:
+            raise IOError(f"Video encoder failed for: {self.output_path}") from self._error
+
+
+def export_video(video_frames, output_path, fps=24, queue_size=64):
+    """
+    Exports a sequence of video frames to a new video file.
+
+    Encoding runs on a background AsyncVideoWriter, so it overlaps with whatever
+    produces the frames (e.g. a lazy drawing pipeline).
+
+    Parameters:
+    video_frames (list | iterable): Frames to be written to the video. Generators
+        are consumed one frame at a time.
+    output_path (str): Path to save the output video file.
+    fps (int): Frames per second for the output video.
+    queue_size (int): Maximum number of rendered frames waiting to be encoded.
+    """
+
+    total_frames = len(video_frames) if hasattr(video_frames, "__len__") else None
+
+    with AsyncVideoWriter(output_path, fps=fps, queue_size=queue_size) as writer:
+        for frame in tqdm(
+            video_frames, desc="Exporting Video Analysis...", total=total_frames
+        ):
+            writer.write(frame)
+
+    # Check if there were any frames to export
+    if writer.frames_written == 0:
+        raise ValueError("Unable to export video frames. The frame list is empty.")
 
     print(f"\nSaved To: {output_path}")
@@ -0,0 +1,37 @@
+import numpy as np
+
+
+def sliding_window_max(values, before, after):
+    """
+    Maximum of values[i - before : i + after + 1] for every i, in linear time.
+
+    Uses the van Herk/Gil-Werman block decomposition: prefix and suffix maxima
+    inside blocks of the window size, so each output is the max of two lookups
+    regardless of the window length. Windows are clipped at the array edges and
+    NaN values are ignored (an all-NaN window gives -inf).
+
+    Parameters:
+    values (np.ndarray): 1D array.
+    before (int): Number of elements before i included in its window.
+    after (int): Number of elements after i included in its window.
+
+    Returns:
+    np.ndarray: Windowed maxima, same length as values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    num_values = len(values)
+    window = before + after + 1
+    if num_values == 0:
+        return values.copy()
+
+    # Pad so window i covers padded[i : i + window] and the length is a multiple of window
+    num_blocks = -(-(num_values + window - 1) // window)
+    padded = np.full(num_blocks * window, -np.inf)
+    padded[before : before + num_values] = np.where(np.isnan(values), -np.inf, values)
+
+    blocks = padded.reshape(num_blocks, window)
+    prefix_max = np.maximum.accumulate(blocks, axis=1).reshape(-1)
+    suffix_max = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1)
+
+    starts = np.arange(num_values)
+    return np.maximum(suffix_max[starts], prefix_max[starts + window - 1])